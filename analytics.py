@@ -0,0 +1,329 @@
+"""Deal totals by type, status, currency and creation day from NumPy columns.
+
+    python -m analytics --backend sqlite --by deal_type,status
+    python -m analytics --by day --since 2025-01-01 --until 2025-02-01
+"""
+import asyncio
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('deal_type', 'status', 'currency', 'day')
+CATEGORICAL = ('deal_type', 'status', 'currency')
+# Currencies without cents; everything else is counted in hundredths
+MINOR_DIGITS = {'JPY': 0, 'KRW': 0, 'VND': 0, 'CLP': 0, 'ISK': 0, 'BHD': 3, 'KWD': 3, 'OMR': 3, 'TND': 3}
+EPOCH = date(1970, 1, 1).toordinal()
+# Group-bys with more possible groups than this sort instead of counting into bins
+MAX_BINS = 1 << 22
+PAGE_SIZE = 5000
+
+def minor_digits(currency: str) -> int:
+    return MINOR_DIGITS.get(currency, 2)
+
+def format_amount(minor: int, currency: str) -> str:
+    return f"{Decimal(int(minor)).scaleb(-minor_digits(currency))} {currency}"
+
+def _text(value) -> str:
+    # Records written in-process may still hold the enum rather than its value
+    return str(getattr(value, 'value', value))
+
+class DealColumns:
+    """One row per deal in parallel NumPy arrays.
+
+    Strings are dictionary-encoded into small integer codes, the day is
+    counted from 1970-01-01 and amounts are int64 minor units, so totals
+    are exact. A deleted deal's row is masked out rather than compacted,
+    which keeps a changed deal an in-place write to its own row.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.rows: Dict[str, int] = {}
+        self.size = 0
+        self.values: Dict[str, List[str]] = {dimension: [] for dimension in CATEGORICAL}
+        self._codes: Dict[str, Dict[str, int]] = {dimension: {} for dimension in CATEGORICAL}
+        self._days: Dict[str, int] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self.columns = {dimension: np.zeros(capacity, np.int32) for dimension in DIMENSIONS}
+        self.amount = np.zeros(capacity, np.int64)
+        self.live = np.zeros(capacity, bool)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _reserve(self, count: int):
+        capacity = len(self.amount)
+        if self.size + count <= capacity:
+            return
+        while capacity < self.size + count:
+            capacity *= 2
+        columns, amount, live = self.columns, self.amount, self.live
+        self._allocate(capacity)
+        for dimension, column in columns.items():
+            self.columns[dimension][:self.size] = column[:self.size]
+        self.amount[:self.size] = amount[:self.size]
+        self.live[:self.size] = live[:self.size]
+
+    def _code(self, dimension: str, value: str) -> int:
+        codes = self._codes[dimension]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self.values[dimension].append(value)
+        return code
+
+    def _day(self, created_at: Optional[str]) -> int:
+        key = (created_at or '')[:10]
+        day = self._days.get(key)
+        if day is None:
+            try:
+                day = date.fromisoformat(key).toordinal() - EPOCH
+            except ValueError:
+                day = 0
+            self._days[key] = day
+        return day
+
+    def _encode(self, deal: dict) -> Tuple[int, int, int, int, int]:
+        currency = _text((deal.get('metadata') or {}).get('currency') or 'USD')
+        amount = deal.get('amount') or 0
+        return (
+            self._code('deal_type', _text(deal.get('deal_type'))),
+            self._code('status', _text(deal.get('status'))),
+            self._code('currency', currency),
+            self._day(deal.get('created_at')),
+            round(amount * 10 ** minor_digits(currency))
+        )
+
+    def upsert_many(self, deals: Iterable[dict]):
+        """Write each deal into its row, appending rows for new deals"""
+        encoded = [(deal['id'], self._encode(deal)) for deal in deals]
+        if not encoded:
+            return
+        self._reserve(len(encoded))
+        rows = np.empty(len(encoded), np.int64)
+        for i, (deal_id, _) in enumerate(encoded):
+            row = self.rows.get(deal_id)
+            if row is None:
+                row = self.rows[deal_id] = self.size
+                self.size += 1
+            rows[i] = row
+        values = np.array([fields for _, fields in encoded], np.int64)
+        for i, dimension in enumerate(DIMENSIONS):
+            self.columns[dimension][rows] = values[:, i]
+        self.amount[rows] = values[:, 4]
+        self.live[rows] = True
+
+    def remove(self, deal_id: str):
+        row = self.rows.pop(deal_id, None)
+        if row is not None:
+            self.live[row] = False
+
+    def aggregate(self, by: Sequence[str] = ('deal_type', 'status'), since: date = None,
+                  until: date = None) -> List[dict]:
+        """Deal count and amount per group of deals created in [since, until).
+
+        Currency is always part of the grouping, since amounts in
+        different currencies cannot be added up.
+        """
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {', '.join(sorted(unknown))}")
+        by = list(dict.fromkeys(by))
+        if 'currency' not in by:
+            by.append('currency')
+
+        n = self.size
+        mask = self.live[:n].copy()
+        days = self.columns['day'][:n]
+        if since is not None:
+            mask &= days >= since.toordinal() - EPOCH
+        if until is not None:
+            mask &= days < until.toordinal() - EPOCH
+        if not mask.any():
+            return []
+        # Boolean indexing copies every column; skip it when all rows are selected
+        select = slice(None) if mask.all() else mask
+
+        keys, shape = [], []
+        for dimension in by:
+            column = self.columns[dimension][:n][select]
+            if dimension == 'day':
+                low = int(column.min())
+                keys.append(column - low)
+                shape.append(int(column.max()) - low + 1)
+            else:
+                keys.append(column)
+                shape.append(len(self.values[dimension]))
+        amount = self.amount[:n][select]
+
+        bins = int(np.prod(shape, dtype=np.float64))
+        if bins <= MAX_BINS:
+            group = np.ravel_multi_index(keys, shape)
+            counts = np.bincount(group, minlength=bins)
+            groups = np.flatnonzero(counts)
+            counts = counts[groups]
+            # Float sums of integers are exact below 2**53
+            if len(amount) * max(int(amount.max()), -int(amount.min())) < 1 << 53:
+                totals = np.bincount(group, weights=amount, minlength=bins)[groups].astype(np.int64)
+            else:
+                totals = np.zeros(bins, np.int64)
+                np.add.at(totals, group, amount)
+                totals = totals[groups]
+            group_keys = np.unravel_index(groups, shape)
+        else:
+            stacked = np.stack(keys, axis=1)
+            unique, inverse, counts = np.unique(stacked, axis=0, return_inverse=True, return_counts=True)
+            totals = np.zeros(len(unique), np.int64)
+            np.add.at(totals, inverse.ravel(), amount)
+            group_keys = [unique[:, i] for i in range(len(by))]
+
+        results = []
+        for position in range(len(counts)):
+            row = {}
+            for dimension, codes in zip(by, group_keys):
+                code = int(codes[position])
+                if dimension == 'day':
+                    row['day'] = date.fromordinal(EPOCH + low + code)
+                else:
+                    row[dimension] = self.values[dimension][code]
+            row['count'] = int(counts[position])
+            row['amount_minor'] = int(totals[position])
+            results.append(row)
+        results.sort(key=lambda row: tuple(str(row[dimension]) for dimension in by))
+        return results
+
+async def load_columns(storage, columns: DealColumns = None, page_size: int = PAGE_SIZE) -> DealColumns:
+    """Read every deal from `storage` in creation order, a page at a time"""
+    columns = columns if columns is not None else DealColumns()
+    start = None
+    while True:
+        page = await storage.get_deals_by_time(start, None, page_size)
+        columns.upsert_many(page)
+        if len(page) < page_size:
+            return columns
+        last = page[-1].get('created_at')
+        if last == start:
+            # A whole page shares one timestamp; widen until we get past it
+            page_size *= 2
+        # The next page starts at the last timestamp again; re-reading its deals is harmless
+        start = last
+        await asyncio.sleep(0)
+
+class DealAnalytics:
+    """`DealColumns` kept in step with a DataManager.
+
+    The first report reads the whole store; after that DataManager
+    reports every deal it writes or deletes, and a refresh re-reads
+    only those. Reports are computed from storage records, never from
+    the live objects. With a shared backend, deals written by other
+    workers show up after `rebuild`.
+    """
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self.columns: Optional[DealColumns] = None
+        self._changed: Set[str] = set()
+        self._lock = asyncio.Lock()
+        data_manager.deal_listeners.append(self._changed.add)
+
+    async def rebuild(self):
+        async with self._lock:
+            await self.data_manager.flush()
+            self._changed.clear()
+            self.columns = await load_columns(self.data_manager.storage)
+            logger.info(f"Analytics columns built for {len(self.columns)} deals")
+
+    async def refresh(self):
+        if self.columns is None:
+            await self.rebuild()
+            return
+        async with self._lock:
+            # Dirty deals reach the listener when they are committed
+            await self.data_manager.flush()
+            if not self._changed:
+                return
+            # Emptied in place: the listener holds this set's `add`
+            changed = set(self._changed)
+            self._changed.clear()
+            storage = self.data_manager.storage
+            deals = []
+            for deal_id in changed:
+                deal = await storage.get_deal(deal_id)
+                if deal is None:
+                    self.columns.remove(deal_id)
+                else:
+                    deals.append(deal)
+            self.columns.upsert_many(deals)
+
+    async def report(self, by: Sequence[str] = ('deal_type', 'status'), since: date = None,
+                     until: date = None) -> List[dict]:
+        await self.refresh()
+        return self.columns.aggregate(by, since, until)
+
+def format_report(rows: List[dict], by: Sequence[str]) -> List[str]:
+    by = [dimension for dimension in dict.fromkeys(by) if dimension != 'currency']
+    return [
+        ' / '.join([str(row[dimension]) for dimension in by] + [
+            f"{row['count']} deals, {format_amount(row['amount_minor'], row['currency'])}"
+        ])
+        for row in rows
+    ]
+
+def parse_dimensions(text: str) -> List[str]:
+    by = [dimension.strip() for dimension in text.split(',') if dimension.strip()]
+    unknown = set(by) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown dimensions: {', '.join(sorted(unknown))}")
+    return by
+
+async def _main(args):
+    import time
+    from data.data_manager import create_storage
+    storage = create_storage(args.backend, args.data_dir, args.redis_url)
+    storage.load()
+
+    started = time.perf_counter()
+    columns = await load_columns(storage)
+    loaded = time.perf_counter()
+    rows = columns.aggregate(args.by, args.since, args.until)
+    queried = time.perf_counter()
+
+    if args.format == 'csv':
+        import csv
+        import sys
+        by = list(dict.fromkeys(args.by + ['currency']))
+        writer = csv.writer(sys.stdout)
+        writer.writerow(by + ['count', 'amount'])
+        for row in rows:
+            writer.writerow([row[dimension] for dimension in by] + [
+                row['count'], Decimal(row['amount_minor']).scaleb(-minor_digits(row['currency']))
+            ])
+    else:
+        for line in format_report(rows, args.by):
+            print(line)
+    logger.info(
+        f"{len(columns)} deals loaded in {(loaded - started) * 1000:.0f}ms, "
+        f"{len(rows)} groups in {(queried - loaded) * 1000:.1f}ms"
+    )
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'redis'],
+                        default=os.getenv('STORAGE_BACKEND', 'json'))
+    parser.add_argument('--redis-url', default=os.getenv('REDIS_URL'))
+    parser.add_argument('--by', type=parse_dimensions, default=['deal_type', 'status'],
+                        help=f"comma-separated, from {', '.join(DIMENSIONS)}")
+    parser.add_argument('--since', type=date.fromisoformat, help="first creation day, YYYY-MM-DD")
+    parser.add_argument('--until', type=date.fromisoformat, help="creation day to stop before")
+    parser.add_argument('--format', choices=['text', 'csv'], default='text')
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,118 @@
+"""Synthetic users/deals in the shape of data/users.json and data/deals.json.
+
+    python -m benchmarks.dataset --users 10000 --deals 20000 --out /tmp/bench-data
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Tuple
+
+DEAL_TYPES = ['charity', 'debt', 'service', 'venture']
+STATUSES = ['active'] * 6 + ['pending', 'completed', 'completed', 'cancelled']
+ACTIONS = ['created', 'joined', 'accepted', 'status_changed', 'metadata_updated']
+EPOCH = datetime(2024, 1, 1)
+
+def _timestamp(rng: random.Random) -> str:
+    return (EPOCH + timedelta(seconds=rng.randrange(365 * 24 * 3600))).isoformat()
+
+def make_user(rng: random.Random, user_id: int) -> dict:
+    return {
+        'id': user_id,
+        'username': f"user{user_id}",
+        'phone': f"+1{rng.randrange(10**9, 10**10)}",
+        'first_name': f"First{user_id}",
+        'last_name': f"Last{user_id}",
+        'reputation': rng.randrange(100),
+        'completed_deals': rng.randrange(20),
+        'active_deals': [],
+        'is_registered': rng.random() < 0.9,
+        'joined_date': _timestamp(rng),
+        'last_active': _timestamp(rng),
+        'settings': {
+            'notifications': True,
+            'language': rng.choice(['en', 'ru'])
+        },
+        'statistics': {
+            'total_deals_created': 0,
+            'total_deals_participated': 0,
+            'total_amount_handled': 0.0,
+            'successful_deals': 0,
+            'failed_deals': 0
+        }
+    }
+
+def make_deal(rng: random.Random, deal_id: str, user_ids: list, members: int, history: int) -> dict:
+    deal_members = rng.sample(user_ids, min(members, len(user_ids)))
+    creator_id = deal_members[0]
+    created_at = _timestamp(rng)
+    return {
+        'id': deal_id,
+        'creator_id': creator_id,
+        'deal_type': rng.choice(DEAL_TYPES),
+        'amount': float(rng.choice([100, 200, 500, 1000])),
+        'terms': f"Synthetic terms for {deal_id}",
+        'status': rng.choice(STATUSES),
+        'group_id': -100_000_000_000 - rng.randrange(10**9) if rng.random() < 0.3 else None,
+        'members': deal_members,
+        'created_at': created_at,
+        'updated_at': created_at,
+        'completion_date': None,
+        'history': [
+            {'timestamp': created_at, 'action': rng.choice(ACTIONS), 'user_id': rng.choice(deal_members)}
+            for _ in range(history)
+        ],
+        'metadata': {
+            'currency': 'USD',
+            'payment_method': None,
+            'deadline': None,
+            'attachments': []
+        },
+        'participants': {
+            str(user_id): {
+                'role': 'creator' if user_id == creator_id else 'member',
+                'joined_at': created_at,
+                'status': 'active'
+            }
+            for user_id in deal_members
+        }
+    }
+
+def generate(users: int, deals: int, members: int = 3, history: int = 5,
+             seed: int = 0) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+    """Deterministic dataset: the same arguments always give the same records"""
+    rng = random.Random(seed)
+    user_records = {str(user_id): make_user(rng, user_id) for user_id in range(1, users + 1)}
+    user_ids = list(range(1, users + 1))
+    deal_records = {}
+    for n in range(deals):
+        deal_id = f"deal_{n:08d}"
+        deal = deal_records[deal_id] = make_deal(rng, deal_id, user_ids, members, history)
+        for user_id in deal['members']:
+            user = user_records[str(user_id)]
+            if deal['status'] == 'active':
+                user['active_deals'].append(deal_id)
+            user['statistics']['total_deals_participated'] += 1
+        user_records[str(deal['creator_id'])]['statistics']['total_deals_created'] += 1
+    return user_records, deal_records
+
+def write(out_dir: Path, users: Dict[str, dict], deals: Dict[str, dict]):
+    """Write users.json / deals.json, the files JsonStorage imports"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name, records in [('users', users), ('deals', deals)]:
+        with open(out_dir / f"{name}.json", 'w') as f:
+            json.dump(records, f)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--deals', type=int, default=20_000)
+    parser.add_argument('--members', type=int, default=3, help="members per deal")
+    parser.add_argument('--history', type=int, default=5, help="history events per deal")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', type=Path, required=True)
+    args = parser.parse_args()
+    write(args.out, *generate(args.users, args.deals, args.members, args.history, args.seed))
+    print(f"Wrote {args.users} users and {args.deals} deals to {args.out}")
@@ -0,0 +1,246 @@
+"""Benchmarks for DataManager, DealManager and the handler hot paths.
+
+Seeds a synthetic dataset into a scratch data directory, times each
+operation and writes the results as JSON for comparison across commits:
+
+    python -m benchmarks.run --users 10000 --deals 20000 --output before.json
+    python -m benchmarks.run --users 10000 --deals 20000 --compare before.json
+
+`python benchmarks/run.py` works as well. Results default to
+benchmarks/results-<commit>.json, which git ignores.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+if not __package__:
+    # Run by path: the modules below live at the repository root
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Message, Update
+
+from benchmarks.dataset import generate
+from data.data_manager import DataManager
+from deal_manager import DealManager
+from fake_telegram import FakeTelegram, make_update
+from handlers import router
+from i18n import I18nMiddleware
+from middlewares import RegisterCheck, ActivityMiddleware
+
+class FakeSession(BaseSession):
+    """Bot session answering from FakeTelegram in-process, without any network"""
+
+    def __init__(self):
+        super().__init__()
+        self.telegram = FakeTelegram()
+
+    async def make_request(self, bot: Bot, method, timeout=None):
+        params = method.model_dump(exclude_none=True)
+        result = self.telegram.result(method.__api_method__, params)
+        response = self.check_response(bot, method, 200, json.dumps({'ok': True, 'result': result}))
+        return response.result
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b''
+
+    async def close(self):
+        pass
+
+def summarize(samples: List[float]) -> dict:
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        'count': len(samples),
+        'mean_ms': total / len(samples) * 1000,
+        'p50_ms': samples[len(samples) // 2] * 1000,
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        'ops_per_sec': len(samples) / total if total else None
+    }
+
+async def measure(operation: Callable[[int], Awaitable], iterations: int) -> dict:
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        await operation(i)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+async def seed(data_dir: Path, backend: str, args) -> DataManager:
+    """Write the synthetic dataset through the storage backend, as the bot would have"""
+    users, deals = generate(args.users, args.deals, args.members, args.history, args.seed)
+    history = {deal_id: deal.pop('history') for deal_id, deal in deals.items()}
+    for deal_id, deal in deals.items():
+        deal['history_count'] = len(history[deal_id])
+        deal['last_event'] = history[deal_id][-1] if history[deal_id] else None
+
+    data_manager = DataManager(data_dir=str(data_dir), backend=backend, redis_url=args.redis_url)
+    await data_manager.storage.apply_batch(users, deals, history)
+    await data_manager.save_data()
+    return data_manager
+
+async def run(args) -> Dict[str, dict]:
+    rng = random.Random(args.seed)
+    results = {}
+    data_dir = Path(tempfile.mkdtemp(prefix="dealbot-bench-"))
+    try:
+        started = time.perf_counter()
+        data_manager = await seed(data_dir, args.backend, args)
+        results['seed'] = summarize([time.perf_counter() - started])
+        await data_manager.close()
+
+        # Cold start: open the store a few times
+        samples = []
+        for _ in range(args.load_rounds):
+            started = time.perf_counter()
+            data_manager = DataManager(data_dir=str(data_dir), backend=args.backend, redis_url=args.redis_url)
+            samples.append(time.perf_counter() - started)
+            await data_manager.close()
+        results['load_data'] = summarize(samples)
+
+        data_manager = DataManager(data_dir=str(data_dir), backend=args.backend, redis_url=args.redis_url)
+        deal_manager = DealManager(data_manager)
+        user_ids = [rng.randrange(1, args.users + 1) for _ in range(args.iterations)]
+        deal_ids = [f"deal_{rng.randrange(args.deals):08d}" for _ in range(args.iterations)]
+
+        async def get_user_deals(i):
+            await data_manager.get_user_deals(user_ids[i], status='active', limit=10)
+        results['get_user_deals'] = await measure(get_user_deals, args.iterations)
+
+        async def update_deal_status(i):
+            await deal_manager.update_deal_status(deal_ids[i], rng.choice(['active', 'pending']))
+        results['deal_manager.update_deal_status'] = await measure(update_deal_status, args.iterations)
+
+        async def update_deal_metadata(i):
+            await deal_manager.update_deal_metadata(deal_ids[i], payment_method='card')
+        results['deal_manager.update_deal_metadata'] = await measure(update_deal_metadata, args.iterations)
+
+        async def add_participant(i):
+            await deal_manager.add_participant(deal_ids[i], user_ids[i])
+        results['deal_manager.add_participant'] = await measure(add_participant, args.iterations)
+
+        async def add_deal_history(i):
+            await deal_manager.add_deal_history(deal_ids[i], 'benchmark', user_ids[i])
+        results['deal_manager.add_deal_history'] = await measure(add_deal_history, args.iterations)
+
+        async def complete_deal(i):
+            await deal_manager.complete_deal(deal_ids[i])
+        results['deal_manager.complete_deal'] = await measure(complete_deal, args.iterations)
+
+        async def save_data(i):
+            for user_id in rng.sample(range(1, args.users + 1), min(100, args.users)):
+                user = await data_manager.get_user(user_id)
+                user.reputation += 1
+                await data_manager.save_user(user)
+            await data_manager.save_data()
+        results['save_data'] = await measure(save_data, args.save_rounds)
+
+        bot = Bot(token="42:BENCHMARK", session=FakeSession())
+        middleware = RegisterCheck()
+        middleware_data = {'data_manager': data_manager}
+        messages = [
+            Message.model_validate(make_update(i, args.users, 'hello', first_user=1)['message'], context={'bot': bot})
+            for i in range(args.iterations)
+        ]
+
+        async def passthrough(event, data):
+            return None
+
+        async def register_check(i):
+            await middleware(passthrough, messages[i], middleware_data)
+        results['register_check'] = await measure(register_check, args.iterations)
+
+        # End to end through the dispatcher, as webhook/polling updates are fed
+        dp = Dispatcher(storage=MemoryStorage())
+        dp['data_manager'] = data_manager
+        dp['deal_manager'] = deal_manager
+        dp.message.outer_middleware(ActivityMiddleware())
+        dp.callback_query.outer_middleware(ActivityMiddleware())
+        dp.message.middleware(I18nMiddleware())
+        dp.callback_query.middleware(I18nMiddleware())
+        dp.message.middleware(RegisterCheck())
+        dp.callback_query.middleware(RegisterCheck())
+        dp.include_router(router)
+
+        for text in ['/start', '/settings', '👥 Active Deals', 'hello']:
+            updates = [
+                Update.model_validate(make_update(i, args.users, text, first_user=1), context={'bot': bot})
+                for i in range(args.iterations)
+            ]
+
+            async def feed(i):
+                await dp.feed_update(bot, updates[i])
+            results[f'handler {text}'] = await measure(feed, args.iterations)
+
+        results['cache'] = data_manager.cache_stats()
+        await data_manager.close()
+        await bot.session.close()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict]):
+    for name, result in results.items():
+        old = baseline.get(name, {})
+        if 'p50_ms' not in result or 'p50_ms' not in old:
+            continue
+        change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+        print(f"{name:40} p50 {old['p50_ms']:9.3f} -> {result['p50_ms']:9.3f} ms ({change:+.1f}%)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', default='json', choices=['json', 'sqlite', 'redis'])
+    parser.add_argument('--redis-url', help="for --backend redis; the database is written to")
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--deals', type=int, default=20_000)
+    parser.add_argument('--members', type=int, default=3, help="members per deal")
+    parser.add_argument('--history', type=int, default=5, help="history events per deal")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--load-rounds', type=int, default=3)
+    parser.add_argument('--save-rounds', type=int, default=5)
+    parser.add_argument('--output', type=Path, help="results file (default: benchmarks/results-<commit>.json)")
+    parser.add_argument('--compare', type=Path, help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    revision = git_revision()
+    results = asyncio.run(run(args))
+    report = {
+        'revision': revision,
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'params': {key: str(value) for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results
+    }
+    output = args.output or Path(__file__).parent / f"results-{revision}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in results.items():
+        if 'p50_ms' in result:
+            print(f"{name:40} p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  n={result['count']}")
+    print(f"Results written to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
@@ -0,0 +1,59 @@
+import logging
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, Union
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.types import Message
+
+from i18n import I18n, i18n
+
+logger = logging.getLogger(__name__)
+
+def normalize(text: str) -> str:
+    """Button text as clients may send it back: NFKC, no emoji variation selectors, single spaces, casefolded"""
+    text = unicodedata.normalize('NFKC', text).replace('\ufe0f', '')
+    return ' '.join(text.split()).casefold()
+
+class ButtonRouter:
+    """Routes reply-keyboard presses by exact text with one dict lookup.
+
+    Handlers are registered for catalog keys (matched in every language)
+    or for literal texts. The whole table is a single handler on the
+    router, so routing cost does not grow with the number of buttons.
+    """
+
+    def __init__(self, catalog: I18n = i18n):
+        self.catalog = catalog
+        self._handlers: Dict[str, CallableObject] = {}
+
+    def __call__(self, *keys: str, texts: Iterable[str] = ()):
+        """Decorator registering a handler for catalog `keys` and literal `texts`"""
+        def register(handler: Callable):
+            callable_object = CallableObject(handler)
+            labels = [text for key in keys for text in self.catalog.variants(key)] + list(texts)
+            for label in labels:
+                normalized = normalize(label)
+                existing = self._handlers.get(normalized)
+                if existing is not None and existing.callback is not handler:
+                    raise ValueError(
+                        f"Button '{label}' is routed to both {existing.callback.__name__} and {handler.__name__}"
+                    )
+                self._handlers[normalized] = callable_object
+            return handler
+        return register
+
+    def match(self, message: Message) -> Union[bool, Dict[str, Any]]:
+        """Filter: puts the button's handler in the data as `button`"""
+        if not message.text:
+            return False
+        handler = self._handlers.get(normalize(message.text))
+        return {'button': handler} if handler is not None else False
+
+    async def dispatch(self, message: Message, button: CallableObject, **data) -> Any:
+        return await button.call(message, **data)
+
+    def include(self, router: Router):
+        """Register the table on `router`; handlers registered earlier take precedence"""
+        router.message.register(self.dispatch, self.match)
+        logger.debug(f"Routing {len(self._handlers)} button labels")
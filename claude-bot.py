@@ -1,13 +1,20 @@
 import asyncio
 import logging
+import multiprocessing
+import signal
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
 import os
 
 from handlers import router
-from middlewares import RegisterCheck
-from data.data_manager import DataManager
+from middlewares import RegisterCheck, ActivityMiddleware
+from i18n import I18nMiddleware
+from data.data_manager import DataManager, create_fsm_storage
+from deal_manager import DealManager
+from notifications import NotificationDispatcher
+from scheduler import DealScheduler
+from metrics import Metrics
+from profiler import SamplingProfiler
 
 # Load environment variables
 load_dotenv()
@@ -22,30 +29,177 @@ logging.basicConfig(
     ]
 )
 
-async def main():
+def create_bot() -> Bot:
+    session = None
+    api_url = os.getenv('TELEGRAM_API_URL')
+    if api_url:
+        # Self-hosted Bot API server, or a local fake one for load tests
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+        session = AiohttpSession(api=TelegramAPIServer.from_base(api_url))
+    return Bot(token=os.getenv('TELEGRAM_BOT_TOKEN'), session=session)
+
+async def run_webhook(dp: Dispatcher, bot: Bot, worker_id: int, workers: int, metrics: Metrics):
+    from webhook import WebhookServer
+    server = WebhookServer(
+        dp, bot,
+        path=os.getenv('WEBHOOK_PATH', '/webhook'),
+        secret_token=os.getenv('WEBHOOK_SECRET'),
+        workers=int(os.getenv('WEBHOOK_CONCURRENCY', '64')),
+        queue_size=int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+    )
+    # Scrapes land on whichever worker accepts the connection
+    server.app.router.add_get('/metrics', metrics.handle)
+    metrics.gauge('bot_webhook_queue_depth', "Updates accepted but not yet processed",
+                  lambda: server.stats()['queue_depth'])
+    metrics.gauge('bot_webhook_rejected', "Updates refused with 503 since start",
+                  lambda: server.stats()['rejected'])
+    await server.start(
+        os.getenv('WEBHOOK_HOST', '0.0.0.0'),
+        int(os.getenv('WEBHOOK_PORT', '8080')),
+        reuse_port=workers > 1
+    )
+
+    # Registering the webhook once is enough; worker 0 does it
+    webhook_url = os.getenv('WEBHOOK_URL')
+    if webhook_url and worker_id == 0:
+        await bot.set_webhook(
+            webhook_url.rstrip('/') + server.path,
+            secret_token=server.secret_token,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        logging.info("Draining webhook updates...")
+        await server.stop()
+
+async def main(worker_id: int = 0, workers: int = 1):
     # Initialize data manager
-    data_manager = DataManager()
+    redis_url = os.getenv('REDIS_URL')
+    data_manager = DataManager(
+        backend=os.getenv('STORAGE_BACKEND', 'json'),
+        redis_url=redis_url,
+        cache_size=int(os.getenv('CACHE_SIZE', '10000')),
+        cache_bytes=int(os.getenv('CACHE_MB', '64')) * 1024 * 1024
+    )
     
     # Initialize bot and dispatcher
-    bot = Bot(token=os.getenv('TELEGRAM_BOT_TOKEN'))
-    storage = MemoryStorage()
+    bot = create_bot()
+    storage = create_fsm_storage(os.getenv('FSM_STORAGE', 'redis' if redis_url else 'memory'), redis_url)
     dp = Dispatcher(storage=storage)
     
     # Add data manager to dispatcher
     dp["data_manager"] = data_manager
     
-    # Add middlewares
+    # Outgoing notifications go through a rate-limited queue
+    notifier = NotificationDispatcher(bot)
+    notifier.start()
+    dp["notifier"] = notifier
+    
+    # One timer for every deal's reminders, deadlines and status changes
+    state_file = "scheduler.json" if workers == 1 else f"scheduler.{worker_id}.json"
+    scheduler = DealScheduler(data_manager, notifier, data_manager.data_dir / state_file,
+                              worker_id=worker_id, workers=workers)
+    scheduler.start()
+    dp["deal_manager"] = DealManager(data_manager, scheduler)
+    
+    # Metrics go first so the other middlewares are included in handler timings
+    metrics = Metrics()
+    metrics.install(dp)
+    metrics.instrument(data_manager)
+    metrics.gauge('bot_notification_queue_depth', "Notifications waiting to be sent",
+                  lambda: notifier.stats()['queue_depth'])
+    metrics.gauge('bot_scheduler_pending_jobs', "Deal reminders and deadlines scheduled",
+                  lambda: scheduler.pending_jobs)
+    
+    # On-demand profiling: /profile from an admin, or SIGUSR1
+    profiler = SamplingProfiler(
+        data_manager.logs_dir,
+        slow_threshold=float(os.getenv('PROFILE_SLOW_MS', '100')) / 1000
+    )
+    dp["profiler"] = profiler
+    dp["admin_ids"] = frozenset(int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip())
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGUSR1, profiler.start, float(os.getenv('PROFILE_SECONDS', '30'))
+    )
+    
+    # /report aggregates deals in NumPy columns; numpy is optional
+    try:
+        from analytics import DealAnalytics
+        dp["analytics"] = DealAnalytics(data_manager)
+    except ImportError:
+        logging.info("numpy is not installed; /report is disabled")
+    
+    # Activity is recorded for every message and callback, handled or not
+    dp.message.outer_middleware(ActivityMiddleware())
+    dp.callback_query.outer_middleware(ActivityMiddleware())
+    
+    # Add middlewares; the locale is resolved before RegisterCheck so it can reply in it
+    dp.message.middleware(I18nMiddleware())
+    dp.callback_query.middleware(I18nMiddleware())
     dp.message.middleware(RegisterCheck())
+    dp.callback_query.middleware(RegisterCheck())
     
     # Include routers
     dp.include_router(router)
     
+    metrics_runner = None
     try:
-        logging.info("Starting bot...")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if os.getenv('BOT_MODE', 'polling') == 'webhook':
+            logging.info(f"Starting bot (webhook worker {worker_id + 1}/{workers})...")
+            await run_webhook(dp, bot, worker_id, workers, metrics)
+        else:
+            if os.getenv('METRICS_PORT'):
+                metrics_runner = await metrics.start_server(
+                    os.getenv('METRICS_HOST', '0.0.0.0'), int(os.getenv('METRICS_PORT'))
+                )
+            logging.info("Starting bot...")
+            # Updates run as concurrent tasks; DataManager's versioned updates keep them consistent
+            await dp.start_polling(bot, handle_as_tasks=True, allowed_updates=dp.resolve_used_update_types())
     finally:
-        await data_manager.save_data()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await scheduler.stop()
+        await notifier.stop()
+        await data_manager.close()
+        await bot.session.close()
         logging.info("Bot stopped")
 
+def run_worker(worker_id: int, workers: int):
+    asyncio.run(main(worker_id, workers))
+
+def run_workers(workers: int):
+    """Fork webhook workers that share the port through SO_REUSEPORT"""
+    if os.getenv('STORAGE_BACKEND', 'json') != 'redis':
+        raise SystemExit("WEB_WORKERS > 1 needs STORAGE_BACKEND=redis so workers share state")
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(worker_id, workers), name=f"bot-worker-{worker_id}")
+        for worker_id in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Forward termination so every worker drains before exiting
+    def terminate(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    for process in processes:
+        process.join()
+
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    workers = int(os.getenv('WEB_WORKERS', '1'))
+    if os.getenv('BOT_MODE', 'polling') == 'webhook' and workers > 1:
+        run_workers(workers)
+    else:
+        asyncio.run(main())
\ No newline at end of file
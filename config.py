@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from enum import Enum
 from typing import List, Optional, Dict
 from datetime import datetime
@@ -29,7 +29,7 @@ class UserSettings:
     notifications: bool = True
     language: str = 'en'
 
-@dataclass
+@dataclass(slots=True, weakref_slot=True)
 class User:
     id: int
     username: Optional[str] = None
@@ -44,6 +44,8 @@ class User:
     last_active: Optional[str] = None
     settings: Optional[UserSettings] = None
     statistics: Optional[UserStatistics] = None
+    # Bumped on every save; used for compare-and-swap updates
+    version: int = 0
 
     def __post_init__(self):
         if self.active_deals is None:
@@ -52,9 +54,11 @@ class User:
             self.settings = UserSettings()
         if self.statistics is None:
             self.statistics = UserStatistics()
-        if self.joined_date is None:
-            self.joined_date = datetime.now().isoformat()
-        self.last_active = datetime.now().isoformat()
+        # Only new users get timestamps; loaded records keep their own
+        if self.joined_date is None or self.last_active is None:
+            now = datetime.now().isoformat()
+            self.joined_date = self.joined_date or now
+            self.last_active = self.last_active or now
 
     def to_dict(self):
         return {
@@ -65,18 +69,26 @@ class User:
             'last_name': self.last_name,
             'reputation': self.reputation,
             'completed_deals': self.completed_deals,
-            'active_deals': self.active_deals,
+            'active_deals': list(self.active_deals),
             'is_registered': self.is_registered,
             'joined_date': self.joined_date,
             'last_active': self.last_active,
             'settings': asdict(self.settings),
-            'statistics': asdict(self.statistics)
+            'statistics': asdict(self.statistics),
+            'version': self.version
         }
 
     @classmethod
     def from_dict(cls, data: dict):
+        data = {k: v for k, v in data.items() if k in USER_FIELDS}
+        if data.get('settings') is not None:
+            data['settings'] = UserSettings(**data['settings'])
+        if data.get('statistics') is not None:
+            data['statistics'] = UserStatistics(**data['statistics'])
         return cls(**data)
 
+USER_FIELDS = frozenset(f.name for f in fields(User))
+
 @dataclass
 class DealParticipant:
     role: str
@@ -96,7 +108,7 @@ class DealHistoryEntry:
     action: str
     user_id: int
 
-@dataclass
+@dataclass(slots=True, weakref_slot=True)
 class Deal:
     id: str
     creator_id: int
@@ -109,22 +121,26 @@ class Deal:
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
     completion_date: Optional[str] = None
-    history: List[DealHistoryEntry] = None
+    # Full history lives in the storage backend's per-deal event log
+    history_count: int = 0
+    last_event: Optional[DealHistoryEntry] = None
     metadata: Optional[DealMetadata] = None
-    participants: Dict[int, DealParticipant] = None
+    participants: Dict[str, DealParticipant] = None
+    # Bumped on every save; used for compare-and-swap updates
+    version: int = 0
 
     def __post_init__(self):
         if self.members is None:
             self.members = []
-        if self.history is None:
-            self.history = []
         if self.metadata is None:
             self.metadata = DealMetadata()
         if self.participants is None:
             self.participants = {}
-        if self.created_at is None:
-            self.created_at = datetime.now().isoformat()
-        self.updated_at = datetime.now().isoformat()
+        # Only new deals get timestamps; loaded records keep their own
+        if self.created_at is None or self.updated_at is None:
+            now = datetime.now().isoformat()
+            self.created_at = self.created_at or now
+            self.updated_at = self.updated_at or now
 
     def to_dict(self):
         return {
@@ -135,17 +151,31 @@ class Deal:
             'terms': self.terms,
             'status': self.status,
             'group_id': self.group_id,
-            'members': self.members,
+            'members': list(self.members),
             'created_at': self.created_at,
             'updated_at': self.updated_at,
             'completion_date': self.completion_date,
-            'history': [asdict(h) for h in self.history],
+            'history_count': self.history_count,
+            'last_event': asdict(self.last_event) if self.last_event else None,
             'metadata': asdict(self.metadata),
             'participants': {
                 str(k): asdict(v) for k, v in self.participants.items()
-            }
+            },
+            'version': self.version
         }
 
     @classmethod
     def from_dict(cls, data: dict):
+        data = {k: v for k, v in data.items() if k in DEAL_FIELDS}
+        data['deal_type'] = DealType(data['deal_type'])
+        if data.get('last_event') is not None:
+            data['last_event'] = DealHistoryEntry(**data['last_event'])
+        if data.get('metadata') is not None:
+            data['metadata'] = DealMetadata(**data['metadata'])
+        if data.get('participants') is not None:
+            data['participants'] = {
+                str(k): DealParticipant(**v) for k, v in data['participants'].items()
+            }
         return cls(**data)
+
+DEAL_FIELDS = frozenset(f.name for f in fields(Deal))
@@ -0,0 +1,61 @@
+import time
+import logging
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional
+
+from data.storage import uninterrupted
+
+logger = logging.getLogger(__name__)
+
+class ActivityTracker:
+    """Buffers `last_active` touches and flushes them to storage in batches.
+
+    A touch is one dict assignment (user id -> epoch seconds); nothing is
+    serialized and no `User` is materialized on the hot path.
+    """
+
+    def __init__(self, data_manager, flush_interval: float = 10.0):
+        self.data_manager = data_manager
+        self.flush_interval = flush_interval
+        self._touches: Dict[int, float] = {}
+
+    def touch(self, user_id: int, timestamp: float = None):
+        self._touches[user_id] = timestamp or time.time()
+
+    async def last_seen(self, user_id: int) -> Optional[str]:
+        """Last activity as an ISO timestamp, without loading the user record"""
+        timestamp = self._touches.get(user_id)
+        if timestamp is not None:
+            return datetime.fromtimestamp(timestamp).isoformat()
+        return await self.data_manager.storage.get_last_active(str(user_id))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await uninterrupted(self.flush())
+            except Exception as e:
+                logger.error(f"Error flushing user activity: {e}")
+
+    async def flush(self):
+        if not self._touches:
+            return
+        touches, self._touches = self._touches, {}
+        batch = {
+            str(user_id): datetime.fromtimestamp(timestamp).isoformat()
+            for user_id, timestamp in touches.items()
+        }
+
+        # Keep live objects in step so a later save doesn't write a stale value
+        for user_id, last_active in batch.items():
+            user = self.data_manager.peek_user(user_id)
+            if user is not None:
+                user.last_active = last_active
+
+        try:
+            await self.data_manager.storage.touch_users(batch)
+        except Exception:
+            # Newer touches win over the batch we failed to write
+            self._touches = {**touches, **self._touches}
+            raise
@@ -0,0 +1,99 @@
+import logging
+from dataclasses import asdict, fields
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from config import User, Deal, DealHistoryEntry
+
+logger = logging.getLogger(__name__)
+
+class Batch:
+    """Unit of work over DataManager's live objects.
+
+    Load everything first through the batch, then mutate and `save_*`.
+    On a clean exit from `async with data_manager.batch()` the staged
+    users, deals and history events go to storage in a single atomic
+    commit. If the block raises, nothing staged here is written and the
+    objects loaded through the batch are put back as they were loaded,
+    unless something else saved them in the meantime.
+    """
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self.users: Dict[str, User] = {}
+        self.deals: Dict[str, Deal] = {}
+        self.history: Dict[str, List[dict]] = {}
+        # (table, key) -> loaded object, its version and state at load, for rollback
+        self._loaded: Dict[Tuple[str, str], Tuple[Union[User, Deal], int, dict]] = {}
+        self._saves: Dict[Tuple[str, str], int] = {}
+
+    async def __aenter__(self) -> "Batch":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.commit()
+        else:
+            self.rollback()
+
+    def _track(self, table: str, record):
+        if record is not None:
+            self._loaded.setdefault((table, str(record.id)), (record, record.version, record.to_dict()))
+        return record
+
+    # Loads go through the identity map, so mutations are visible everywhere
+    async def get_user(self, user_id: int) -> Optional[User]:
+        return self._track('users', await self.data_manager.get_user(user_id))
+
+    async def get_users(self, user_ids: List[int]) -> List[User]:
+        users = await self.data_manager.get_users(user_ids)
+        for user in users:
+            self._track('users', user)
+        return users
+
+    async def get_deal(self, deal_id: str) -> Optional[Deal]:
+        return self._track('deals', await self.data_manager.get_deal(deal_id))
+
+    def save_user(self, user: User):
+        user.version += 1
+        key = str(user.id)
+        self._saves[('users', key)] = self._saves.get(('users', key), 0) + 1
+        self.users[key] = user
+
+    def save_deal(self, deal: Deal):
+        deal.version += 1
+        self._saves[('deals', deal.id)] = self._saves.get(('deals', deal.id), 0) + 1
+        deal.updated_at = datetime.now().isoformat()
+        self.deals[deal.id] = deal
+
+    def add_deal_history(self, deal: Deal, action: str, user_id: int) -> DealHistoryEntry:
+        entry = DealHistoryEntry(
+            timestamp=datetime.now().isoformat(),
+            action=action,
+            user_id=user_id
+        )
+        self.history.setdefault(deal.id, []).append(asdict(entry))
+        deal.history_count += 1
+        deal.last_event = entry
+        self.save_deal(deal)
+        return entry
+
+    def rollback(self):
+        """Drop staged writes and restore the loaded objects to their state at load"""
+        for record_id, (record, version, state) in self._loaded.items():
+            if record.version != version + self._saves.get(record_id, 0):
+                # Saved elsewhere meanwhile; that save owns the current state
+                logger.warning(f"Not rolling back {record_id[0]} {record_id[1]}: saved outside the batch")
+                continue
+            restored = type(record).from_dict(state)
+            for field in fields(record):
+                setattr(record, field.name, getattr(restored, field.name))
+        self.users, self.deals, self.history = {}, {}, {}
+        self._loaded, self._saves = {}, {}
+
+    async def commit(self):
+        users, deals, history = self.users, self.deals, self.history
+        self.users, self.deals, self.history = {}, {}, {}
+        self._loaded, self._saves = {}, {}
+        if users or deals or history:
+            await self.data_manager.commit(users, deals, history)
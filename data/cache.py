@@ -0,0 +1,123 @@
+import sys
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict
+
+def approx_size(obj) -> int:
+    """Rough resident size of a record object and its direct attribute values"""
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+        values = obj.__dict__.values()
+    else:
+        values = [getattr(obj, name, None) for name in getattr(type(obj), '__slots__', ())]
+    for value in values:
+        size += sys.getsizeof(value)
+        if isinstance(value, (list, tuple, set)):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+class LRUCache:
+    """Bounded identity map: least recently used entries beyond the limits are evicted.
+
+    `max_items` and `max_bytes` (estimated with `approx_size`) both cap
+    the strongly held entries. Keys for which `pinned` returns True (dirty,
+    not yet written back) are never evicted. Evicted objects are remembered
+    weakly, so a caller still holding one gets the same object back
+    instead of a second copy.
+    """
+
+    def __init__(self, max_items: int = 10_000, max_bytes: int = 64 * 1024 * 1024,
+                 pinned: Callable[[str], bool] = None, on_evict: Callable[[str, object], None] = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.pinned = pinned or (lambda key: False)
+        self.on_evict = on_evict
+
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._evicted: "weakref.WeakValueDictionary[str, object]" = weakref.WeakValueDictionary()
+        self.bytes = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries or key in self._evicted
+
+    def __getitem__(self, key: str):
+        value = self.peek(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value):
+        self._evicted.pop(key, None)
+        self.bytes -= self._sizes.get(key, 0)
+        self._sizes[key] = approx_size(value)
+        self.bytes += self._sizes[key]
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self.trim()
+
+    def get(self, key: str, default=None):
+        """Counted lookup that marks the entry as recently used"""
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+        value = self._evicted.get(key)
+        if value is not None:
+            # Still referenced elsewhere: take it back rather than reload a copy
+            self.hits += 1
+            self[key] = value
+            return value
+        self.misses += 1
+        return default
+
+    def peek(self, key: str):
+        """Uncounted lookup that leaves the LRU order alone"""
+        value = self._entries.get(key)
+        return value if value is not None else self._evicted.get(key)
+
+    def pop(self, key: str, default=None):
+        value = self._entries.pop(key, None)
+        if value is not None:
+            self.bytes -= self._sizes.pop(key, 0)
+        else:
+            value = self._evicted.pop(key, None)
+        return default if value is None else value
+
+    def trim(self):
+        """Evict least recently used, unpinned entries until within the limits"""
+        skipped = 0
+        while (len(self._entries) > self.max_items or self.bytes > self.max_bytes) \
+                and skipped < len(self._entries):
+            key = next(iter(self._entries))
+            if self.pinned(key):
+                # Dirty entries stay until written back; look past them
+                self._entries.move_to_end(key)
+                skipped += 1
+                continue
+            value = self._evicted[key] = self._entries.pop(key)
+            self.bytes -= self._sizes.pop(key, 0)
+            self.evictions += 1
+            if self.on_evict:
+                self.on_evict(key, value)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'items': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
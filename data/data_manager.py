@@ -1,116 +1,515 @@
-import json
-import os
+import time
 import logging
 import asyncio
+import inspect
+import weakref
 from datetime import datetime
-from typing import Dict, Optional
+from dataclasses import asdict, fields
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
 from pathlib import Path
-import uuid
+
+from config import User, Deal, DealHistoryEntry
+from data.storage import StorageBackend, VersionConflict, uninterrupted
+from data.json_storage import JsonStorage
+from data.sqlite_storage import SQLiteStorage
+from data.activity import ActivityTracker
+from data.registry import RegisteredUsers
+from data.leaderboard import Leaderboard
+from data.batch import Batch
+from data.cache import LRUCache
+from data.ids import new_id
 
 logger = logging.getLogger(__name__)
 
+def create_storage(backend: str, data_dir: Union[str, Path] = "data", redis_url: str = None) -> StorageBackend:
+    data_dir = Path(data_dir)
+    if backend == "json":
+        return JsonStorage(data_dir)
+    if backend == "sqlite":
+        return SQLiteStorage(data_dir / "discipline.db")
+    if backend == "redis":
+        # redis is an optional dependency, only needed for shared state
+        from data.redis_storage import RedisStorage
+        return RedisStorage.from_url(redis_url or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+def create_fsm_storage(kind: str = "memory", redis_url: str = None, client=None):
+    """aiogram FSM storage; "redis" keeps deal flows across restarts and workers"""
+    if kind == "memory":
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+    if kind == "redis":
+        from aiogram.fsm.storage.redis import RedisStorage
+        if client is not None:
+            return RedisStorage(client)
+        return RedisStorage.from_url(redis_url or "redis://localhost:6379/0")
+    raise ValueError(f"Unknown FSM storage: {kind}")
+
 class DataManager:
-    def __init__(self, data_dir: str = "data"):
+    """Identity map of live `User`/`Deal` objects over a storage backend.
+
+    Handlers mutate the objects returned by `get_user`/`get_deal` and call
+    `save_*`, which only marks them dirty. Dirty objects are serialized
+    once per flush, so a one-field update does not pay for a full
+    dict round-trip.
+
+    Every save bumps the object's `version`. `update_user`/`update_deal`
+    run a mutator on a private copy and compare-and-swap it in, retrying
+    if the record changed meanwhile; `deal_lock` serializes work that
+    cannot simply be retried.
+
+    The identity map is an LRU cache bounded by `cache_size` objects and
+    `cache_bytes` per table; dormant records are evicted once written
+    back and read through from storage on the next access.
+    """
+
+    def __init__(self, data_dir: str = "data", backend: str = "json", redis_url: str = None,
+                 flush_interval: float = 0.02, cache_size: int = 10_000,
+                 cache_bytes: int = 64 * 1024 * 1024):
         self.data_dir = Path(data_dir)
-        self.users_file = self.data_dir / "users.json"
-        self.deals_file = self.data_dir / "deals.json"
         self.logs_dir = self.data_dir / "logs"
-        
+        self.redis_url = redis_url
+        self.flush_interval = flush_interval
+
+        self._users = LRUCache(cache_size, cache_bytes, pinned=lambda key: key in self._dirty_users,
+                               on_evict=lambda key, user: self._on_evict('users', key, user))
+        self._deals = LRUCache(cache_size, cache_bytes, pinned=lambda key: key in self._dirty_deals,
+                               on_evict=lambda key, deal: self._on_evict('deals', key, deal))
+        self._dirty_users: Set[str] = set()
+        self._dirty_deals: Set[str] = set()
+        # deal id -> history events not yet appended to the backend
+        self._pending_history: Dict[str, List[dict]] = {}
+        self._has_dirty = asyncio.Event()
+
+        # (table, key) -> version the stored record has, checked by shared backends
+        self._persisted: Dict[Tuple[str, str], int] = {}
+        # Records a shared backend refused because another worker wrote them first
+        self._conflicts: Set[Tuple[str, str]] = set()
+        self._deal_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.cas_retries = 0
+        self.load_duration = 0.0
+        # Called with the id of every deal committed or deleted
+        self.deal_listeners: List[Callable[[str], None]] = []
+
         # Create directories if they don't exist
         self.data_dir.mkdir(exist_ok=True)
         self.logs_dir.mkdir(exist_ok=True)
-        
-        # Initialize empty data
-        self.users: Dict = {}
-        self.deals: Dict = {}
-        
+
+        self.storage = self._create_storage(backend)
+        self.storage.on_conflict = self._on_conflict
+        self.activity = ActivityTracker(self)
+        self.registered = RegisteredUsers(self.storage)
+        self.leaderboard = Leaderboard(self.storage)
+
         # Load data
         self.load_data()
-        
-        # Start auto-save
-        asyncio.create_task(self.auto_save())
-    
+
+        # Start dirty-object flushing, backend commits and periodic compaction
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self.storage.run()),
+            asyncio.create_task(self.activity.run()),
+            asyncio.create_task(self.registered.load()),
+            asyncio.create_task(self.leaderboard.load()),
+            asyncio.create_task(self.auto_save())
+        ]
+
+    def _create_storage(self, backend: str) -> StorageBackend:
+        return create_storage(backend, self.data_dir, self.redis_url)
+
     def load_data(self):
-        """Load data from JSON files"""
-        try:
-            if self.users_file.exists():
-                with open(self.users_file, 'r') as f:
-                    self.users = json.load(f)
-            
-            if self.deals_file.exists():
-                with open(self.deals_file, 'r') as f:
-                    self.deals = json.load(f)
-                    
-            logger.info("Data loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading data: {e}")
-            self._backup_corrupted_data()
-    
+        """Open the storage backend"""
+        started = time.perf_counter()
+        self.storage.load()
+        self.load_duration = time.perf_counter() - started
+
     async def save_data(self):
-        """Save data to JSON files"""
+        """Persist and compact everything written so far"""
+        await self.flush()
+        await self.activity.flush()
+        await self.storage.save_data()
+
+    async def flush(self):
+        """Serialize dirty objects into the storage backend as one batch"""
+        self._has_dirty.clear()
+        if not (self._dirty_users or self._dirty_deals or self._pending_history):
+            return
+        users = {key: self._users[key] for key in self._dirty_users if key in self._users}
+        deals = {key: self._deals[key] for key in self._dirty_deals if key in self._deals}
+        history, self._pending_history = self._pending_history, {}
+        self._dirty_users.clear()
+        self._dirty_deals.clear()
+        await self.commit(users, deals, history)
+        # Written back, so whatever is over the limits can go now
+        self._users.trim()
+        self._deals.trim()
+
+    def batch(self) -> Batch:
+        """Unit of work committed atomically on exit: `async with dm.batch() as batch:`"""
+        return Batch(self)
+
+    async def commit(self, users: Dict[str, User], deals: Dict[str, Deal],
+                     history: Dict[str, List[dict]]):
+        """Write live objects and history events in one atomic storage commit"""
+        for key, user in users.items():
+            self._users[key] = user
+            self._dirty_users.discard(key)
+            self._index_user(user)
+        for deal_id, deal in deals.items():
+            self._deals[deal_id] = deal
+            self._dirty_deals.discard(deal_id)
+            for listener in self.deal_listeners:
+                listener(deal_id)
+        # Events queued earlier for these deals must land before the batch's own
+        history = {
+            deal_id: self._pending_history.pop(deal_id, []) + history.get(deal_id, [])
+            for deal_id in deals.keys() | history.keys()
+        }
+        history = {deal_id: entries for deal_id, entries in history.items() if entries}
+
         try:
-            with open(self.users_file, 'w') as f:
-                json.dump(self.users, f, indent=2)
-            
-            with open(self.deals_file, 'w') as f:
-                json.dump(self.deals, f, indent=2)
-                
-            logger.info("Data saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving data: {e}")
-    
-    def _backup_corrupted_data(self):
-        """Backup corrupted data files"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        for file in [self.users_file, self.deals_file]:
-            if file.exists():
-                backup_file = self.logs_dir / f"{file.stem}_{timestamp}_corrupted{file.suffix}"
-                try:
-                    file.rename(backup_file)
-                    logger.info(f"Corrupted file backed up: {backup_file}")
-                except Exception as e:
-                    logger.error(f"Error backing up corrupted file: {e}")
-    
+            await self.storage.prepare_batch(list(deals))
+            # Serialize and read base versions only after the last yield, so
+            # the newest state is written against the newest known version
+            expected = None
+            if self.storage.shared:
+                expected = {('users', key): self._persisted.get(('users', key), 0) for key in users}
+                expected.update({('deals', key): self._persisted.get(('deals', key), 0) for key in deals})
+            await self.storage.apply_batch(
+                {key: user.to_dict() for key, user in users.items()},
+                {deal_id: deal.to_dict() for deal_id, deal in deals.items()},
+                history,
+                expected
+            )
+            for key, user in users.items():
+                self._persisted[('users', key)] = user.version
+            for deal_id, deal in deals.items():
+                self._persisted[('deals', deal_id)] = deal.version
+        except Exception:
+            self._dirty_users.update(users)
+            self._dirty_deals.update(deals)
+            for key, user in users.items():
+                self._users[key] = user
+            for deal_id, deal in deals.items():
+                self._deals[deal_id] = deal
+            for deal_id, entries in history.items():
+                self._pending_history[deal_id] = entries + self._pending_history.get(deal_id, [])
+            self._has_dirty.set()
+            raise
+
+    async def _flush_loop(self):
+        while True:
+            await self._has_dirty.wait()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await uninterrupted(self.flush())
+            except Exception as e:
+                logger.error(f"Error flushing data: {e}")
+                await asyncio.sleep(1)
+
+    def _on_conflict(self, record_ids: Set[Tuple[str, str]]):
+        """Drop local copies another worker superseded; the next read reloads them"""
+        for table, key in record_ids:
+            cache = self._users if table == 'users' else self._deals
+            cache.pop(key, None)
+            self._persisted.pop((table, key), None)
+            self._conflicts.add((table, key))
+            logger.warning(f"Lost update to {table[:-1]} {key}: changed by another worker")
+
+    def _on_evict(self, table: str, key: str, record: Union[User, Deal]):
+        # The stored version is still needed while someone holds the evicted object
+        weakref.finalize(record, self._forget, table, key)
+
+    def _forget(self, table: str, key: str):
+        cache = self._users if table == 'users' else self._deals
+        if key not in cache:
+            self._persisted.pop((table, key), None)
+
+    def pending_writes(self) -> Dict[str, int]:
+        """Dirty objects and history events not yet handed to the backend"""
+        return {
+            'users': len(self._dirty_users),
+            'deals': len(self._dirty_deals),
+            'history': sum(len(entries) for entries in self._pending_history.values())
+        }
+
+    def cache_stats(self) -> Dict[str, dict]:
+        """Hit/miss/eviction counters of the user and deal caches"""
+        return {'users': self._users.stats(), 'deals': self._deals.stats()}
+
+    @property
+    def last_snapshot(self) -> Dict:
+        return self.storage.last_snapshot
+
     async def auto_save(self):
-        """Automatically save data every 5 minutes"""
+        """Compact the store every 5 minutes"""
         while True:
             await asyncio.sleep(300)  # 5 minutes
-            await self.save_data()
-    
+            await uninterrupted(self.save_data())
+
+    async def close(self):
+        """Stop the background loops, flush pending writes and close the backend"""
+        for task in self._tasks:
+            task.cancel()
+        # Each loop finishes the flush it is in before stopping
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+        await self.activity.flush()
+        await self.storage.close()
+
+    def _materialize_deal(self, deal_data: dict) -> Deal:
+        deal = self._deals.peek(deal_data['id'])
+        if deal is None:
+            deal = self._deals[deal_data['id']] = Deal.from_dict(deal_data)
+            self._persisted[('deals', deal.id)] = deal.version
+            if deal_data.get('history'):
+                self._migrate_history(deal, deal_data['history'])
+        return deal
+
+    def _migrate_history(self, deal: Deal, entries: List[dict]):
+        """Move a legacy inline history list into the event log"""
+        self._pending_history[deal.id] = entries + self._pending_history.get(deal.id, [])
+        deal.history_count = len(entries)
+        deal.last_event = DealHistoryEntry(**entries[-1])
+        self._dirty_deals.add(deal.id)
+        self._has_dirty.set()
+
     # User methods
-    def get_user(self, user_id: int) -> Optional[dict]:
-        return self.users.get(str(user_id))
-    
-    def save_user(self, user_id: int, user_data: dict):
-        self.users[str(user_id)] = user_data
-    
-    def delete_user(self, user_id: int):
-        self.users.pop(str(user_id), None)
-    
+    def peek_user(self, user_id: int) -> Optional[User]:
+        """The live user object if one is loaded; no storage read, LRU or hit-rate effect"""
+        return self._users.peek(str(user_id))
+
+    async def get_user(self, user_id: int) -> Optional[User]:
+        key = str(user_id)
+        user = self._users.get(key)
+        if user is None:
+            user_data = await self.storage.get_user(key)
+            if user_data is None:
+                return None
+            # Another task may have loaded it while we were waiting
+            user = self._users.peek(key)
+            if user is None:
+                user = self._users[key] = User.from_dict(user_data)
+                self._persisted[('users', key)] = user.version
+                if self.storage.shared and user.is_registered:
+                    # Pick up reputation changes made by other workers
+                    self.leaderboard.update(int(user.id), user.reputation)
+        return user
+
+    async def get_users(self, user_ids: List[int]) -> List[User]:
+        """Load several users with one storage round-trip for the uncached ones"""
+        keys = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        # Hold the results here: with a small cache, loading can evict earlier ones
+        found, missing = {}, []
+        for key in keys:
+            user = self._users.get(key)
+            if user is None:
+                missing.append(key)
+            else:
+                found[key] = user
+        if missing:
+            for key, user_data in (await self.storage.get_users(missing)).items():
+                user = self._users.peek(key)
+                if user is None:
+                    user = self._users[key] = User.from_dict(user_data)
+                    self._persisted[('users', key)] = user.version
+                found[key] = user
+        return [found[key] for key in keys if key in found]
+
+    async def save_user(self, user: User):
+        key = str(user.id)
+        user.version += 1
+        self._users[key] = user
+        self._index_user(user)
+        self._dirty_users.add(key)
+        self._has_dirty.set()
+
+    def _index_user(self, user: User):
+        if user.is_registered:
+            self.registered.add(int(user.id))
+            self.leaderboard.update(int(user.id), user.reputation)
+        else:
+            self.registered.discard(int(user.id))
+            self.leaderboard.discard(int(user.id))
+
+    def touch_user(self, user_id: int):
+        """Record activity; persisted in the next activity batch"""
+        self.activity.touch(user_id)
+
+    async def last_seen(self, user_id: int) -> Optional[str]:
+        return await self.activity.last_seen(user_id)
+
+    async def is_registered(self, user_id: int) -> bool:
+        """Registration gate backed by an in-memory id set"""
+        return await self.registered.contains(user_id)
+
+    async def delete_user(self, user_id: int):
+        self.registered.discard(int(user_id))
+        self.leaderboard.discard(int(user_id))
+        key = str(user_id)
+        self._users.pop(key, None)
+        self._dirty_users.discard(key)
+        self._persisted.pop(('users', key), None)
+        await self.storage.delete_user(key)
+
     # Deal methods
-    def get_deal(self, deal_id: str) -> Optional[dict]:
-        return self.deals.get(deal_id)
-    
-    def save_deal(self, deal_id: str, deal_data: dict):
-        self.deals[deal_id] = deal_data
-    
-    def delete_deal(self, deal_id: str):
-        self.deals.pop(deal_id, None)
-    
-    def get_user_deals(self, user_id: int) -> list:
-        return [
-            deal for deal in self.deals.values()
-            if str(user_id) in [str(deal['creator_id']), *map(str, deal.get('members', []))]
-        ] 
-    
-    def create_deal(self, deal_data: Dict) -> str:
-        deal_id = str(uuid.uuid4())
-        self.data["deals"][deal_id] = deal_data
-        logging.info(f"Deal {deal_id} created.")
-        return deal_id
-    
-    def update_deal(self, deal_id: str, update_data: Dict):
-        if deal_id in self.data["deals"]:
-            self.data["deals"][deal_id].update(update_data)
-            logging.info(f"Deal {deal_id} updated.") 
\ No newline at end of file
+    async def get_deal(self, deal_id: str) -> Optional[Deal]:
+        deal = self._deals.get(deal_id)
+        if deal is None:
+            deal_data = await self.storage.get_deal(deal_id)
+            if deal_data is None:
+                return None
+            deal = self._materialize_deal(deal_data)
+        return deal
+
+    async def save_deal(self, deal: Deal):
+        deal.version += 1
+        deal.updated_at = datetime.now().isoformat()
+        self._deals[deal.id] = deal
+        self._dirty_deals.add(deal.id)
+        self._has_dirty.set()
+
+    async def delete_deal(self, deal_id: str):
+        self._deals.pop(deal_id, None)
+        self._dirty_deals.discard(deal_id)
+        self._pending_history.pop(deal_id, None)
+        self._persisted.pop(('deals', deal_id), None)
+        await self.storage.delete_deal(deal_id)
+        for listener in self.deal_listeners:
+            listener(deal_id)
+
+    async def add_deal_history(self, deal: Deal, action: str, user_id: int) -> DealHistoryEntry:
+        """Append an event; only the counter and last event touch the deal record"""
+        entry = DealHistoryEntry(
+            timestamp=datetime.now().isoformat(),
+            action=action,
+            user_id=user_id
+        )
+        self._pending_history.setdefault(deal.id, []).append(asdict(entry))
+        deal.history_count += 1
+        deal.last_event = entry
+        await self.save_deal(deal)
+        return entry
+
+    async def get_deal_history(self, deal_id: str, cursor: int = 0,
+                               limit: int = 50) -> Tuple[List[DealHistoryEntry], Optional[int]]:
+        """One page of a deal's events, oldest first, and the cursor for the next page"""
+        # Loading the deal migrates a legacy inline history first
+        if not await self.get_deal(deal_id):
+            return [], None
+        if deal_id in self._pending_history:
+            await self.flush()
+        entries, next_cursor = await self.storage.get_history(deal_id, cursor, limit)
+        return [DealHistoryEntry(**entry) for entry in entries], next_cursor
+
+    # Index queries run against the backend, so pending deal writes go first
+    async def get_user_deals(self, user_id: int, status: str = None, offset: int = 0, limit: int = None) -> List[Deal]:
+        """Deals the user created or joined, optionally one status bucket and one page"""
+        if self._dirty_deals:
+            await self.flush()
+        deals = await self.storage.get_user_deals(str(user_id), status, offset, limit)
+        return [self._materialize_deal(deal_data) for deal_data in deals]
+
+    async def get_deal_by_group(self, group_id: int) -> Optional[Deal]:
+        if self._dirty_deals:
+            await self.flush()
+        deal_data = await self.storage.get_deal_by_group(str(group_id))
+        return self._materialize_deal(deal_data) if deal_data else None
+
+    async def get_deals_created(self, start: datetime = None, end: datetime = None,
+                                limit: int = None) -> List[Deal]:
+        """Deals created in [start, end), oldest first"""
+        if self._dirty_deals:
+            await self.flush()
+        deals = await self.storage.get_deals_by_time(
+            start.isoformat() if start else None, end.isoformat() if end else None, limit
+        )
+        return [self._materialize_deal(deal_data) for deal_data in deals]
+
+    async def get_latest_deals(self, limit: int, before: datetime = None) -> List[Deal]:
+        """The `limit` most recently created deals, newest first"""
+        if self._dirty_deals:
+            await self.flush()
+        deals = await self.storage.get_deals_by_time(
+            None, before.isoformat() if before else None, limit, newest_first=True
+        )
+        return [self._materialize_deal(deal_data) for deal_data in deals]
+
+    async def count_user_deals(self, user_id: int, status: str = None) -> int:
+        if self._dirty_deals:
+            await self.flush()
+        return await self.storage.count_user_deals(str(user_id), status)
+
+    async def create_deal(self, deal: Deal) -> str:
+        if not deal.id:
+            deal.id = new_id()
+        await self.save_deal(deal)
+        logging.info(f"Deal {deal.id} created.")
+        return deal.id
+
+    def deal_lock(self, deal_id: str) -> asyncio.Lock:
+        """Per-deal lock for multi-step work that must not interleave or be retried"""
+        lock = self._deal_locks.get(deal_id)
+        if lock is None:
+            lock = self._deal_locks[deal_id] = asyncio.Lock()
+        return lock
+
+    async def update_deal(self, deal_id: str, mutator: Callable[[Deal], Union[Optional[bool], Awaitable]] = None,
+                          retries: int = 5, **changes) -> Optional[Deal]:
+        """Compare-and-swap update; `mutator` may return False to abort.
+
+        Without a mutator, `changes` are set as attributes. Returns the
+        live deal, or None if it does not exist or the mutator aborted.
+        """
+        if mutator is None:
+            def mutator(deal: Deal):
+                for key, value in changes.items():
+                    setattr(deal, key, value)
+        deal = await self._update('deals', deal_id, mutator, retries)
+        if deal:
+            logging.info(f"Deal {deal_id} updated.")
+        return deal
+
+    async def update_user(self, user_id: int, mutator: Callable[[User], Union[Optional[bool], Awaitable]],
+                          retries: int = 5) -> Optional[User]:
+        """Compare-and-swap update of a user; see `update_deal`"""
+        return await self._update('users', str(user_id), mutator, retries)
+
+    async def _update(self, table: str, key: str, mutator, retries: int):
+        cls, cache = (User, self._users) if table == 'users' else (Deal, self._deals)
+        load = self.get_user if table == 'users' else self.get_deal
+
+        for _ in range(retries):
+            live = await load(key)
+            if live is None:
+                return None
+            base = live.version
+            # The mutator works on a private copy, so a failed attempt leaves no trace
+            draft = cls.from_dict(live.to_dict())
+            result = mutator(draft)
+            if inspect.isawaitable(result):
+                result = await result
+            if result is False:
+                return None
+
+            # Compare-and-swap; nothing from here to the save yields
+            if cache.peek(key) is not live or live.version != base:
+                self.cas_retries += 1
+                continue
+            for field in fields(cls):
+                setattr(live, field.name, getattr(draft, field.name))
+            live.version = base
+            await (self.save_user(live) if table == 'users' else self.save_deal(live))
+
+            if self.storage.shared:
+                # Confirm the write against other workers before reporting success
+                self._conflicts.discard((table, key))
+                await self.flush()
+                await self.storage.commit()
+                if (table, key) in self._conflicts:
+                    self.cas_retries += 1
+                    continue
+            return live
+
+        raise VersionConflict(table, key)
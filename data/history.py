@@ -0,0 +1,104 @@
+import json
+import logging
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from data.storage import uninterrupted
+from data.wal import append_synced
+
+logger = logging.getLogger(__name__)
+
+class HistoryLog:
+    """Per-deal append-only event files (`<deal_id>.jsonl`).
+
+    Appends are buffered and written + fsynced in groups like the WAL, so
+    adding an event costs O(1) regardless of how long the history is.
+    Reads page through a file from a byte-offset cursor and never load
+    more than one page.
+    """
+
+    def __init__(self, directory: Path, commit_interval: float = 0.05):
+        self.directory = Path(directory)
+        self.commit_interval = commit_interval
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._pending: Dict[str, List[str]] = {}
+        self._has_pending = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+
+    def _path(self, deal_id: str) -> Path:
+        return self.directory / f"{deal_id}.jsonl"
+
+    def append(self, deal_id: str, entries: List[dict]):
+        """Buffer events until the next group commit"""
+        self._pending.setdefault(deal_id, []).extend(
+            json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries
+        )
+        self._has_pending.set()
+
+    async def run(self):
+        while True:
+            await self._has_pending.wait()
+            await asyncio.sleep(self.commit_interval)
+            try:
+                await uninterrupted(self.commit())
+            except Exception as e:
+                logger.error(f"Error committing deal history: {e}")
+                await asyncio.sleep(1)
+
+    async def commit(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._has_pending.clear()
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self._executor, self._write, batch)
+            except Exception:
+                for deal_id, lines in self._pending.items():
+                    batch.setdefault(deal_id, []).extend(lines)
+                self._pending = batch
+                self._has_pending.set()
+                raise
+
+    def _write(self, batch: Dict[str, List[str]]):
+        # Deals leave the batch once synced, so a failure requeues only the rest
+        for deal_id in list(batch):
+            with open(self._path(deal_id), 'ab', buffering=0) as f:
+                append_synced(f, ''.join(batch[deal_id]).encode('utf-8'))
+            del batch[deal_id]
+
+    async def read(self, deal_id: str, cursor: int = 0, limit: int = 50) -> Tuple[List[dict], Optional[int]]:
+        """One page of events starting at byte offset `cursor`"""
+        if deal_id in self._pending:
+            await self.commit()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._read, deal_id, cursor, limit)
+
+    def _read(self, deal_id: str, cursor: int, limit: int) -> Tuple[List[dict], Optional[int]]:
+        path = self._path(deal_id)
+        if not path.exists():
+            return [], None
+        entries = []
+        with open(path, 'rb') as f:
+            f.seek(cursor)
+            while len(entries) < limit:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    # End of file, or a torn tail from a crash mid-write
+                    return entries, None
+                entries.append(json.loads(line))
+            next_cursor = f.tell()
+            return entries, next_cursor if f.readline().endswith(b'\n') else None
+
+    async def delete(self, deal_id: str):
+        self._pending.pop(deal_id, None)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._path(deal_id).unlink, True)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
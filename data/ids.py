@@ -0,0 +1,62 @@
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Callable, Optional
+
+# Crockford base32: no I, L, O or U
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_VALUES = {char: value for value, char in enumerate(ALPHABET)}
+ID_LENGTH = 26
+
+def _encode(value: int) -> str:
+    chars = [''] * ID_LENGTH
+    for i in range(ID_LENGTH - 1, -1, -1):
+        chars[i] = ALPHABET[value & 31]
+        value >>= 5
+    return ''.join(chars)
+
+class IdGenerator:
+    """ULID-style ids: a 48-bit millisecond timestamp then 80 random bits, as 26 base32 chars.
+
+    Ids sort by creation time as plain strings. Within one millisecond,
+    or if the clock steps back, the random part of the previous id is
+    incremented rather than redrawn, so ids from one generator strictly
+    increase. Different processes only share the timestamp order.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._last_ms = 0
+        self._last_random = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            ms = int(self._clock() * 1000)
+            if ms > self._last_ms:
+                random = int.from_bytes(os.urandom(10), 'big')
+            else:
+                ms, random = self._last_ms, self._last_random + 1
+                if random >> 80:
+                    # 2^80 ids in one millisecond: borrow the next one
+                    ms, random = ms + 1, int.from_bytes(os.urandom(10), 'big')
+            self._last_ms, self._last_random = ms, random
+        return _encode(ms << 80 | random)
+
+new_id = IdGenerator()
+
+def is_id(value: str) -> bool:
+    return (
+        isinstance(value, str) and len(value) == ID_LENGTH and value[0] <= '7'
+        and all(char in _VALUES for char in value)
+    )
+
+def id_time(value: str) -> Optional[datetime]:
+    """Creation time encoded in an id from `new_id`; None for other ids"""
+    if not is_id(value):
+        return None
+    ms = 0
+    for char in value[:10]:
+        ms = ms << 5 | _VALUES[char]
+    return datetime.fromtimestamp(ms / 1000)
@@ -0,0 +1,155 @@
+from bisect import bisect_left
+from itertools import chain, islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class MemberIndex:
+    """Inverted index: user id -> deal status -> deal ids.
+
+    Deal ids are kept in insertion-ordered dicts so a page of k deals
+    for one user and status costs O(k) instead of a scan over all deals.
+    """
+
+    def __init__(self):
+        self._index: Dict[str, Dict[str, Dict[str, None]]] = {}
+
+    @staticmethod
+    def _members(deal: dict) -> set:
+        members = set(map(str, deal.get('members') or []))
+        if deal.get('creator_id') is not None:
+            members.add(str(deal['creator_id']))
+        return members
+
+    def add(self, deal_id: str, deal: dict):
+        status = deal.get('status', 'active')
+        for member in self._members(deal):
+            self._index.setdefault(member, {}).setdefault(status, {})[deal_id] = None
+
+    def remove(self, deal_id: str, deal: dict):
+        status = deal.get('status', 'active')
+        for member in self._members(deal):
+            buckets = self._index.get(member)
+            if not buckets or status not in buckets:
+                continue
+            buckets[status].pop(deal_id, None)
+            if not buckets[status]:
+                del buckets[status]
+            if not buckets:
+                del self._index[member]
+
+    def update(self, deal_id: str, old: Optional[dict], new: Optional[dict]):
+        """Move a deal between buckets after a write; no-op if nothing indexed changed"""
+        if old and new and old.get('status') == new.get('status') \
+                and self._members(old) == self._members(new):
+            return
+        if old:
+            self.remove(deal_id, old)
+        if new:
+            self.add(deal_id, new)
+
+    def rebuild(self, deals: Dict[str, dict]):
+        self._index = {}
+        for deal_id, deal in deals.items():
+            self.add(deal_id, deal)
+
+    def deal_ids(self, user_id, status: str = None, offset: int = 0, limit: int = None) -> List[str]:
+        buckets = self._index.get(str(user_id), {})
+        if status is not None:
+            ids: Iterable[str] = buckets.get(status, {})
+        else:
+            ids = chain.from_iterable(buckets.values())
+        stop = offset + limit if limit is not None else None
+        return list(islice(ids, offset, stop))
+
+    def count(self, user_id, status: str = None) -> int:
+        buckets = self._index.get(str(user_id), {})
+        if status is not None:
+            return len(buckets.get(status, {}))
+        return sum(len(ids) for ids in buckets.values())
+
+class GroupIndex:
+    """Unique index: Telegram group id -> deal id"""
+
+    def __init__(self):
+        self._index: Dict[str, str] = {}
+
+    def update(self, deal_id: str, old: Optional[dict], new: Optional[dict]):
+        old_group = old.get('group_id') if old else None
+        new_group = new.get('group_id') if new else None
+        if old_group == new_group:
+            return
+        # Only drop the mapping if it still points at this deal
+        if old_group is not None and self._index.get(str(old_group)) == deal_id:
+            del self._index[str(old_group)]
+        if new_group is not None:
+            self._index[str(new_group)] = deal_id
+
+    def rebuild(self, deals: Dict[str, dict]):
+        self._index = {
+            str(deal['group_id']): deal_id
+            for deal_id, deal in deals.items()
+            if deal.get('group_id') is not None
+        }
+
+    def deal_id(self, group_id) -> Optional[str]:
+        return self._index.get(str(group_id))
+
+class TimeIndex:
+    """Deal ids ordered by `created_at`, for time-range and latest-N queries.
+
+    Entries are (created_at, deal id) pairs in one sorted list. New
+    deals carry the newest timestamps, so an insert is usually an
+    append, and a range query is two bisects and a slice.
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _entry(deal_id: str, deal: dict) -> Tuple[str, str]:
+        return deal.get('created_at') or '', deal_id
+
+    def add(self, deal_id: str, deal: dict):
+        entry = self._entry(deal_id, deal)
+        entries = self._entries
+        if not entries or entries[-1] < entry:
+            entries.append(entry)
+            return
+        i = bisect_left(entries, entry)
+        if i == len(entries) or entries[i] != entry:
+            entries.insert(i, entry)
+
+    def remove(self, deal_id: str, deal: dict):
+        entry = self._entry(deal_id, deal)
+        i = bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+
+    def update(self, deal_id: str, old: Optional[dict], new: Optional[dict]):
+        if old and new and old.get('created_at') == new.get('created_at'):
+            return
+        if old:
+            self.remove(deal_id, old)
+        if new:
+            self.add(deal_id, new)
+
+    def rebuild(self, deals: Dict[str, dict]):
+        self._entries = sorted(self._entry(deal_id, deal) for deal_id, deal in deals.items())
+
+    def deal_ids(self, start: str = None, end: str = None, limit: int = None,
+                 newest_first: bool = False) -> List[str]:
+        """Ids created in [start, end) (ISO timestamps), oldest first unless `newest_first`"""
+        entries = self._entries
+        lo = bisect_left(entries, (start,)) if start else 0
+        hi = bisect_left(entries, (end,)) if end else len(entries)
+        if limit is not None:
+            if newest_first:
+                lo = max(lo, hi - limit)
+            else:
+                hi = min(hi, lo + limit)
+        ids = [deal_id for _, deal_id in entries[lo:hi]]
+        if newest_first:
+            ids.reverse()
+        return ids
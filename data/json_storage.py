@@ -0,0 +1,355 @@
+import json
+import os
+import logging
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+
+from data.storage import StorageBackend
+from data.snapshot import Snapshot, LazyTable, write_snapshot, user_meta, deal_meta
+from data.wal import WriteAheadLog
+from data.history import HistoryLog
+from data.indexes import MemberIndex, GroupIndex, TimeIndex
+
+logger = logging.getLogger(__name__)
+
+def atomic_write_json(path: Path, data) -> int:
+    """Write compact JSON to a temp file and atomically rename it over `path`"""
+    payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    tmp_file = path.with_name(f".{path.name}.tmp")
+    with open(tmp_file, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+    # Persist the rename itself
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return len(payload)
+
+class JsonStorage(StorageBackend):
+    """In-memory store persisted as binary snapshots plus a write-ahead log.
+
+    Records stay encoded in the memory-mapped snapshot until first read.
+    users.json / deals.json are only read when there is no snapshot yet,
+    so they serve as the import path (see `python -m data.snapshot`).
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self.snapshot_file = self.data_dir / "snapshot.bin"
+        self.users_file = self.data_dir / "users.json"
+        self.deals_file = self.data_dir / "deals.json"
+        self.logs_dir = self.data_dir / "logs"
+        self.wal_file = self.data_dir / "wal.log"
+
+        self.snapshot: Optional[Snapshot] = None
+        self.users = LazyTable()
+        self.deals = LazyTable()
+        self.member_index = MemberIndex()
+        self.group_index = GroupIndex()
+        self.time_index = TimeIndex()
+        # Registered user id -> reputation
+        self._registered: Dict[str, int] = {}
+
+        # Every mutation is appended here; snapshots only compact it
+        self.wal = WriteAheadLog(self.wal_file)
+        self.history = HistoryLog(self.data_dir / "history")
+        self._snapshot_lock = asyncio.Lock()
+        self.last_snapshot: Dict = {}
+
+    def load(self):
+        """Map the snapshot (or import the JSON files) and replay the WAL on top of it"""
+        started = time.perf_counter()
+        if self.snapshot_file.exists():
+            try:
+                self._load_snapshot()
+            except Exception as e:
+                logger.error(f"Error loading snapshot: {e}")
+                self._backup_corrupted_data([self.snapshot_file])
+        elif self.users_file.exists() or self.deals_file.exists():
+            try:
+                self._import_json()
+            except Exception as e:
+                logger.error(f"Error loading data: {e}")
+                self._backup_corrupted_data([self.users_file, self.deals_file])
+
+        try:
+            replayed = self.wal.replay(self._apply_wal_record)
+            if replayed:
+                logger.info(f"Replayed {replayed} WAL records")
+        except Exception as e:
+            # Starting without the logged writes would lose them at the next snapshot
+            logger.error(f"Error replaying WAL: {e}")
+            raise
+
+        logger.info(
+            f"Data loaded successfully: {len(self.users)} users, {len(self.deals)} deals "
+            f"in {time.perf_counter() - started:.3f}s"
+        )
+
+    def _load_snapshot(self):
+        """Map the snapshot and build the indexes from its metadata, decoding no records"""
+        snapshot = Snapshot(self.snapshot_file)
+        users, deals = snapshot.table('users'), snapshot.table('deals')
+        # Records whose metadata predates an index are decoded once and
+        # rewritten by the next save with current metadata
+        upgraded_users, upgraded_deals = {}, {}
+        if users is not None:
+            for user_id, meta in zip(users.keys, users.meta):
+                if not isinstance(meta, list):
+                    upgraded_users[user_id] = users.get(user_id)
+                    meta = user_meta(upgraded_users[user_id])
+                if meta[0]:
+                    self._registered[user_id] = meta[1]
+        if deals is not None:
+            metas = {}
+            for deal_id, meta in zip(deals.keys, deals.meta):
+                if 'created_at' not in meta:
+                    upgraded_deals[deal_id] = deals.get(deal_id)
+                    meta = deal_meta(upgraded_deals[deal_id])
+                self.member_index.add(deal_id, meta)
+                self.group_index.update(deal_id, None, meta)
+                metas[deal_id] = meta
+            self.time_index.rebuild(metas)
+        self.snapshot = snapshot
+        self.users, self.deals = LazyTable(users, upgraded_users), LazyTable(deals, upgraded_deals)
+        if upgraded_users or upgraded_deals:
+            logger.info(f"Upgrading snapshot metadata of {len(upgraded_users)} users and {len(upgraded_deals)} deals")
+
+    def _import_json(self):
+        """Load users.json / deals.json; the next save converts them to a snapshot.
+
+        The files are left in place: once snapshot.bin exists `load` no
+        longer reads them.
+        """
+        users, deals = {}, {}
+        if self.users_file.exists():
+            with open(self.users_file, 'r') as f:
+                users = json.load(f)
+        if self.deals_file.exists():
+            with open(self.deals_file, 'r') as f:
+                deals = json.load(f)
+
+        self.users, self.deals = LazyTable(overlay=users), LazyTable(overlay=deals)
+        self._registered = {
+            user_id: user_data.get('reputation', 0)
+            for user_id, user_data in users.items() if user_data.get('is_registered')
+        }
+        self.member_index.rebuild(deals)
+        self.group_index.rebuild(deals)
+        self.time_index.rebuild(deals)
+        logger.info(f"Imported {len(users)} users and {len(deals)} deals from JSON")
+
+    def _apply_wal_record(self, record: dict):
+        if record['op'] == 'batch':
+            for op in record['ops']:
+                self._apply_wal_record(op)
+            return
+        key = record['k']
+        if record['t'] == 'users':
+            if record['op'] == 'put':
+                self._put_user(key, record['v'])
+            elif record['op'] == 'del':
+                self._pop_user(key)
+            elif record['op'] == 'touch' and key in self.users:
+                self.users[key] = {**self.users[key], 'last_active': record['v']}
+        elif record['op'] == 'put':
+            self._put_deal(key, record['v'])
+        elif record['op'] == 'del':
+            self._pop_deal(key)
+
+    def _put_user(self, user_id: str, user_data: dict):
+        self.users[user_id] = user_data
+        if user_data.get('is_registered'):
+            self._registered[user_id] = user_data.get('reputation', 0)
+        else:
+            self._registered.pop(user_id, None)
+
+    def _pop_user(self, user_id: str) -> Optional[dict]:
+        self._registered.pop(user_id, None)
+        return self.users.pop(user_id, None)
+
+    def _put_deal(self, deal_id: str, deal_data: dict):
+        old_data = self.deals.get(deal_id)
+        self.deals[deal_id] = deal_data
+        self.member_index.update(deal_id, old_data, deal_data)
+        self.group_index.update(deal_id, old_data, deal_data)
+        self.time_index.update(deal_id, old_data, deal_data)
+
+    def _pop_deal(self, deal_id: str) -> Optional[dict]:
+        deal_data = self.deals.pop(deal_id, None)
+        if deal_data is not None:
+            self.member_index.remove(deal_id, deal_data)
+            self.group_index.update(deal_id, deal_data, None)
+            self.time_index.remove(deal_id, deal_data)
+        return deal_data
+
+    async def run(self):
+        await asyncio.gather(self.wal.run(), self.history.run())
+
+    async def apply_batch(self, users: Dict[str, dict], deals: Dict[str, dict],
+                          history: Dict[str, List[dict]], expected: Dict[Tuple[str, str], int] = None):
+        records = []
+        for user_id, user_data in users.items():
+            self._put_user(user_id, user_data)
+            records.append({'op': 'put', 't': 'users', 'k': user_id, 'v': user_data})
+        for deal_id, deal_data in deals.items():
+            self._put_deal(deal_id, deal_data)
+            records.append({'op': 'put', 't': 'deals', 'k': deal_id, 'v': deal_data})
+        if records:
+            self.wal.append_batch(records)
+        for deal_id, entries in history.items():
+            self.history.append(deal_id, entries)
+
+    async def save_data(self):
+        """Compact the WAL into a fresh binary snapshot without blocking the loop"""
+        if not (self.wal.size or self.wal.has_pending) and self.last_snapshot:
+            return
+        async with self._snapshot_lock:
+            try:
+                started = time.perf_counter()
+                # Seal the log first so the snapshot covers every sealed segment
+                segments = await self.wal.rotate()
+
+                # Records are replaced, never mutated in place, so copying the
+                # overlays is a consistent frozen view of the store
+                users, deals = self.users.freeze(), self.deals.freeze()
+                frozen_at = time.perf_counter()
+
+                loop = asyncio.get_running_loop()
+                size, snapshot = await loop.run_in_executor(None, self._write_snapshot, users, deals)
+
+                # Swap in the new file; changes made meanwhile stay in the overlays
+                old_snapshot, self.snapshot = self.snapshot, snapshot
+                self.users.rebase(snapshot.table('users'), users)
+                self.deals.rebase(snapshot.table('deals'), deals)
+                if old_snapshot is not None:
+                    old_snapshot.close()
+
+                self.wal.drop_segments(segments)
+                self.last_snapshot = {
+                    'timestamp': datetime.now().isoformat(),
+                    'duration': time.perf_counter() - started,
+                    'freeze_duration': frozen_at - started,
+                    'bytes': size,
+                    'users': len(self.users),
+                    'deals': len(self.deals)
+                }
+                logger.info(
+                    f"Data saved successfully: {size} bytes in "
+                    f"{self.last_snapshot['duration']:.3f}s "
+                    f"(loop blocked {self.last_snapshot['freeze_duration']:.3f}s)"
+                )
+            except Exception as e:
+                logger.error(f"Error saving data: {e}")
+
+    def _write_snapshot(self, users, deals) -> Tuple[int, Snapshot]:
+        """Atomically replace the snapshot file and map the new one"""
+        size = write_snapshot(self.snapshot_file, {
+            'users': (users, user_meta),
+            'deals': (deals, deal_meta)
+        })
+        # The file was just checksummed while writing; skip re-verifying it
+        return size, Snapshot(self.snapshot_file, verify=False)
+
+    def _backup_corrupted_data(self, files: List[Path]):
+        """Backup corrupted data files"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        for file in files:
+            if file.exists():
+                backup_file = self.logs_dir / f"{file.stem}_{timestamp}_corrupted{file.suffix}"
+                try:
+                    file.rename(backup_file)
+                    logger.info(f"Corrupted file backed up: {backup_file}")
+                except Exception as e:
+                    logger.error(f"Error backing up corrupted file: {e}")
+
+    async def close(self):
+        """Flush pending WAL records and write a final snapshot"""
+        await self.wal.commit()
+        await self.history.commit()
+        await self.save_data()
+        self.wal.close()
+        self.history.close()
+        if self.snapshot is not None:
+            self.snapshot.close()
+
+    # User methods
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        return self.users.get(user_id)
+
+    async def get_users(self, user_ids: List[str]) -> Dict[str, dict]:
+        return {user_id: self.users[user_id] for user_id in user_ids if user_id in self.users}
+
+    async def save_user(self, user_id: str, user_data: dict):
+        self._put_user(user_id, user_data)
+        self.wal.append('put', 'users', user_id, user_data)
+
+    async def delete_user(self, user_id: str):
+        if self._pop_user(user_id) is not None:
+            self.wal.append('del', 'users', user_id)
+
+    async def touch_users(self, timestamps: Dict[str, str]):
+        for user_id, last_active in timestamps.items():
+            user_data = self.users.get(user_id)
+            if user_data is not None:
+                self.users[user_id] = {**user_data, 'last_active': last_active}
+                self.wal.append('touch', 'users', user_id, last_active)
+
+    async def get_last_active(self, user_id: str) -> Optional[str]:
+        user_data = self.users.get(user_id)
+        return user_data.get('last_active') if user_data else None
+
+    async def registered_user_ids(self) -> List[str]:
+        return list(self._registered)
+
+    async def is_registered(self, user_id: str) -> bool:
+        return user_id in self._registered
+
+    async def user_reputations(self) -> Dict[str, int]:
+        return dict(self._registered)
+
+    # Deal methods
+    async def get_deal(self, deal_id: str) -> Optional[dict]:
+        return self.deals.get(deal_id)
+
+    async def save_deal(self, deal_id: str, deal_data: dict):
+        self._put_deal(deal_id, deal_data)
+        self.wal.append('put', 'deals', deal_id, deal_data)
+
+    async def delete_deal(self, deal_id: str):
+        if self._pop_deal(deal_id) is not None:
+            self.wal.append('del', 'deals', deal_id)
+        await self.history.delete(deal_id)
+
+    async def get_user_deals(self, user_id: str, status: str = None,
+                             offset: int = 0, limit: int = None) -> List[dict]:
+        deal_ids = self.member_index.deal_ids(user_id, status, offset, limit)
+        return [self.deals[deal_id] for deal_id in deal_ids]
+
+    async def count_user_deals(self, user_id: str, status: str = None) -> int:
+        return self.member_index.count(user_id, status)
+
+    async def get_deal_by_group(self, group_id: str) -> Optional[dict]:
+        deal_id = self.group_index.deal_id(group_id)
+        return self.deals.get(deal_id) if deal_id else None
+
+    async def get_deals_by_time(self, start: str = None, end: str = None, limit: int = None,
+                                newest_first: bool = False) -> List[dict]:
+        deal_ids = self.time_index.deal_ids(start, end, limit, newest_first)
+        return [self.deals[deal_id] for deal_id in deal_ids]
+
+    async def append_history(self, deal_id: str, entries: List[dict]):
+        self.history.append(deal_id, entries)
+
+    async def get_history(self, deal_id: str, cursor: int = 0,
+                          limit: int = 50) -> Tuple[List[dict], Optional[int]]:
+        return await self.history.read(deal_id, cursor, limit)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from data.skiplist import IndexableSkipList
+
+logger = logging.getLogger(__name__)
+
+class Leaderboard:
+    """Registered users ranked by reputation.
+
+    Entries are (-reputation, user id) keys in an indexable skip list, so
+    the top k users cost O(log n + k) and a user's rank O(log n). DataManager
+    calls `update` on every user save, which is a dict lookup unless the
+    reputation changed. With a shared backend the board reflects the
+    store at startup plus this worker's own writes.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.loaded = False
+        self._reputations: Dict[int, int] = {}
+        self._ranked = IndexableSkipList()
+        # Users dropped while the initial load was in flight
+        self._discarded = set()
+
+    async def load(self):
+        try:
+            stored = await self.storage.user_reputations()
+        except Exception as e:
+            logger.error(f"Error loading leaderboard: {e}")
+            return
+        reputations = {int(user_id): reputation for user_id, reputation in stored.items()
+                       if user_id.lstrip('-').isdigit() and int(user_id) not in self._discarded}
+        # Changes made since the load started are newer than the stored values
+        reputations.update(self._reputations)
+        keys = sorted((-reputation, user_id) for user_id, reputation in reputations.items())
+        loop = asyncio.get_running_loop()
+        ranked = await loop.run_in_executor(None, IndexableSkipList, keys)
+
+        # Replay whatever changed while the list was being built
+        for user_id, reputation in self._reputations.items():
+            if reputations.get(user_id) != reputation:
+                old = reputations.get(user_id)
+                if old is not None:
+                    ranked.remove((-old, user_id))
+                ranked.add((-reputation, user_id))
+                reputations[user_id] = reputation
+        for user_id in self._discarded:
+            old = reputations.pop(user_id, None)
+            if old is not None:
+                ranked.remove((-old, user_id))
+
+        self._reputations, self._ranked = reputations, ranked
+        self._discarded = set()
+        self.loaded = True
+        logger.info(f"Loaded leaderboard of {len(ranked)} users")
+
+    def __len__(self) -> int:
+        return len(self._reputations)
+
+    def update(self, user_id: int, reputation: int):
+        old = self._reputations.get(user_id)
+        if old == reputation:
+            return
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+        self._ranked.add((-reputation, user_id))
+        self._reputations[user_id] = reputation
+        self._discarded.discard(user_id)
+
+    def discard(self, user_id: int):
+        old = self._reputations.pop(user_id, None)
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+        if not self.loaded:
+            self._discarded.add(user_id)
+
+    def top(self, k: int, offset: int = 0) -> List[Tuple[int, int]]:
+        """(user id, reputation) of ranks offset+1 .. offset+k"""
+        return [(user_id, -negated) for negated, user_id in self._ranked.islice(offset, offset + k)]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based rank, or None for users not on the board"""
+        reputation = self._reputations.get(user_id)
+        if reputation is None:
+            return None
+        return self._ranked.index((-reputation, user_id)) + 1
@@ -0,0 +1,415 @@
+import json
+import time
+import logging
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import redis.asyncio as redis
+
+from data.storage import StorageBackend, uninterrupted
+
+logger = logging.getLogger(__name__)
+
+class RedisStorage(StorageBackend):
+    """Redis-backed store shared by every bot worker.
+
+    Records are JSON strings under `<prefix>:user:<id>` / `<prefix>:deal:<id>`.
+    Member, creation-time and group indexes are sorted sets and a hash,
+    so index queries are single round-trips. Writes are staged (reads consult the staging
+    area first) and flushed as one MULTI/EXEC pipeline per batch.
+
+    Any `redis.asyncio`-compatible client can be passed in, e.g. a
+    `fakeredis.aioredis.FakeRedis` instance for local runs.
+    """
+
+    def __init__(self, client: redis.Redis, prefix: str = "discipline",
+                 commit_interval: float = 0.02, max_batch: int = 512):
+        self.client = client
+        self.prefix = prefix
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.last_snapshot: Dict = {}
+        self.shared = True
+
+        # (table, key) -> record, or None for a delete
+        self._pending: Dict[Tuple[str, str], Optional[dict]] = {}
+        # Index maintenance queued alongside the records:
+        # (owning record or None, command, key, args, kwargs)
+        self._index_ops: List[Tuple[Optional[Tuple[str, str]], str, str, tuple, dict]] = []
+        # (table, key) -> version the stored record must still have at commit
+        self._expected: Dict[Tuple[str, str], int] = {}
+        self._has_pending = asyncio.Event()
+        self._lock = asyncio.Lock()
+        # Deal records read by prepare_batch for the next apply_batch
+        self._prefetched: Dict[str, Optional[dict]] = {}
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisStorage":
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def load(self):
+        logger.info("Redis storage configured")
+
+    # Key layout
+    def _record_key(self, table: str, key: str) -> str:
+        return f"{self.prefix}:{table[:-1]}:{key}"
+
+    def _member_key(self, user_id: str, status: str = None) -> str:
+        if status is None:
+            return f"{self.prefix}:user_deals:{user_id}"
+        return f"{self.prefix}:user_deals:{user_id}:{status}"
+
+    def _history_key(self, deal_id: str) -> str:
+        return f"{self.prefix}:history:{deal_id}"
+
+    @property
+    def _groups_key(self) -> str:
+        return f"{self.prefix}:deal_groups"
+
+    @property
+    def _created_key(self) -> str:
+        return f"{self.prefix}:deals_by_time"
+
+    @property
+    def _registered_key(self) -> str:
+        return f"{self.prefix}:registered"
+
+    @property
+    def _last_active_key(self) -> str:
+        return f"{self.prefix}:last_active"
+
+    async def run(self):
+        """Group-commit loop for staged writes"""
+        while True:
+            await self._has_pending.wait()
+            if len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.commit_interval)
+            try:
+                await uninterrupted(self.commit())
+            except Exception as e:
+                logger.error(f"Error committing Redis batch: {e}")
+                await asyncio.sleep(1)
+
+    async def commit(self):
+        """Flush staged writes in a single MULTI/EXEC pipeline"""
+        async with self._lock:
+            if not self._pending and not self._index_ops:
+                return
+            batch, self._pending = self._pending, {}
+            index_ops, self._index_ops = self._index_ops, []
+            expected, self._expected = self._expected, {}
+            self._has_pending.clear()
+            try:
+                conflicts = await self._execute(batch, index_ops, expected)
+            except Exception:
+                self._pending = {**batch, **self._pending}
+                self._index_ops = index_ops + self._index_ops
+                self._expected = {**self._expected, **expected}
+                self._has_pending.set()
+                raise
+
+        if conflicts:
+            logger.warning(f"Skipped {len(conflicts)} records changed by another worker")
+            if self.on_conflict:
+                self.on_conflict(conflicts)
+
+    async def _execute(self, batch: Dict[Tuple[str, str], Optional[dict]],
+                       index_ops: list, expected: Dict[Tuple[str, str], int]) -> Set[Tuple[str, str]]:
+        """Run one MULTI/EXEC; records whose stored version moved are left out"""
+        checked = [record_id for record_id in expected if batch.get(record_id) is not None]
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                conflicts = set()
+                if checked:
+                    # WATCH makes EXEC fail if another worker writes in between
+                    keys = [self._record_key(*record_id) for record_id in checked]
+                    await pipe.watch(*keys)
+                    for record_id, raw in zip(checked, await pipe.mget(keys)):
+                        stored = json.loads(raw).get('version', 0) if raw else 0
+                        if stored != expected[record_id]:
+                            conflicts.add(record_id)
+                    pipe.multi()
+
+                for (table, key), record in batch.items():
+                    if (table, key) in conflicts:
+                        continue
+                    if record is None:
+                        pipe.delete(self._record_key(table, key))
+                    else:
+                        pipe.set(self._record_key(table, key), json.dumps(record))
+                for owner, command, key, args, kwargs in index_ops:
+                    if owner not in conflicts:
+                        getattr(pipe, command)(key, *args, **kwargs)
+                try:
+                    await pipe.execute()
+                    return conflicts
+                except redis.WatchError:
+                    continue
+
+    def _stage(self, table: str, key: str, record: Optional[dict]):
+        self._pending[(table, key)] = record
+        self._has_pending.set()
+
+    @staticmethod
+    def _members(deal: Optional[dict]) -> set:
+        if not deal:
+            return set()
+        members = set(map(str, deal.get('members') or []))
+        if deal.get('creator_id') is not None:
+            members.add(str(deal['creator_id']))
+        return members
+
+    @staticmethod
+    def _created_score(deal: dict) -> float:
+        created_at = deal.get('created_at')
+        return datetime.fromisoformat(created_at).timestamp() if created_at else 0.0
+
+    def _stage_index(self, deal_id: str, old: Optional[dict], new: Optional[dict]):
+        old_members, new_members = self._members(old), self._members(new)
+        old_status = old.get('status', 'active') if old else None
+        new_status = new.get('status', 'active') if new else None
+        score = time.time()
+        ops = self._index_ops
+        owner = ('deals', deal_id)
+
+        for member in old_members - new_members:
+            ops.append((owner, 'zrem', self._member_key(member), (deal_id,), {}))
+            ops.append((owner, 'zrem', self._member_key(member, old_status), (deal_id,), {}))
+        for member in new_members - old_members:
+            ops.append((owner, 'zadd', self._member_key(member), ({deal_id: score},), {'nx': True}))
+        if old_status != new_status:
+            for member in old_members & new_members:
+                ops.append((owner, 'zrem', self._member_key(member, old_status), (deal_id,), {}))
+        for member in new_members:
+            if member in old_members and old_status == new_status:
+                continue
+            ops.append((owner, 'zadd', self._member_key(member, new_status), ({deal_id: score},), {'nx': True}))
+
+        # Equal scores order by member, so ids from data.ids break ties in creation order
+        if new is None:
+            ops.append((owner, 'zrem', self._created_key, (deal_id,), {}))
+        elif old is None or old.get('created_at') != new.get('created_at'):
+            ops.append((owner, 'zadd', self._created_key, ({deal_id: self._created_score(new)},), {}))
+
+        old_group = old.get('group_id') if old else None
+        new_group = new.get('group_id') if new else None
+        if old_group != new_group:
+            if old_group is not None:
+                ops.append((owner, 'hdel', self._groups_key, (str(old_group),), {}))
+            if new_group is not None:
+                ops.append((owner, 'hset', self._groups_key, (str(new_group), deal_id), {}))
+        self._has_pending.set()
+
+    async def prepare_batch(self, deal_ids: List[str]):
+        missing = [deal_id for deal_id in deal_ids if ('deals', deal_id) not in self._pending]
+        self._prefetched.update(await self._get_record_map('deals', missing))
+
+    async def apply_batch(self, users: Dict[str, dict], deals: Dict[str, dict],
+                          history: Dict[str, List[dict]], expected: Dict[Tuple[str, str], int] = None):
+        # The oldest expectation stands until the record is committed
+        for record_id, version in (expected or {}).items():
+            self._expected.setdefault(record_id, version)
+        # Index diffs need the previous records: staged ones win, the rest
+        # were read by prepare_batch. Nothing here yields, so the whole
+        # batch goes out in one MULTI/EXEC.
+        old_deals = {}
+        for deal_id in deals:
+            prefetched = self._prefetched.pop(deal_id, None)
+            old_deals[deal_id] = self._pending.get(('deals', deal_id), prefetched)
+        for user_id, user_data in users.items():
+            self._pending[('users', user_id)] = user_data
+            command = 'sadd' if user_data.get('is_registered') else 'srem'
+            self._index_ops.append((('users', user_id), command, self._registered_key, (user_id,), {}))
+        for deal_id, deal_data in deals.items():
+            self._pending[('deals', deal_id)] = deal_data
+            self._stage_index(deal_id, old_deals[deal_id], deal_data)
+        for deal_id, entries in history.items():
+            if entries:
+                values = tuple(json.dumps(entry) for entry in entries)
+                self._index_ops.append((None, 'rpush', self._history_key(deal_id), values, {}))
+        self._has_pending.set()
+
+    async def save_data(self):
+        """Flush staged writes; durability is Redis' own AOF/RDB policy"""
+        started = time.perf_counter()
+        try:
+            await self.commit()
+            self.last_snapshot = {
+                'timestamp': datetime.now().isoformat(),
+                'duration': time.perf_counter() - started
+            }
+        except Exception as e:
+            logger.error(f"Error saving data: {e}")
+
+    async def close(self):
+        await self.save_data()
+        await self.client.aclose()
+
+    async def _get_record(self, table: str, key: str) -> Optional[dict]:
+        if (table, key) in self._pending:
+            return self._pending[(table, key)]
+        raw = await self.client.get(self._record_key(table, key))
+        return json.loads(raw) if raw else None
+
+    async def _get_record_map(self, table: str, keys: List[str]) -> Dict[str, Optional[dict]]:
+        """Batch read with one MGET, overlaying staged writes"""
+        if not keys:
+            return {}
+        raws = await self.client.mget([self._record_key(table, key) for key in keys])
+        records = {}
+        for key, raw in zip(keys, raws):
+            if (table, key) in self._pending:
+                records[key] = self._pending[(table, key)]
+            else:
+                records[key] = json.loads(raw) if raw else None
+        return records
+
+    async def _get_records(self, table: str, keys: List[str]) -> List[dict]:
+        records = await self._get_record_map(table, keys)
+        return [record for record in records.values() if record is not None]
+
+    # User methods
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        if ('users', user_id) in self._pending:
+            return self._pending[('users', user_id)]
+        # last_active lives in its own hash so touches never rewrite the record
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(self._record_key('users', user_id))
+            pipe.hget(self._last_active_key, user_id)
+            raw, last_active = await pipe.execute()
+        if not raw:
+            return None
+        user_data = json.loads(raw)
+        if last_active:
+            last_active = last_active.decode() if isinstance(last_active, bytes) else last_active
+            user_data['last_active'] = max(last_active, user_data.get('last_active') or '')
+        return user_data
+
+    async def get_users(self, user_ids: List[str]) -> Dict[str, dict]:
+        if not user_ids:
+            return {}
+        records = await self._get_record_map('users', user_ids)
+        last_active = await self.client.hmget(self._last_active_key, user_ids)
+        users = {}
+        for user_id, touched in zip(user_ids, last_active):
+            user_data = records[user_id]
+            if user_data is None:
+                continue
+            if touched and ('users', user_id) not in self._pending:
+                touched = touched.decode() if isinstance(touched, bytes) else touched
+                user_data['last_active'] = max(touched, user_data.get('last_active') or '')
+            users[user_id] = user_data
+        return users
+
+    async def save_user(self, user_id: str, user_data: dict):
+        self._stage('users', user_id, user_data)
+        command = 'sadd' if user_data.get('is_registered') else 'srem'
+        self._index_ops.append((('users', user_id), command, self._registered_key, (user_id,), {}))
+
+    async def delete_user(self, user_id: str):
+        self._stage('users', user_id, None)
+        self._index_ops.append((None, 'hdel', self._last_active_key, (user_id,), {}))
+        self._index_ops.append((None, 'srem', self._registered_key, (user_id,), {}))
+
+    async def touch_users(self, timestamps: Dict[str, str]):
+        # Staged records must land first so reads overlay the touch on them
+        await self.commit()
+        await self.client.hset(self._last_active_key, mapping=timestamps)
+
+    async def get_last_active(self, user_id: str) -> Optional[str]:
+        user_data = await self.get_user(user_id)
+        return user_data.get('last_active') if user_data else None
+
+    async def registered_user_ids(self) -> List[str]:
+        await self.commit()
+        return [
+            user_id.decode() if isinstance(user_id, bytes) else user_id
+            for user_id in await self.client.smembers(self._registered_key)
+        ]
+
+    async def user_reputations(self, chunk: int = 1000) -> Dict[str, int]:
+        # Reputation is not indexed in Redis; this reads every registered user once
+        user_ids = await self.registered_user_ids()
+        reputations = {}
+        for i in range(0, len(user_ids), chunk):
+            records = await self._get_record_map('users', user_ids[i:i + chunk])
+            for user_id, user_data in records.items():
+                if user_data is not None:
+                    reputations[user_id] = user_data.get('reputation', 0)
+        return reputations
+
+    async def is_registered(self, user_id: str) -> bool:
+        if ('users', user_id) in self._pending:
+            user_data = self._pending[('users', user_id)]
+            return bool(user_data and user_data.get('is_registered'))
+        return bool(await self.client.sismember(self._registered_key, user_id))
+
+    # Deal methods
+    async def get_deal(self, deal_id: str) -> Optional[dict]:
+        return await self._get_record('deals', deal_id)
+
+    async def save_deal(self, deal_id: str, deal_data: dict):
+        old_data = await self.get_deal(deal_id)
+        self._stage('deals', deal_id, deal_data)
+        self._stage_index(deal_id, old_data, deal_data)
+
+    async def delete_deal(self, deal_id: str):
+        old_data = await self.get_deal(deal_id)
+        if old_data is not None:
+            self._stage('deals', deal_id, None)
+            self._stage_index(deal_id, old_data, None)
+            self._index_ops.append((None, 'delete', self._history_key(deal_id), (), {}))
+
+    # Index queries see staged deal writes by committing them first
+    async def get_user_deals(self, user_id: str, status: str = None,
+                             offset: int = 0, limit: int = None) -> List[dict]:
+        await self.commit()
+        if limit == 0:
+            return []
+        stop = offset + limit - 1 if limit is not None else -1
+        deal_ids = await self.client.zrange(self._member_key(user_id, status), offset, stop)
+        return await self._get_records('deals', [
+            deal_id.decode() if isinstance(deal_id, bytes) else deal_id for deal_id in deal_ids
+        ])
+
+    async def count_user_deals(self, user_id: str, status: str = None) -> int:
+        await self.commit()
+        return await self.client.zcard(self._member_key(user_id, status))
+
+    async def get_deal_by_group(self, group_id: str) -> Optional[dict]:
+        await self.commit()
+        deal_id = await self.client.hget(self._groups_key, group_id)
+        if deal_id is None:
+            return None
+        return await self.get_deal(deal_id.decode() if isinstance(deal_id, bytes) else deal_id)
+
+    async def get_deals_by_time(self, start: str = None, end: str = None, limit: int = None,
+                                newest_first: bool = False) -> List[dict]:
+        await self.commit()
+        if limit == 0:
+            return []
+        low = datetime.fromisoformat(start).timestamp() if start else '-inf'
+        high = f"({datetime.fromisoformat(end).timestamp()!r}" if end else '+inf'
+        page = {'start': 0, 'num': limit} if limit is not None else {}
+        if newest_first:
+            deal_ids = await self.client.zrevrangebyscore(self._created_key, high, low, **page)
+        else:
+            deal_ids = await self.client.zrangebyscore(self._created_key, low, high, **page)
+        return await self._get_records('deals', [
+            deal_id.decode() if isinstance(deal_id, bytes) else deal_id for deal_id in deal_ids
+        ])
+
+    async def append_history(self, deal_id: str, entries: List[dict]):
+        if entries:
+            values = tuple(json.dumps(entry) for entry in entries)
+            self._index_ops.append((None, 'rpush', self._history_key(deal_id), values, {}))
+            self._has_pending.set()
+
+    async def get_history(self, deal_id: str, cursor: int = 0,
+                          limit: int = 50) -> Tuple[List[dict], Optional[int]]:
+        await self.commit()
+        # One extra element tells whether another page exists
+        raws = await self.client.lrange(self._history_key(deal_id), cursor, cursor + limit)
+        entries = [json.loads(raw) for raw in raws[:limit]]
+        return entries, cursor + limit if len(raws) > limit else None
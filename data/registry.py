@@ -0,0 +1,59 @@
+import time
+import logging
+from typing import Dict, Set
+
+logger = logging.getLogger(__name__)
+
+class RegisteredUsers:
+    """Membership set of registered Telegram ids with a negative cache.
+
+    For process-local backends the preloaded set is authoritative, so the
+    registration gate never touches storage. For shared backends, where
+    another worker may register a user, misses go to storage at most once
+    per `negative_ttl` seconds per user.
+    """
+
+    def __init__(self, storage, negative_ttl: float = 60.0, max_unknown: int = 100_000):
+        self.storage = storage
+        self.negative_ttl = negative_ttl
+        self.max_unknown = max_unknown
+        self.loaded = False
+        self._ids: Set[int] = set()
+        self._unknown: Dict[int, float] = {}
+
+    async def load(self):
+        try:
+            ids = await self.storage.registered_user_ids()
+        except Exception as e:
+            # The gate keeps working through storage lookups until a reload
+            logger.error(f"Error loading registered users: {e}")
+            return
+        self._ids.update(int(user_id) for user_id in ids if user_id.lstrip('-').isdigit())
+        self.loaded = True
+        logger.info(f"Loaded {len(self._ids)} registered users")
+
+    def add(self, user_id: int):
+        self._ids.add(user_id)
+        self._unknown.pop(user_id, None)
+
+    def discard(self, user_id: int):
+        self._ids.discard(user_id)
+
+    async def contains(self, user_id: int) -> bool:
+        if user_id in self._ids:
+            return True
+        if self.loaded and not self.storage.shared:
+            return False
+
+        expires = self._unknown.get(user_id)
+        if expires is not None and expires > time.monotonic():
+            return False
+
+        if await self.storage.is_registered(str(user_id)):
+            self.add(user_id)
+            return True
+
+        if len(self._unknown) >= self.max_unknown:
+            self._unknown.clear()
+        self._unknown[user_id] = time.monotonic() + self.negative_ttl
+        return False
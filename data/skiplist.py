@@ -0,0 +1,156 @@
+import random
+from typing import Any, Iterable, Iterator, List, Optional
+
+MAX_LEVEL = 24
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, level: int):
+        self.key = key
+        # next[i] is the following node on level i (None past the end);
+        # width[i] is how many positions that link skips
+        self.next: List[Optional["_Node"]] = [None] * level
+        self.width: List[int] = [1] * level
+
+class IndexableSkipList:
+    """Sorted sequence of unique keys with positional access.
+
+    Every link records how many elements it skips, so insert, remove,
+    rank (`index`) and `[i]` are all O(log n) expected, and a slice of
+    k keys costs O(log n + k). Building from sorted keys is O(n).
+    """
+
+    def __init__(self, sorted_keys: Iterable = (), seed: int = None):
+        self._random = random.Random(seed)
+        self._head = _Node(None, MAX_LEVEL)
+        self._size = 0
+        # Levels in use; the head's links above it are not maintained
+        self._height = 1
+        self._build(sorted_keys)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _level(self) -> int:
+        level = 1
+        while level < MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _build(self, sorted_keys: Iterable):
+        # Last node and its position on every level; the head is position 0
+        last = [self._head] * MAX_LEVEL
+        last_pos = [0] * MAX_LEVEL
+        pos = 0
+        for key in sorted_keys:
+            pos += 1
+            node = _Node(key, self._level())
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = pos - last_pos[level]
+                last[level], last_pos[level] = node, pos
+        for level in range(MAX_LEVEL):
+            last[level].width[level] = pos + 1 - last_pos[level]
+        self._size = pos
+        self._height = next((level + 1 for level in range(MAX_LEVEL - 1, -1, -1) if last[level] is not self._head), 1)
+
+    def add(self, key):
+        """Insert `key`; it must not be present already"""
+        new = _Node(key, self._level())
+        head = self._head
+        if len(new.next) > self._height:
+            for level in range(self._height, len(new.next)):
+                head.next[level] = None
+                head.width[level] = self._size + 1
+            self._height = len(new.next)
+        height = self._height
+
+        chain = [head] * height
+        steps = [0] * height
+        node = head
+        for level in range(height - 1, -1, -1):
+            following = node.next[level]
+            while following is not None and following.key < key:
+                steps[level] += node.width[level]
+                node = following
+                following = node.next[level]
+            chain[level] = node
+
+        skipped = 0
+        for level in range(len(new.next)):
+            previous = chain[level]
+            new.next[level] = previous.next[level]
+            previous.next[level] = new
+            new.width[level] = previous.width[level] - skipped
+            previous.width[level] = skipped + 1
+            skipped += steps[level]
+        for level in range(len(new.next), height):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        height = self._height
+        chain = [self._head] * height
+        node = self._head
+        for level in range(height - 1, -1, -1):
+            following = node.next[level]
+            while following is not None and following.key < key:
+                node = following
+                following = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), height):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key) -> int:
+        """Position of `key` in sort order"""
+        node = self._head
+        pos = 0
+        for level in range(self._height - 1, -1, -1):
+            following = node.next[level]
+            while following is not None and following.key < key:
+                pos += node.width[level]
+                node = following
+                following = node.next[level]
+        following = node.next[0]
+        if following is None or following.key != key:
+            raise ValueError(f"{key!r} is not in the list")
+        return pos
+
+    def _node_at(self, index: int) -> _Node:
+        node = self._head
+        remaining = index + 1
+        for level in range(self._height - 1, -1, -1):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("skip list index out of range")
+        return self._node_at(index).key
+
+    def islice(self, start: int = 0, stop: int = None) -> Iterator:
+        """Keys at positions [start, stop)"""
+        stop = self._size if stop is None else min(stop, self._size)
+        if start >= stop:
+            return
+        node = self._node_at(start)
+        for _ in range(stop - start):
+            yield node.key
+            node = node.next[0]
+
+    def __iter__(self) -> Iterator:
+        return self.islice()
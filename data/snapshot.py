@@ -0,0 +1,314 @@
+"""Binary snapshot format for JsonStorage.
+
+Layout (little-endian):
+
+    header    magic "DSNP", format version u16, section count u16, reserved u32
+    sections  per section: name 8s, offset u64, length u64, crc32 u32
+    crc32     of everything above
+    payloads  one per section
+
+A table section holds `records u64, keys bytes u64, meta bytes u64`, a
+JSON array of keys, a JSON array of per-record metadata (whatever the
+indexes need, so they rebuild without decoding records), `records + 1`
+u64 offsets and the compact JSON records back to back. The file is
+memory-mapped and a record is only decoded when it is read.
+"""
+import json
+import mmap
+import os
+import sys
+import zlib
+import struct
+import logging
+from array import array
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'DSNP'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+SECTION = struct.Struct('<8sQQI')
+CRC = struct.Struct('<I')
+TABLE_HEADER = struct.Struct('<QQQ')
+
+class SnapshotError(Exception):
+    """The snapshot file is truncated, corrupted or of an unknown version"""
+
+def _encode(value) -> bytes:
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+def _offsets(data) -> array:
+    offsets = array('Q')
+    offsets.frombytes(data)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    return offsets
+
+class SnapshotTable:
+    """Read-only, lazily decoded view of one table section"""
+
+    def __init__(self, mm: mmap.mmap, offset: int):
+        count, keys_len, meta_len = TABLE_HEADER.unpack_from(mm, offset)
+        pos = offset + TABLE_HEADER.size
+        self.keys: List[str] = json.loads(mm[pos:pos + keys_len])
+        pos += keys_len
+        self.meta: List[Any] = json.loads(mm[pos:pos + meta_len])
+        pos += meta_len
+        self.offsets = _offsets(mm[pos:pos + (count + 1) * 8])
+        self.data_start = pos + (count + 1) * 8
+        self.positions: Dict[str, int] = dict(zip(self.keys, range(count)))
+        self._mm = mm
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def raw(self, pos: int) -> bytes:
+        return self._mm[self.data_start + self.offsets[pos]:self.data_start + self.offsets[pos + 1]]
+
+    def get(self, key: str) -> Optional[dict]:
+        pos = self.positions.get(key)
+        return json.loads(self.raw(pos)) if pos is not None else None
+
+class Snapshot:
+    """Memory-mapped snapshot file"""
+
+    def __init__(self, path: Path, verify: bool = True):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.sections = self._read_header(verify)
+        except Exception:
+            self._mm.close()
+            raise
+        self._tables: Dict[str, SnapshotTable] = {}
+
+    def _read_header(self, verify: bool) -> Dict[str, Tuple[int, int]]:
+        mm = self._mm
+        if len(mm) < HEADER.size:
+            raise SnapshotError("file too short")
+        magic, version, count, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise SnapshotError("not a snapshot file")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"unsupported snapshot version {version}")
+
+        table_end = HEADER.size + count * SECTION.size
+        (header_crc,) = CRC.unpack_from(mm, table_end)
+        if zlib.crc32(mm[:table_end]) != header_crc:
+            raise SnapshotError("header checksum mismatch")
+
+        sections = {}
+        for i in range(count):
+            name, offset, length, crc = SECTION.unpack_from(mm, HEADER.size + i * SECTION.size)
+            name = name.rstrip(b'\0').decode()
+            if offset + length > len(mm):
+                raise SnapshotError(f"section {name} is truncated")
+            if verify and zlib.crc32(mm[offset:offset + length]) != crc:
+                raise SnapshotError(f"section {name} checksum mismatch")
+            sections[name] = (offset, length)
+        return sections
+
+    def table(self, name: str) -> Optional[SnapshotTable]:
+        if name not in self.sections:
+            return None
+        if name not in self._tables:
+            self._tables[name] = SnapshotTable(self._mm, self.sections[name][0])
+        return self._tables[name]
+
+    def close(self):
+        self._tables.clear()
+        self._mm.close()
+
+class FrozenTable:
+    """Point-in-time view of a LazyTable, cheap to take on the event loop"""
+
+    def __init__(self, base: Optional[SnapshotTable], overlay: Dict[str, dict], deleted: Set[str]):
+        self.base = base
+        self.overlay = overlay
+        self.deleted = deleted
+
+class LazyTable(MutableMapping):
+    """Dict of records backed by a snapshot table plus in-memory changes.
+
+    Unchanged records stay encoded in the mapped file; writes go to an
+    overlay and deletes to a tombstone set. `rebase` swaps in a newer
+    snapshot and drops the overlay entries it already contains.
+    """
+
+    def __init__(self, base: Optional[SnapshotTable] = None, overlay: Dict[str, dict] = None):
+        self.base = base
+        self._overlay: Dict[str, dict] = overlay or {}
+        self._deleted: Set[str] = set()
+
+    def __getitem__(self, key: str) -> dict:
+        record = self._overlay.get(key)
+        if record is not None:
+            return record
+        if key in self._deleted or self.base is None:
+            raise KeyError(key)
+        record = self.base.get(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __contains__(self, key) -> bool:
+        if key in self._overlay:
+            return True
+        return self.base is not None and key not in self._deleted and key in self.base.positions
+
+    def __setitem__(self, key: str, record: dict):
+        self._overlay[key] = record
+        self._deleted.discard(key)
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        self._overlay.pop(key, None)
+        # Tombstone even overlay-only keys: a snapshot in flight may contain them
+        self._deleted.add(key)
+
+    def __iter__(self) -> Iterator[str]:
+        if self.base is not None:
+            for key in self.base.keys:
+                if key not in self._deleted and key not in self._overlay:
+                    yield key
+        yield from list(self._overlay)
+
+    def __len__(self) -> int:
+        if self.base is None:
+            return len(self._overlay)
+        positions = self.base.positions
+        hidden = sum(1 for key in self._deleted if key in positions)
+        shadowed = sum(1 for key in self._overlay if key in positions)
+        return len(positions) - hidden - shadowed + len(self._overlay)
+
+    def freeze(self) -> FrozenTable:
+        return FrozenTable(self.base, dict(self._overlay), set(self._deleted))
+
+    def rebase(self, base: SnapshotTable, frozen: FrozenTable):
+        """Adopt a snapshot written from `frozen`; later changes stay in the overlay"""
+        for key, record in frozen.overlay.items():
+            if self._overlay.get(key) is record:
+                del self._overlay[key]
+        self._deleted = {key for key in self._deleted if key in base.positions}
+        self.base = base
+
+def _write_table(f, table: FrozenTable, meta_fn: Callable[[dict], Any]) -> int:
+    """Stream one table section to `f`; returns its crc32"""
+    keys, metas, chunks = [], [], []
+    base = table.base
+    if base is not None:
+        for pos, key in enumerate(base.keys):
+            if key in table.deleted or key in table.overlay:
+                continue
+            keys.append(key)
+            metas.append(base.meta[pos])
+            chunks.append(base.raw(pos))
+    for key, record in table.overlay.items():
+        keys.append(key)
+        metas.append(meta_fn(record))
+        chunks.append(_encode(record))
+
+    keys_blob, meta_blob = _encode(keys), _encode(metas)
+    offsets = array('Q', [0])
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        offsets.append(total)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    crc = 0
+    for piece in (TABLE_HEADER.pack(len(keys), len(keys_blob), len(meta_blob)),
+                  keys_blob, meta_blob, offsets.tobytes()):
+        f.write(piece)
+        crc = zlib.crc32(piece, crc)
+    for chunk in chunks:
+        f.write(chunk)
+        crc = zlib.crc32(chunk, crc)
+    return crc
+
+def write_snapshot(path: Path, tables: Dict[str, Tuple[FrozenTable, Callable[[dict], Any]]]) -> int:
+    """Atomically replace `path` with a snapshot of `tables`; returns its size"""
+    path = Path(path)
+    tmp_file = path.with_name(f".{path.name}.tmp")
+    table_end = HEADER.size + len(tables) * SECTION.size
+    entries = []
+    with open(tmp_file, 'wb') as f:
+        # Payloads first; the header is filled in once offsets are known
+        f.seek(table_end + CRC.size)
+        for name, (table, meta_fn) in tables.items():
+            offset = f.tell()
+            crc = _write_table(f, table, meta_fn)
+            entries.append((name, offset, f.tell() - offset, crc))
+        size = f.tell()
+
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), 0) + b''.join(
+            SECTION.pack(name.encode(), offset, length, crc) for name, offset, length, crc in entries
+        )
+        f.seek(0)
+        f.write(header + CRC.pack(zlib.crc32(header)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+    # Persist the rename itself
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return size
+
+def user_meta(user: dict) -> list:
+    return [1 if user.get('is_registered') else 0, user.get('reputation', 0)]
+
+def deal_meta(deal: dict) -> dict:
+    return {
+        'creator_id': deal.get('creator_id'),
+        'members': deal.get('members') or [],
+        'status': deal.get('status', 'active'),
+        'group_id': deal.get('group_id'),
+        'created_at': deal.get('created_at')
+    }
+
+TABLES = {'users': user_meta, 'deals': deal_meta}
+
+def export_json(snapshot_path: Path, out_dir: Path):
+    """Write users.json / deals.json from a snapshot"""
+    snapshot = Snapshot(snapshot_path)
+    try:
+        for name in TABLES:
+            table = snapshot.table(name)
+            with open(Path(out_dir) / f"{name}.json", 'w') as f:
+                json.dump({key: table.get(key) for key in table.keys} if table else {}, f)
+    finally:
+        snapshot.close()
+
+def import_json(json_dir: Path, snapshot_path: Path) -> int:
+    """Build a snapshot from users.json / deals.json"""
+    tables = {}
+    for name, meta_fn in TABLES.items():
+        records = {}
+        json_file = Path(json_dir) / f"{name}.json"
+        if json_file.exists():
+            with open(json_file, 'r') as f:
+                records = json.load(f)
+        tables[name] = (FrozenTable(None, records, set()), meta_fn)
+    return write_snapshot(snapshot_path, tables)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert between snapshot.bin and users/deals JSON files")
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('snapshot', type=Path, help="path of snapshot.bin")
+    parser.add_argument('json_dir', type=Path, help="directory with users.json / deals.json")
+    args = parser.parse_args()
+    if args.command == 'export':
+        export_json(args.snapshot, args.json_dir)
+    else:
+        print(f"Wrote {import_json(args.json_dir, args.snapshot)} bytes")
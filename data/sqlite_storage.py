@@ -0,0 +1,375 @@
+import json
+import sqlite3
+import logging
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+
+from data.storage import StorageBackend, uninterrupted
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    is_registered INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deals (
+    id TEXT PRIMARY KEY,
+    creator_id TEXT,
+    group_id TEXT,
+    status TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deal_members (
+    user_id TEXT NOT NULL,
+    deal_id TEXT NOT NULL,
+    status TEXT,
+    UNIQUE (user_id, deal_id)
+);
+CREATE TABLE IF NOT EXISTS deal_history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    deal_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_registered ON users (is_registered);
+CREATE INDEX IF NOT EXISTS idx_deals_creator ON deals (creator_id);
+CREATE INDEX IF NOT EXISTS idx_deals_group ON deals (group_id);
+CREATE INDEX IF NOT EXISTS idx_deals_status ON deals (status);
+DROP INDEX IF EXISTS idx_deals_created_at;
+CREATE INDEX IF NOT EXISTS idx_deals_created ON deals (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_members_user_status ON deal_members (user_id, status);
+CREATE INDEX IF NOT EXISTS idx_members_deal ON deal_members (deal_id);
+CREATE INDEX IF NOT EXISTS idx_history_deal ON deal_history (deal_id, seq);
+"""
+
+# Statements are constant strings so sqlite3's statement cache keeps them prepared
+UPSERT_USER = """
+INSERT INTO users (id, is_registered, data) VALUES (?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET is_registered = excluded.is_registered, data = excluded.data
+"""
+DELETE_USER = "DELETE FROM users WHERE id = ?"
+TOUCH_USER = "UPDATE users SET data = json_set(data, '$.last_active', ?) WHERE id = ?"
+UPSERT_DEAL = """
+INSERT INTO deals (id, creator_id, group_id, status, created_at, data) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    creator_id = excluded.creator_id, group_id = excluded.group_id, status = excluded.status,
+    created_at = excluded.created_at, data = excluded.data
+"""
+DELETE_DEAL = "DELETE FROM deals WHERE id = ?"
+UPSERT_MEMBER = """
+INSERT INTO deal_members (user_id, deal_id, status) VALUES (?, ?, ?)
+ON CONFLICT (user_id, deal_id) DO UPDATE SET status = excluded.status
+"""
+PRUNE_MEMBERS = """
+DELETE FROM deal_members
+WHERE deal_id = ? AND user_id NOT IN (SELECT value FROM json_each(?))
+"""
+DELETE_MEMBERS = "DELETE FROM deal_members WHERE deal_id = ?"
+INSERT_HISTORY = "INSERT INTO deal_history (deal_id, data) VALUES (?, ?)"
+DELETE_HISTORY = "DELETE FROM deal_history WHERE deal_id = ?"
+
+SELECT_USER = "SELECT data FROM users WHERE id = ?"
+SELECT_USERS = "SELECT id, data FROM users WHERE id IN (SELECT value FROM json_each(?))"
+SELECT_REGISTERED_IDS = "SELECT id FROM users WHERE is_registered = 1"
+SELECT_REPUTATIONS = "SELECT id, COALESCE(json_extract(data, '$.reputation'), 0) FROM users WHERE is_registered = 1"
+SELECT_IS_REGISTERED = "SELECT is_registered FROM users WHERE id = ?"
+SELECT_LAST_ACTIVE = "SELECT json_extract(data, '$.last_active') FROM users WHERE id = ?"
+SELECT_DEAL = "SELECT data FROM deals WHERE id = ?"
+SELECT_DEAL_BY_GROUP = "SELECT data FROM deals WHERE group_id = ? ORDER BY rowid DESC LIMIT 1"
+SELECT_USER_DEALS = """
+SELECT d.data FROM deal_members m JOIN deals d ON d.id = m.deal_id
+WHERE m.user_id = ? ORDER BY m.rowid LIMIT ? OFFSET ?
+"""
+SELECT_USER_DEALS_BY_STATUS = """
+SELECT d.data FROM deal_members m JOIN deals d ON d.id = m.deal_id
+WHERE m.user_id = ? AND m.status = ? ORDER BY m.rowid LIMIT ? OFFSET ?
+"""
+# Range bounds are always bound so both ends use the (created_at, id) index
+SELECT_DEALS_BY_TIME = """
+SELECT data FROM deals WHERE created_at >= ? AND created_at < ? ORDER BY created_at, id LIMIT ?
+"""
+SELECT_DEALS_BY_TIME_DESC = """
+SELECT data FROM deals WHERE created_at >= ? AND created_at < ? ORDER BY created_at DESC, id DESC LIMIT ?
+"""
+COUNT_USER_DEALS = "SELECT COUNT(*) FROM deal_members WHERE user_id = ?"
+COUNT_USER_DEALS_BY_STATUS = "SELECT COUNT(*) FROM deal_members WHERE user_id = ? AND status = ?"
+SELECT_HISTORY = "SELECT seq, data FROM deal_history WHERE deal_id = ? AND seq > ? ORDER BY seq LIMIT ?"
+
+class SQLiteStorage(StorageBackend):
+    """SQLite-backed store with indexed lookups and batched write transactions.
+
+    The connection is owned by a single worker thread; every query runs
+    there via `run_in_executor`. Writes are staged in `_pending` (which
+    reads consult first) and committed in one transaction per batch.
+    """
+
+    def __init__(self, db_path: Path, commit_interval: float = 0.05, max_batch: int = 512):
+        self.db_path = Path(db_path)
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.last_snapshot: Dict = {}
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        # (table, key) -> record, or None for a delete; coalesces repeated writes
+        self._pending: Dict[Tuple[str, str], Optional[dict]] = {}
+        # History rows (deal_id, json) are appended, never coalesced
+        self._history: List[Tuple[str, str]] = []
+        self._has_pending = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def load(self):
+        """Open the database, creating the schema on first start"""
+        self._executor.submit(self._connect).result()
+        logger.info(f"SQLite storage opened: {self.db_path}")
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    async def _call(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def run(self):
+        """Group-commit loop for staged writes"""
+        while True:
+            await self._has_pending.wait()
+            if len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.commit_interval)
+            try:
+                await uninterrupted(self.commit())
+            except Exception as e:
+                logger.error(f"Error committing SQLite batch: {e}")
+                await asyncio.sleep(1)
+
+    async def commit(self):
+        """Apply all staged writes in a single transaction"""
+        async with self._lock:
+            if not self._pending and not self._history:
+                return
+            batch, self._pending = self._pending, {}
+            history, self._history = self._history, []
+            self._has_pending.clear()
+            try:
+                await self._call(self._apply_batch, batch, history)
+            except Exception:
+                # Put the batch back unless newer writes superseded it
+                self._pending = {**batch, **self._pending}
+                self._history = history + self._history
+                self._has_pending.set()
+                raise
+
+    def _apply_batch(self, batch: Dict[Tuple[str, str], Optional[dict]],
+                     history: List[Tuple[str, str]]):
+        with self._conn:
+            self._conn.executemany(INSERT_HISTORY, history)
+            for (table, key), record in batch.items():
+                if table == 'users':
+                    if record is None:
+                        self._conn.execute(DELETE_USER, (key,))
+                    else:
+                        self._conn.execute(UPSERT_USER, (
+                            key, int(bool(record.get('is_registered'))), json.dumps(record)
+                        ))
+                elif record is None:
+                    self._conn.execute(DELETE_DEAL, (key,))
+                    self._conn.execute(DELETE_MEMBERS, (key,))
+                    self._conn.execute(DELETE_HISTORY, (key,))
+                else:
+                    self._write_deal(key, record)
+
+    def _write_deal(self, deal_id: str, deal: dict):
+        status = deal.get('status', 'active')
+        group_id = deal.get('group_id')
+        creator_id = deal.get('creator_id')
+        self._conn.execute(UPSERT_DEAL, (
+            deal_id,
+            str(creator_id) if creator_id is not None else None,
+            str(group_id) if group_id is not None else None,
+            status,
+            deal.get('created_at'),
+            json.dumps(deal)
+        ))
+
+        members = list(dict.fromkeys(map(str, deal.get('members') or [])))
+        if creator_id is not None and str(creator_id) not in members:
+            members.insert(0, str(creator_id))
+        self._conn.executemany(UPSERT_MEMBER, [(member, deal_id, status) for member in members])
+        self._conn.execute(PRUNE_MEMBERS, (deal_id, json.dumps(members)))
+
+    def _stage(self, table: str, key: str, record: Optional[dict]):
+        self._pending[(table, key)] = record
+        self._has_pending.set()
+
+    async def apply_batch(self, users: Dict[str, dict], deals: Dict[str, dict],
+                          history: Dict[str, List[dict]], expected: Dict[Tuple[str, str], int] = None):
+        # Staging never yields, so the whole batch lands in one transaction
+        for user_id, user_data in users.items():
+            self._pending[('users', user_id)] = user_data
+        for deal_id, deal_data in deals.items():
+            self._pending[('deals', deal_id)] = deal_data
+        for deal_id, entries in history.items():
+            self._history.extend((deal_id, json.dumps(entry)) for entry in entries)
+        self._has_pending.set()
+
+    async def save_data(self):
+        """Commit staged writes and checkpoint the SQLite WAL"""
+        started = time.perf_counter()
+        try:
+            await self.commit()
+            await self._call(self._checkpoint)
+            self.last_snapshot = {
+                'timestamp': datetime.now().isoformat(),
+                'duration': time.perf_counter() - started,
+                'bytes': self.db_path.stat().st_size
+            }
+            logger.info(f"Data saved successfully in {self.last_snapshot['duration']:.3f}s")
+        except Exception as e:
+            logger.error(f"Error saving data: {e}")
+
+    def _checkpoint(self):
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def close(self):
+        await self.save_data()
+        await self._call(self._conn.close)
+        self._executor.shutdown(wait=True)
+
+    def _fetch_record(self, sql: str, params: tuple) -> Optional[dict]:
+        row = self._conn.execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _fetch_records(self, sql: str, params: tuple) -> List[dict]:
+        return [json.loads(row[0]) for row in self._conn.execute(sql, params)]
+
+    def _fetch_scalar(self, sql: str, params: tuple):
+        row = self._conn.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    def _fetch_column(self, sql: str, params: tuple) -> list:
+        return [row[0] for row in self._conn.execute(sql, params)]
+
+    def _fetch_rows(self, sql: str, params: tuple) -> list:
+        return self._conn.execute(sql, params).fetchall()
+
+    def _fetch_users(self, user_ids: List[str]) -> Dict[str, dict]:
+        return {row[0]: json.loads(row[1]) for row in self._conn.execute(SELECT_USERS, (json.dumps(user_ids),))}
+
+    def _fetch_history(self, deal_id: str, cursor: int, limit: int) -> Tuple[List[dict], Optional[int]]:
+        # One extra row tells whether another page exists
+        rows = self._conn.execute(SELECT_HISTORY, (deal_id, cursor, limit + 1)).fetchall()
+        entries = [json.loads(data) for _, data in rows[:limit]]
+        return entries, rows[limit - 1][0] if len(rows) > limit else None
+
+    def _touch_users(self, rows: List[Tuple[str, str]]):
+        with self._conn:
+            self._conn.executemany(TOUCH_USER, rows)
+
+    # User methods
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        if ('users', user_id) in self._pending:
+            return self._pending[('users', user_id)]
+        return await self._call(self._fetch_record, SELECT_USER, (user_id,))
+
+    async def get_users(self, user_ids: List[str]) -> Dict[str, dict]:
+        missing = [user_id for user_id in user_ids if ('users', user_id) not in self._pending]
+        users = await self._call(self._fetch_users, missing) if missing else {}
+        for user_id in user_ids:
+            if ('users', user_id) in self._pending:
+                user_data = self._pending[('users', user_id)]
+                if user_data is not None:
+                    users[user_id] = user_data
+        return users
+
+    async def save_user(self, user_id: str, user_data: dict):
+        self._stage('users', user_id, user_data)
+
+    async def delete_user(self, user_id: str):
+        self._stage('users', user_id, None)
+
+    async def touch_users(self, timestamps: Dict[str, str]):
+        # Staged full records must land first or they would overwrite the touch
+        await self.commit()
+        await self._call(self._touch_users, [
+            (last_active, user_id) for user_id, last_active in timestamps.items()
+        ])
+
+    async def get_last_active(self, user_id: str) -> Optional[str]:
+        if ('users', user_id) in self._pending:
+            user_data = self._pending[('users', user_id)]
+            return user_data.get('last_active') if user_data else None
+        return await self._call(self._fetch_scalar, SELECT_LAST_ACTIVE, (user_id,))
+
+    async def registered_user_ids(self) -> List[str]:
+        await self.commit()
+        return await self._call(self._fetch_column, SELECT_REGISTERED_IDS, ())
+
+    async def user_reputations(self) -> Dict[str, int]:
+        await self.commit()
+        return dict(await self._call(self._fetch_rows, SELECT_REPUTATIONS, ()))
+
+    async def is_registered(self, user_id: str) -> bool:
+        if ('users', user_id) in self._pending:
+            user_data = self._pending[('users', user_id)]
+            return bool(user_data and user_data.get('is_registered'))
+        return bool(await self._call(self._fetch_scalar, SELECT_IS_REGISTERED, (user_id,)))
+
+    # Deal methods
+    async def get_deal(self, deal_id: str) -> Optional[dict]:
+        if ('deals', deal_id) in self._pending:
+            return self._pending[('deals', deal_id)]
+        return await self._call(self._fetch_record, SELECT_DEAL, (deal_id,))
+
+    async def save_deal(self, deal_id: str, deal_data: dict):
+        self._stage('deals', deal_id, deal_data)
+
+    async def delete_deal(self, deal_id: str):
+        self._stage('deals', deal_id, None)
+
+    # Index queries see staged deal writes by committing them first
+    async def get_user_deals(self, user_id: str, status: str = None,
+                             offset: int = 0, limit: int = None) -> List[dict]:
+        await self.commit()
+        limit = -1 if limit is None else limit
+        if status is None:
+            return await self._call(self._fetch_records, SELECT_USER_DEALS, (user_id, limit, offset))
+        return await self._call(
+            self._fetch_records, SELECT_USER_DEALS_BY_STATUS, (user_id, status, limit, offset)
+        )
+
+    async def count_user_deals(self, user_id: str, status: str = None) -> int:
+        await self.commit()
+        if status is None:
+            return await self._call(self._fetch_scalar, COUNT_USER_DEALS, (user_id,))
+        return await self._call(self._fetch_scalar, COUNT_USER_DEALS_BY_STATUS, (user_id, status))
+
+    async def get_deal_by_group(self, group_id: str) -> Optional[dict]:
+        await self.commit()
+        return await self._call(self._fetch_record, SELECT_DEAL_BY_GROUP, (group_id,))
+
+    async def get_deals_by_time(self, start: str = None, end: str = None, limit: int = None,
+                                newest_first: bool = False) -> List[dict]:
+        await self.commit()
+        sql = SELECT_DEALS_BY_TIME_DESC if newest_first else SELECT_DEALS_BY_TIME
+        # ISO timestamps start with a digit, so '~' sorts after all of them
+        params = (start or '', end or '~', -1 if limit is None else limit)
+        return await self._call(self._fetch_records, sql, params)
+
+    async def append_history(self, deal_id: str, entries: List[dict]):
+        self._history.extend((deal_id, json.dumps(entry)) for entry in entries)
+        self._has_pending.set()
+
+    async def get_history(self, deal_id: str, cursor: int = 0,
+                          limit: int = 50) -> Tuple[List[dict], Optional[int]]:
+        await self.commit()
+        return await self._call(self._fetch_history, deal_id, cursor, limit)
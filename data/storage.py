@@ -0,0 +1,144 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+async def uninterrupted(awaitable: Awaitable):
+    """Await `awaitable` to the end even if the caller is cancelled meanwhile, then re-raise.
+
+    Background loops wrap their flushes in it, so stopping a loop never
+    drops a batch it already took off its buffer.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        await asyncio.gather(task, return_exceptions=True)
+        raise
+
+class VersionConflict(Exception):
+    """A record changed between being read and being written"""
+
+    def __init__(self, table: str, key: str):
+        super().__init__(f"{table[:-1]} {key} was modified concurrently")
+        self.table = table
+        self.key = key
+
+class StorageBackend(ABC):
+    """Persistence interface behind DataManager.
+
+    Keys are strings; records are plain JSON-compatible dicts. Every
+    method that may touch disk or the network is a coroutine so that
+    implementations can move I/O off the event loop.
+    """
+
+    last_snapshot: Dict = {}
+    # True when other processes write to the same store
+    shared: bool = False
+    # Called with the (table, key) pairs a commit skipped on version conflicts
+    on_conflict: Optional[Callable[[Set[Tuple[str, str]]], None]] = None
+
+    @abstractmethod
+    def load(self):
+        """Open the store; called once before the bot starts"""
+
+    async def run(self):
+        """Background maintenance loop (group commit etc.), if any"""
+
+    async def commit(self):
+        """Push staged writes to the store now, if the backend stages them"""
+
+    async def prepare_batch(self, deal_ids: List[str]):
+        """Fetch whatever `apply_batch` needs so that it can stage without yielding"""
+
+    @abstractmethod
+    async def apply_batch(self, users: Dict[str, dict], deals: Dict[str, dict],
+                          history: Dict[str, List[dict]], expected: Dict[Tuple[str, str], int] = None):
+        """Write users, deals and history events as one atomic commit.
+
+        Must stage everything before its first await: callers serialize
+        live objects right before calling it, and a yield in between
+        could let an older serialization overwrite a newer one.
+
+        `expected` maps (table, key) to the `version` the stored record
+        must still have; records that moved on are skipped and reported
+        through `on_conflict`. Only shared backends need to check it,
+        otherwise DataManager is the only writer.
+        """
+
+    @abstractmethod
+    async def save_data(self):
+        """Make everything written so far durable and compact the store"""
+
+    @abstractmethod
+    async def close(self):
+        """Flush pending writes and release resources"""
+
+    # Users
+    @abstractmethod
+    async def get_user(self, user_id: str) -> Optional[dict]: ...
+
+    async def get_users(self, user_ids: List[str]) -> Dict[str, dict]:
+        """Bulk `get_user`; missing users are left out"""
+        users = {}
+        for user_id in user_ids:
+            user_data = await self.get_user(user_id)
+            if user_data is not None:
+                users[user_id] = user_data
+        return users
+
+    @abstractmethod
+    async def save_user(self, user_id: str, user_data: dict): ...
+
+    @abstractmethod
+    async def delete_user(self, user_id: str): ...
+
+    @abstractmethod
+    async def touch_users(self, timestamps: Dict[str, str]):
+        """Set `last_active` for many existing users in one write"""
+
+    @abstractmethod
+    async def get_last_active(self, user_id: str) -> Optional[str]: ...
+
+    @abstractmethod
+    async def registered_user_ids(self) -> List[str]: ...
+
+    @abstractmethod
+    async def is_registered(self, user_id: str) -> bool: ...
+
+    @abstractmethod
+    async def user_reputations(self) -> Dict[str, int]:
+        """Reputation of every registered user"""
+
+    # Deals
+    @abstractmethod
+    async def get_deal(self, deal_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def save_deal(self, deal_id: str, deal_data: dict): ...
+
+    @abstractmethod
+    async def delete_deal(self, deal_id: str): ...
+
+    @abstractmethod
+    async def get_user_deals(self, user_id: str, status: str = None,
+                             offset: int = 0, limit: int = None) -> List[dict]: ...
+
+    @abstractmethod
+    async def count_user_deals(self, user_id: str, status: str = None) -> int: ...
+
+    @abstractmethod
+    async def get_deal_by_group(self, group_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def get_deals_by_time(self, start: str = None, end: str = None, limit: int = None,
+                                newest_first: bool = False) -> List[dict]:
+        """Deals with `start <= created_at < end` (ISO timestamps), oldest first unless `newest_first`"""
+
+    # Deal history: an append-only event stream per deal, removed with the deal
+    @abstractmethod
+    async def append_history(self, deal_id: str, entries: List[dict]): ...
+
+    @abstractmethod
+    async def get_history(self, deal_id: str, cursor: int = 0,
+                          limit: int = 50) -> Tuple[List[dict], Optional[int]]:
+        """One page of events after `cursor` and the next cursor (None at the end)"""
@@ -0,0 +1,210 @@
+import json
+import os
+import logging
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List
+
+from data.storage import uninterrupted
+
+logger = logging.getLogger(__name__)
+
+class WALCorruptedError(Exception):
+    """A WAL record other than the very last one cannot be read"""
+
+def append_synced(file, data: bytes):
+    """Append `data` to an unbuffered binary file and fsync it.
+
+    On failure the file is cut back to its previous length, so a retry
+    does not follow a torn record.
+    """
+    start = os.fstat(file.fileno()).st_size
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[file.write(view):]
+        os.fsync(file.fileno())
+    except Exception:
+        try:
+            os.ftruncate(file.fileno(), start)
+        except OSError as e:
+            logger.error(f"Error truncating {file.name} after failed write: {e}")
+        raise
+
+class WriteAheadLog:
+    """Append-only mutation log with group commit.
+
+    Records are buffered in memory and written + fsynced in groups by
+    `run()`, so the cost of a write depends on the size of the change and
+    not on the size of the store. `rotate()` seals the active segment so
+    it can be dropped once a snapshot covering it has been written.
+    """
+
+    def __init__(self, path: Path, commit_interval: float = 0.05, max_batch: int = 512):
+        self.path = Path(path)
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.size = self.path.stat().st_size if self.path.exists() else 0
+
+        self._pending: List[str] = []
+        self._has_pending = asyncio.Event()
+        self._lock = asyncio.Lock()
+        # Single writer thread keeps segment writes ordered
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wal")
+        self._file = None
+
+    def append(self, op: str, table: str, key: str, value: dict = None):
+        """Buffer a mutation record until the next group commit"""
+        record = {'op': op, 't': table, 'k': key}
+        if value is not None:
+            record['v'] = value
+        self._pending.append(json.dumps(record, separators=(',', ':')) + '\n')
+        self._has_pending.set()
+
+    def append_batch(self, records: List[dict]):
+        """Buffer several mutations as one line, so replay applies all or none"""
+        record = {'op': 'batch', 'ops': records}
+        self._pending.append(json.dumps(record, separators=(',', ':')) + '\n')
+        self._has_pending.set()
+
+    async def run(self):
+        """Group-commit loop: wait for records, gather a batch, fsync it"""
+        while True:
+            await self._has_pending.wait()
+            if len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.commit_interval)
+            try:
+                await uninterrupted(self.commit())
+            except Exception as e:
+                logger.error(f"Error committing WAL: {e}")
+                await asyncio.sleep(1)
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    async def commit(self):
+        """Write and fsync everything buffered so far"""
+        async with self._lock:
+            lines = self._take_pending()
+            if lines:
+                loop = asyncio.get_running_loop()
+                try:
+                    await loop.run_in_executor(self._executor, self._write, lines)
+                except Exception:
+                    self._restore_pending(lines)
+                    raise
+
+    async def rotate(self) -> List[Path]:
+        """Seal the active segment and return all sealed segments.
+
+        Records appended after this call go to a fresh active segment, so
+        a snapshot taken afterwards covers every sealed segment.
+        """
+        async with self._lock:
+            lines = self._take_pending()
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._executor, self._seal, lines)
+            except Exception:
+                # _seal empties `lines` once they are written
+                self._restore_pending(lines)
+                raise
+
+    def drop_segments(self, segments: List[Path]):
+        """Remove sealed segments that are covered by a snapshot"""
+        for segment in segments:
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Error removing WAL segment {segment}: {e}")
+
+    def replay(self, apply: Callable[[dict], None]) -> int:
+        """Feed every logged record, oldest first, to `apply`.
+
+        Only the last line of the newest segment may be unreadable: that is
+        the torn tail of a crash mid-write, and it is cut off so new records
+        do not follow it. Anywhere else records after it would be lost, so
+        replay stops with `WALCorruptedError`.
+        """
+        segments = [p for p in [*self._sealed_segments(), self.path] if p.exists()]
+        count = 0
+        for segment in segments:
+            with open(segment, 'rb') as f:
+                offset, line_no = 0, 0
+                while True:
+                    line = f.readline()
+                    if not line:
+                        break
+                    line_no += 1
+                    try:
+                        # A record is written with its newline, so one without it is torn
+                        record = json.loads(line) if line.endswith(b'\n') else None
+                    except ValueError:
+                        record = None
+                    if record is None:
+                        if segment != segments[-1] or f.read(1):
+                            raise WALCorruptedError(f"Unreadable WAL record {segment}:{line_no}")
+                        logger.warning(f"Dropping torn WAL record {segment}:{line_no}")
+                        self._truncate(segment, offset)
+                        break
+                    apply(record)
+                    count += 1
+                    offset += len(line)
+        return count
+
+    def _truncate(self, segment: Path, size: int):
+        with open(segment, 'r+b') as f:
+            f.truncate(size)
+            os.fsync(f.fileno())
+        if segment == self.path:
+            self.size = size
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._executor.shutdown(wait=True)
+
+    def _take_pending(self) -> List[str]:
+        lines, self._pending = self._pending, []
+        self._has_pending.clear()
+        return lines
+
+    def _restore_pending(self, lines: List[str]):
+        """Put records back in front of anything buffered since, for the next commit"""
+        if lines:
+            self._pending = lines + self._pending
+            self._has_pending.set()
+
+    def _write(self, lines: List[str]):
+        if self._file is None:
+            # Unbuffered, so a failed write leaves nothing queued in Python
+            self._file = open(self.path, 'ab', buffering=0)
+        data = ''.join(lines).encode('utf-8')
+        append_synced(self._file, data)
+        self.size += len(data)
+
+    def _seal(self, lines: List[str]) -> List[Path]:
+        if lines:
+            self._write(lines)
+            lines.clear()
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self.path.exists():
+            sealed = self._sealed_segments()
+            seq = int(sealed[-1].suffixes[-2][1:]) + 1 if sealed else 1
+            self.path.rename(self.path.with_name(f"{self.path.stem}.{seq}{self.path.suffix}"))
+        self.size = 0
+        return self._sealed_segments()
+
+    def _sealed_segments(self) -> List[Path]:
+        segments = self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}")
+        return sorted(
+            (p for p in segments if p.suffixes[-2][1:].isdigit()),
+            key=lambda p: int(p.suffixes[-2][1:])
+        )
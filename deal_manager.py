@@ -1,17 +1,31 @@
 from datetime import datetime
 import logging
-from typing import Optional
-from config import Deal, DealType
+from typing import List, Optional, Tuple
+from config import Deal, DealType, DealParticipant, DealHistoryEntry
+from data.ids import new_id
+from models import DealStatus
+from stats import StatsEngine
 
 logger = logging.getLogger(__name__)
 
 class DealManager:
-    def __init__(self, data_manager):
+    def __init__(self, data_manager, scheduler=None, stats: StatsEngine = None):
         self.data_manager = data_manager
+        self.scheduler = scheduler
+        self.stats = stats or StatsEngine(data_manager)
+
+    async def create_deal(self, deal: Deal) -> str:
+        if not deal.id:
+            deal.id = new_id()
+        await self.stats.create_deal(deal)
+        if self.scheduler:
+            self.scheduler.schedule_deal(deal)
+        logger.info(f"Deal {deal.id} created.")
+        return deal.id
 
     async def create_deal_group(self, creator_id: int, deal_type: str, amount: float, terms: str) -> Optional[str]:
         try:
-            deal_id = f"deal_{datetime.now().strftime('%Y%m%d%H%M%S')}_{creator_id}"
+            deal_id = new_id()
             
             deal = Deal(
                 id=deal_id,
@@ -22,101 +36,79 @@ class DealManager:
                 members=[creator_id]
             )
             
-            self.data_manager.save_deal(deal_id, deal.to_dict())
-            return deal_id
+            return await self.create_deal(deal)
             
         except Exception as e:
             logger.error(f"Error creating deal: {e}")
             return None
 
     async def setup_deal_chat(self, deal_id: str, group_id: int) -> bool:
-        deal_data = self.data_manager.get_deal(deal_id)
-        if not deal_data:
-            return False
-        
-        deal = Deal.from_dict(deal_data)
-        deal.group_id = group_id
-        self.data_manager.save_deal(deal_id, deal.to_dict())
-        return True
+        return bool(await self.data_manager.update_deal(deal_id, group_id=group_id))
 
     async def complete_deal(self, deal_id: str) -> bool:
-        deal_data = self.data_manager.get_deal(deal_id)
-        if not deal_data:
-            return False
-        
-        deal = Deal.from_dict(deal_data)
-        deal.status = 'completed'
-        self.data_manager.save_deal(deal_id, deal.to_dict())
-        
-        for member_id in deal.members:
-            user_data = self.data_manager.get_user(member_id)
-            if user_data:
-                user = User.from_dict(user_data)
-                user.completed_deals += 1
-                user.reputation += 1
-                self.data_manager.save_user(member_id, user.to_dict())
-        
-        return True
-
-    async def update_user_statistics(self, user_id: int, deal: Deal):
-        user_data = self.data_manager.get_user(user_id)
-        if user_data:
-            user = User.from_dict(user_data)
-            user.statistics.total_deals_participated += 1
-            user.statistics.total_amount_handled += deal.amount
-            self.data_manager.save_user(user_id, user.to_dict())
+        return await self.update_deal_status(deal_id, 'completed')
 
     async def add_deal_history(self, deal_id: str, action: str, user_id: int):
-        deal_data = self.data_manager.get_deal(deal_id)
-        if deal_data:
-            deal = Deal.from_dict(deal_data)
-            entry = DealHistoryEntry(
-                timestamp=datetime.now().isoformat(),
-                action=action,
-                user_id=user_id
-            )
-            deal.history.append(entry)
-            self.data_manager.save_deal(deal_id, deal.to_dict())
+        deal = await self.data_manager.get_deal(deal_id)
+        if deal:
+            await self.data_manager.add_deal_history(deal, action, user_id)
+
+    async def get_deal_history(self, deal_id: str, cursor: int = 0,
+                               limit: int = 50) -> Tuple[List[DealHistoryEntry], Optional[int]]:
+        return await self.data_manager.get_deal_history(deal_id, cursor, limit)
 
     async def update_deal_metadata(self, deal_id: str, **kwargs) -> bool:
-        deal_data = self.data_manager.get_deal(deal_id)
-        if not deal_data:
+        def apply(deal: Deal):
+            for key, value in kwargs.items():
+                if hasattr(deal.metadata, key):
+                    setattr(deal.metadata, key, value)
+
+        deal = await self.data_manager.update_deal(deal_id, apply)
+        if not deal:
             return False
-        
-        deal = Deal.from_dict(deal_data)
-        for key, value in kwargs.items():
-            if hasattr(deal.metadata, key):
-                setattr(deal.metadata, key, value)
-        
-        self.data_manager.save_deal(deal_id, deal.to_dict())
+        if self.scheduler and 'deadline' in kwargs:
+            self.scheduler.schedule_deal(deal)
         return True
 
     async def add_participant(self, deal_id: str, user_id: int, role: str = 'member') -> bool:
-        deal_data = self.data_manager.get_deal(deal_id)
-        if not deal_data:
-            return False
-        
-        deal = Deal.from_dict(deal_data)
-        if user_id not in deal.members:
+        def apply(deal: Deal):
+            if user_id in deal.members:
+                return False
             deal.members.append(user_id)
-            deal.participants[user_id] = DealParticipant(
+            deal.participants[str(user_id)] = DealParticipant(
                 role=role,
                 joined_at=datetime.now().isoformat()
             )
-            self.data_manager.save_deal(deal_id, deal.to_dict())
-        return True
+
+        if await self.data_manager.update_deal(deal_id, apply):
+            return True
+        return await self.data_manager.get_deal(deal_id) is not None
+
+    async def accept_deal(self, deal_id: str, savior_id: int) -> Optional[Deal]:
+        """Make `savior_id` the deal's savior; None if the deal is missing or already accepted"""
+        def accept(deal: Deal):
+            # Only the first of several concurrent accepts wins
+            if deal.status == DealStatus.ACCEPTED.value:
+                return False
+            if savior_id not in deal.members:
+                deal.members.append(savior_id)
+            deal.participants[str(savior_id)] = DealParticipant(
+                role='savior',
+                joined_at=datetime.now().isoformat()
+            )
+
+        deal, old_status = await self.stats.transition(deal_id, DealStatus.ACCEPTED.value, accept, joining=[savior_id])
+        if not deal or old_status == DealStatus.ACCEPTED.value:
+            return None
+        if self.scheduler:
+            await self.scheduler.on_status_change(deal, old_status)
+        return deal
 
     async def update_deal_status(self, deal_id: str, new_status: str) -> bool:
-        deal_data = self.data_manager.get_deal(deal_id)
-        if not deal_data:
+        # Counters follow status, so every transition goes through the stats engine
+        deal, old_status = await self.stats.transition(deal_id, new_status)
+        if not deal:
             return False
-        
-        deal = Deal.from_dict(deal_data)
-        deal.status = new_status
-        deal.updated_at = datetime.now().isoformat()
-        
-        if new_status == 'completed':
-            deal.completion_date = datetime.now().isoformat()
-        
-        self.data_manager.save_deal(deal_id, deal.to_dict())
-        return True
\ No newline at end of file
+        if self.scheduler:
+            await self.scheduler.on_status_change(deal, old_status)
+        return True
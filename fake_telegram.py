@@ -0,0 +1,111 @@
+"""Local stand-in for the Telegram Bot API, for exercising webhook mode.
+
+Serves the few Bot API methods the bot calls and posts synthetic updates
+to its webhook. Run the bot with TELEGRAM_API_URL pointing here:
+
+    TELEGRAM_API_URL=http://localhost:8081 BOT_MODE=webhook WEBHOOK_SECRET=s python claude-bot.py
+    python fake_telegram.py --webhook http://localhost:8080/webhook --secret s --updates 5000
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+
+TEXTS = ['/start', '👥 Active Deals', '/create_deal', 'hello']
+
+class FakeTelegram:
+    def __init__(self):
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+
+    def result(self, method: str, params: dict):
+        """Bot API result for `method`, shaped just enough for aiogram to parse"""
+        self.calls[method] += 1
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+        if method in ('sendMessage', 'editMessageText'):
+            return {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id') or 0), 'type': 'private'},
+                'text': params.get('text', '')
+            }
+        return True
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        params = dict(await request.post()) if request.can_read_body else {}
+        result = self.result(request.match_info['method'], params)
+        return web.json_response({'ok': True, 'result': result})
+
+def make_update(update_id: int, users: int, text: str = None, first_user: int = 1000) -> dict:
+    user_id = first_user + update_id % users
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+            'text': text or TEXTS[update_id % len(TEXTS)]
+        }
+    }
+
+async def post_updates(webhook: str, secret: str, count: int, concurrency: int, users: int):
+    statuses = Counter()
+    latencies = []
+    update_ids = iter(range(1, count + 1))
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+
+    async def sender(session: aiohttp.ClientSession):
+        for update_id in update_ids:
+            started = time.perf_counter()
+            async with session.post(webhook, json=make_update(update_id, users), headers=headers) as response:
+                statuses[response.status] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(sender(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Posted {count} updates in {elapsed:.2f}s ({count / elapsed:.0f}/s)")
+    print(f"Statuses: {dict(statuses)}")
+    print(f"Latency p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms")
+
+async def main(args):
+    fake = FakeTelegram()
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', fake.handle_method)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    print(f"Fake Bot API on http://{args.host}:{args.port}")
+
+    try:
+        if args.webhook:
+            await post_updates(args.webhook, args.secret, args.updates, args.concurrency, args.users)
+            # Give the bot time to answer what it received
+            await asyncio.sleep(args.linger)
+            print(f"Bot API calls: {dict(fake.calls)}")
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--webhook', help="bot webhook URL to post updates to")
+    parser.add_argument('--secret', default='', help="WEBHOOK_SECRET of the bot")
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--linger', type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
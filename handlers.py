@@ -6,60 +6,67 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.enums import ChatType
 import logging
-import asyncio
-import uuid
 from dataclasses import dataclass
+from datetime import date, timedelta
 from typing import Optional
 from enum import Enum
 
-from config import User, DealType
-from keyboards import get_main_menu, get_contact_keyboard, get_settings_keyboard, get_giver_selection_keyboard
+from config import User, DealType, UserSettings
+from keyboards import (
+    get_main_menu, get_contact_keyboard, get_settings_keyboard, get_giver_selection_keyboard,
+    get_registration_keyboard, get_deal_types_keyboard, get_amount_selection_keyboard,
+    get_start_bot_keyboard, AMOUNTS, DEAL_TYPE_BUTTONS
+)
+from i18n import i18n, Locale
+from buttons import ButtonRouter
 from deal_manager import DealManager
 from data.data_manager import DataManager
-from models import DealType, Deal, DealStatus
-from dataclasses import asdict
+from notifications import NotificationDispatcher
+from profiler import SamplingProfiler
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
 router = Router()
+# Reply-keyboard presses, routed by exact text
+buttons = ButtonRouter(i18n)
 
 class DealStates(StatesGroup):
     entering_amount = State()
     entering_terms = State()
 
 @router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext, data_manager=None):
+async def cmd_start(message: Message, state: FSMContext, data_manager=None, t: Locale = i18n.get(None)):
     user_id = message.from_user.id
-    if not data_manager.get_user(user_id):
-        user = User(id=user_id, username=message.from_user.username)
-        data_manager.save_user(user_id, user.to_dict())
+    if not await data_manager.get_user(user_id):
+        # New users start in the language their Telegram client uses
+        user = User(id=user_id, username=message.from_user.username,
+                    settings=UserSettings(language=t.language))
+        await data_manager.save_user(user)
     
     await state.clear()
     await message.answer(
-        "Welcome to the DealBot! 🎉\n\n"
-        "Here you can create and manage deals. Please register to get started.",
-        reply_markup=get_registration_keyboard()  # Button to register
+        t('welcome'),
+        reply_markup=get_registration_keyboard(t.language)  # Button to register
     )
 
 @router.message(Command('create_deal_group'))
-async def cmd_create_deal(message: Message, state: FSMContext, data_manager=None):
+async def cmd_create_deal(message: Message, state: FSMContext, data_manager=None, t: Locale = i18n.get(None)):
     if message.chat.type != ChatType.PRIVATE:
         return
     
-    user_data = data_manager.get_user(message.from_user.id)
-    if not user_data or not user_data.get('is_registered'):
-        await message.answer("Please register first using /start")
+    if not await data_manager.is_registered(message.from_user.id):
+        await message.answer(t('register_first'))
         return
     
     await state.clear()
     await message.answer(
-        "Please select the type of deal you want to create:",
-        reply_markup=get_deal_types_keyboard()
+        t('choose_deal_type'),
+        reply_markup=get_deal_types_keyboard(t.language)
     )
 
 @router.callback_query(F.data.startswith('create_'))
-async def process_deal_type(callback: CallbackQuery, state: FSMContext):
+async def process_deal_type(callback: CallbackQuery, state: FSMContext, t: Locale = i18n.get(None)):
     await callback.answer()  # Acknowledge the callback
     
     deal_type = callback.data.replace('create_', '')
@@ -68,12 +75,12 @@ async def process_deal_type(callback: CallbackQuery, state: FSMContext):
     await state.set_state(DealStates.entering_amount)
     
     await callback.message.edit_text(
-        "Please enter the deal amount:",
+        t('enter_amount'),
         reply_markup=None  # Remove inline keyboard
     )
 
 @router.message(DealStates.entering_amount)
-async def process_amount(message: Message, state: FSMContext):
+async def process_amount(message: Message, state: FSMContext, t: Locale = i18n.get(None)):
     try:
         amount = float(message.text)
         if amount <= 0:
@@ -82,14 +89,15 @@ async def process_amount(message: Message, state: FSMContext):
         await state.update_data(amount=amount)
         await state.set_state(DealStates.entering_terms)
         
-        await message.answer("Please enter the deal terms:")
+        await message.answer(t('enter_terms'))
     except ValueError:
-        await message.answer("Please enter a valid positive number.")
+        await message.answer(t('invalid_amount'))
 
 @router.message(DealStates.entering_terms)
-async def process_terms(message: Message, state: FSMContext):
+async def process_terms(message: Message, state: FSMContext, deal_manager: DealManager = None,
+                        t: Locale = i18n.get(None)):
     data = await state.get_data()
-    deal_id = await create_deal_group(
+    deal_id = await deal_manager.create_deal_group(
         message.from_user.id,
         data['deal_type'],
         data['amount'],
@@ -98,34 +106,29 @@ async def process_terms(message: Message, state: FSMContext):
     
     if deal_id:
         await state.clear()
-        await message.answer(
-            "Deal created successfully! Please create a group and add me there.",
-            reply_markup=get_main_menu()
-        )
+        await message.answer(t('deal_created_add_group'), reply_markup=get_main_menu(t.language))
     else:
-        await message.answer("Error creating deal. Please try again.")
+        await message.answer(t('deal_create_error'))
 
 @router.message(F.content_type.in_({'new_chat_members'}))
-async def on_new_member(message: Message):
+async def on_new_member(message: Message, data_manager=None, t: Locale = i18n.get(None)):
     for member in message.new_chat_members:
         if member.id == message.bot.id:
-            await message.answer(
-                "Thanks for adding me! This group will be used for deal communication.\n"
-                "All members should start a private chat with me and share their contact information."
-            )
+            await message.answer(t('bot_added_to_group'))
         else:
-            if member.id not in users or not users[member.id].is_registered:
+            user = await data_manager.get_user(member.id)
+            if not user or not user.is_registered:
                 bot_info = await message.bot.get_me()
+                member_t = i18n.get(member.language_code)
                 await message.answer(
-                    f"Welcome {member.first_name}! Please share your contact information "
-                    f"by starting a private chat with me.",
-                    reply_markup=get_start_bot_keyboard(bot_info.username)
+                    member_t('welcome_member', name=member.first_name),
+                    reply_markup=get_start_bot_keyboard(bot_info.username, member_t.language)
                 )
 
 @router.message(F.content_type.in_({'contact'}))
-async def handle_contact(message: Message, state: FSMContext, data_manager=None):
+async def handle_contact(message: Message, state: FSMContext, data_manager=None, t: Locale = i18n.get(None)):
     if not message.contact:
-        await message.answer("No contact information received. Please try again.")
+        await message.answer(t('no_contact'))
         return
         
     user_id = message.from_user.id
@@ -133,185 +136,229 @@ async def handle_contact(message: Message, state: FSMContext, data_manager=None)
     
     try:
         if user_id == contact.user_id:  # Verify the contact belongs to the user
-            user_data = data_manager.get_user(user_id)
-            if user_data:
-                user = User.from_dict(user_data)
+            user = await data_manager.get_user(user_id)
+            if user:
                 user.phone = contact.phone_number
                 user.first_name = contact.first_name
                 user.last_name = contact.last_name
                 user.is_registered = True
                 
                 # Update user data in the data manager
-                data_manager.save_user(user_id, user.to_dict())
+                await data_manager.save_user(user)
                 
                 await state.clear()
                 await message.answer(
-                    "Thanks for registering! You can now participate in deals.\n"
-                    "Use the buttons below to navigate.",
-                    reply_markup=get_main_menu()  # Ensure this is a button interaction
+                    t('registered'),
+                    reply_markup=get_main_menu(t.language)  # Ensure this is a button interaction
                 )
             else:
-                await message.answer("User data not found. Please restart the bot.")
+                await message.answer(t('user_not_found'))
         else:
-            await message.answer("The contact does not belong to you. Please share your own contact.")
+            await message.answer(t('contact_not_yours'))
     except Exception as e:
         logger.error(f"Error handling contact: {e}")
-        await message.answer("An error occurred while processing your contact. Please try again.")
+        await message.answer(t('contact_error'))
 
 @router.errors()
 async def error_handler(update: types.Update, exception: Exception):
     logger.error(f"Update {update} caused error {exception}")
     if isinstance(update, Message):
-        await update.answer("An error occurred while processing your request. Please try again.")
+        await update.answer(i18n.get(update.from_user.language_code)('error'))
 
 @router.message(Command("cancel"))
-async def cmd_cancel(message: Message, state: FSMContext):
+async def cmd_cancel(message: Message, state: FSMContext, t: Locale = i18n.get(None)):
     await state.clear()
-    await message.answer("Action cancelled", reply_markup=get_main_menu())
+    await message.answer(t('cancelled'), reply_markup=get_main_menu(t.language))
 
 @router.message(Command("complete_deal"))
-async def cmd_complete_deal(message: Message, data_manager=None):
-    if message.chat.type != ChatType.GROUP:
+async def cmd_complete_deal(message: Message, data_manager=None, t: Locale = i18n.get(None)):
+    if message.chat.type not in (ChatType.GROUP, ChatType.SUPERGROUP):
         return
         
-    deal = data_manager.get_deal_by_group(message.chat.id)
+    deal = await data_manager.get_deal_by_group(message.chat.id)
     if not deal:
-        await message.answer("No active deal in this group")
+        await message.answer(t('no_group_deal'))
         return
         
     # Add completion logic
 
 @router.message(Command("settings"))
-async def cmd_settings(message: Message, data_manager=None):
-    user_data = data_manager.get_user(message.from_user.id)
-    if user_data:
-        user = User.from_dict(user_data)
-        settings_text = (
-            "Current Settings:\n"
-            f"🔔 Notifications: {user.settings.notifications}\n"
-            f"🌐 Language: {user.settings.language}"
-        )
-        await message.answer(settings_text, reply_markup=get_settings_keyboard())
-
-@router.message()
-async def update_user_activity(message: Message, data_manager=None):
-    user_data = data_manager.get_user(message.from_user.id)
-    if user_data:
-        user = User.from_dict(user_data)
-        user.last_active = datetime.now().isoformat()
-        data_manager.save_user(message.from_user.id, user.to_dict())
-
-@router.message(F.text == 'Register')
-async def register_user(message: Message, state: FSMContext):
+async def cmd_settings(message: Message, data_manager=None, t: Locale = i18n.get(None)):
+    user = await data_manager.get_user(message.from_user.id)
+    if user:
+        settings_text = t('settings', notifications=user.settings.notifications, language=user.settings.language)
+        await message.answer(settings_text, reply_markup=get_settings_keyboard(t.language))
+
+@router.message(Command("profile"))
+async def cmd_profile(message: Message, profiler: SamplingProfiler = None, admin_ids: frozenset = frozenset(),
+                      t: Locale = i18n.get(None)):
+    """`/profile [seconds]`: sample the live process; admins only"""
+    if not profiler or message.from_user.id not in admin_ids:
+        return
+    args = message.text.split()
+    duration = float(args[1]) if len(args) > 1 and args[1].isdigit() else 30.0
+    task = profiler.start(duration)
+    if task is None:
+        await message.answer(t('profile_running'))
+        return
+
+    await message.answer(t('profile_started', seconds=min(duration, profiler.max_duration)))
+    summary = await task
+    lag = summary['loop_lag']
+    await message.answer(t(
+        'profile_done',
+        samples=summary['samples'],
+        p99=lag['p99'] * 1000,
+        max=lag['max'] * 1000,
+        slow=len(summary['slow_callbacks']),
+        path=summary['collapsed']
+    ))
+
+REPORT_MAX_GROUPS = 50
+# A century of days; larger values overflow the date arithmetic
+REPORT_MAX_DAYS = 36500
+
+@router.message(Command("report"))
+async def cmd_report(message: Message, analytics=None, admin_ids: frozenset = frozenset(),
+                     t: Locale = i18n.get(None)):
+    """`/report [dimensions] [days]`: deal totals by e.g. `deal_type,status,day`; admins only"""
+    if message.from_user.id not in admin_ids:
+        return
+    if analytics is None:
+        await message.answer(t('report_unavailable'))
+        return
+    # numpy is importable once analytics is configured
+    from analytics import DIMENSIONS, format_report
+
+    by, since = ['deal_type', 'status'], None
+    for arg in message.text.split()[1:]:
+        if arg.isdecimal():
+            days = int(arg)
+            if not 1 <= days <= REPORT_MAX_DAYS:
+                await message.answer(t('report_usage', dimensions=', '.join(DIMENSIONS)))
+                return
+            since = date.today() - timedelta(days=days - 1)
+        else:
+            by = [dimension for dimension in arg.split(',') if dimension]
+    try:
+        rows = await analytics.report(by, since)
+    except ValueError:
+        await message.answer(t('report_usage', dimensions=', '.join(DIMENSIONS)))
+        return
+    if not rows:
+        await message.answer(t('report_empty'))
+        return
+    lines = format_report(rows[:REPORT_MAX_GROUPS], by)
+    if len(rows) > REPORT_MAX_GROUPS:
+        lines.append(t('report_more', count=len(rows) - REPORT_MAX_GROUPS))
+    await message.answer('\n'.join(lines))
+
+ACTIVE_DEALS_PAGE_SIZE = 10
+LEADERBOARD_SIZE = 10
+
+def display_name(user: User) -> str:
+    if user.username:
+        return f"@{user.username}"
+    return user.first_name or str(user.id)
+
+@router.message(Command("leaderboard"))
+async def cmd_leaderboard(message: Message, deal_manager: DealManager = None, t: Locale = i18n.get(None)):
+    top = await deal_manager.stats.top(LEADERBOARD_SIZE)
+    if not top:
+        await message.answer(t('leaderboard_empty'))
+        return
+    lines = [t('leaderboard_line', rank=rank, name=display_name(user), reputation=user.reputation) for rank, user in top]
+    await message.answer(t('leaderboard') + "\n" + "\n".join(lines))
+
+@buttons('btn_profile')
+async def show_profile(message: Message, data_manager=None, deal_manager: DealManager = None,
+                       t: Locale = i18n.get(None)):
+    user = await data_manager.get_user(message.from_user.id)
+    if not user:
+        await message.answer(t('user_not_found'))
+        return
+    rank = deal_manager.stats.rank(user.id)
+    statistics = user.statistics
+    await message.answer(t(
+        'my_profile',
+        reputation=user.reputation,
+        rank=rank if rank is not None else t('unranked'),
+        total=len(data_manager.leaderboard),
+        completed=user.completed_deals,
+        created=statistics.total_deals_created,
+        participated=statistics.total_deals_participated,
+        failed=statistics.failed_deals,
+        amount=statistics.total_amount_handled
+    ))
+
+@buttons('btn_active_deals')
+async def show_active_deals(message: Message, data_manager=None, t: Locale = i18n.get(None)):
+    user_id = message.from_user.id
+    deals = await data_manager.get_user_deals(user_id, status='active', limit=ACTIVE_DEALS_PAGE_SIZE)
+    if not deals:
+        await message.answer(t('no_active_deals'))
+        return
+    
+    total = await data_manager.count_user_deals(user_id, status='active')
+    lines = [f"• {deal.id}: {deal.amount} ({deal.deal_type.value})" for deal in deals]
+    if total > len(deals):
+        lines.append(t('active_deals_more', count=total - len(deals)))
+    await message.answer(t('active_deals') + "\n" + "\n".join(lines))
+
+@buttons('btn_register')
+async def register_user(message: Message, state: FSMContext, t: Locale = i18n.get(None)):
     await state.set_state('deal_selection')  # Set state for deal selection
     await message.answer(
-        "Please choose a deal type:",
-        reply_markup=get_deal_types_keyboard()  # Show deal types
+        t('choose_deal_type_short'),
+        reply_markup=get_deal_types_keyboard(t.language)  # Show deal types
     )
 
-@router.message(F.text.in_(['Charity', 'Debt', 'Service', 'Venture']))
-async def choose_deal_amount(message: Message, state: FSMContext):
+# Plain type names, as typed or sent by older keyboards, start the same flow
+@buttons(*DEAL_TYPE_BUTTONS, texts=[deal_type.value.capitalize() for deal_type in DealType])
+async def choose_deal_amount(message: Message, state: FSMContext, t: Locale = i18n.get(None)):
     deal_type = message.text
     await state.update_data(deal_type=deal_type)  # Save deal type
     await state.set_state('amount_selection')  # Set state for amount selection
     await message.answer(
-        "Please choose an amount:",
-        reply_markup=get_amount_selection_keyboard()  # Show amount options
+        t('choose_amount'),
+        reply_markup=get_amount_selection_keyboard(t.language)  # Show amount options
     )
 
-@router.message(F.text.in_(['100 USDT', '200 USDT', '500 USDT', '1000 USDT', 'Custom Amount']))
-async def select_giver(message: Message, state: FSMContext):
+@buttons('btn_custom_amount', texts=AMOUNTS)
+async def select_giver(message: Message, state: FSMContext, t: Locale = i18n.get(None)):
     amount = message.text
     await state.update_data(amount=amount)  # Save amount
     await state.set_state('giver_selection')  # Set state for giver selection
     await message.answer(
-        "Please select a Savior from your contacts or scan a QR code.",
-        reply_markup=get_giver_selection_keyboard()  # Show options for selecting Giver
+        t('select_savior'),
+        reply_markup=get_giver_selection_keyboard(t.language)  # Show options for selecting Giver
     )
 
-@router.message(F.text == 'Select from Contacts')
-async def select_from_contacts(message: Message, state: FSMContext):
+@buttons('btn_select_contacts')
+async def select_from_contacts(message: Message, state: FSMContext, t: Locale = i18n.get(None)):
     # Logic to select a contact and create a deal
-    await message.answer("Please select a Savior from your contacts or scan a QR code.")
+    await message.answer(t('select_savior'))
 
-@router.message(F.text == 'Savior Registration')
-async def register_savior(message: Message, state: FSMContext):
+@buttons('btn_savior_registration')
+async def register_savior(message: Message, state: FSMContext, t: Locale = i18n.get(None)):
     # Logic for Savior registration
-    await message.answer("Savior registered successfully! You will receive the deal shortly.")
-
-async def monitor_deal(deal_id):
-    # Retrieve the deal from the data manager
-    deal = data_manager.get_deal(deal_id)  # Assuming you have a method to get a deal by ID
-    if not deal:
-        logger.warning(f"Deal with ID {deal_id} not found.")
-        return
-
-    # Example of monitoring logic
-    while True:
-        # Check the current status of the deal
-        current_status = deal['status']  # Assuming deal has a 'status' field
-
-        if current_status == 'pending':
-            # Notify the Initiator and Savior about the pending status
-            initiator_id = deal['initiator_id']
-            savior_id = deal['savior_id']
-            await send_notification(initiator_id, f"Deal {deal_id} is still pending.")
-            await send_notification(savior_id, f"Deal {deal_id} is still pending.")
-
-        elif current_status == 'completed':
-            # Notify both parties that the deal is completed
-            await send_notification(initiator_id, f"Congratulations! Deal {deal_id} has been completed.")
-            await send_notification(savior_id, f"Congratulations! Deal {deal_id} has been completed.")
-            break  # Exit the loop if the deal is completed
-
-        elif current_status == 'failed':
-            # Notify both parties that the deal has failed
-            await send_notification(initiator_id, f"Deal {deal_id} has failed.")
-            await send_notification(savior_id, f"Deal {deal_id} has failed.")
-            break  # Exit the loop if the deal has failed
-
-        # Sleep for a certain period before checking again
-        await asyncio.sleep(60)  # Check every 60 seconds
-
-async def send_notification(user_id, message):
-    # Logic to send a notification to the user
-    await bot.send_message(user_id, message)  # Assuming you have access to the bot instance
-
-@router.message(F.text.in_([DealType.CHARITY.value, DealType.DEBT.value, DealType.SERVICE.value, DealType.VENTURE.value]))
-async def create_deal(message: Message, state: FSMContext, data_manager: DataManager):
-    deal_type = DealType(message.text)
-    user_id = message.from_user.id
-    
-    deal_amount = await state.get_data().get("deal_amount")
-    
-    deal = Deal(
-        id=str(uuid.uuid4()),
-        type=deal_type,
-        amount=deal_amount,
-        initiator=user_id,
-    )
-    
-    deal_id = data_manager.create_deal(asdict(deal))
-    
-    await state.update_data(deal_id=deal_id)
-    
-    await message.answer("Deal created successfully!")
+    await message.answer(t('savior_registered'))
 
-async def notify_user(user_id: str, message: str):
-    try:
-        await bot.send_message(user_id, message)
-    except Exception as e:
-        logging.error(f"Failed to send notification to user {user_id}: {str(e)}")
+def notify_user(notifier: NotificationDispatcher, user_id: int, message: str):
+    if not notifier.notify(user_id, message):
+        logger.debug(f"Notification to user {user_id} coalesced or dropped")
 
 @router.callback_query(F.data == "accept_deal")
-async def accept_deal(callback_query: CallbackQuery, state: FSMContext, data_manager: DataManager):
-    deal_id = await state.get_data().get("deal_id")
-    deal = data_manager.get_deal(deal_id)
+async def accept_deal(callback_query: CallbackQuery, state: FSMContext, data_manager: DataManager,
+                      deal_manager: DealManager, notifier: NotificationDispatcher, t: Locale = i18n.get(None)):
+    deal_id = (await state.get_data()).get("deal_id")
+    deal = await deal_manager.accept_deal(deal_id, callback_query.from_user.id) if deal_id else None
+    if deal:
+        creator = await data_manager.get_user(deal.creator_id)
+        creator_t = i18n.get(creator.settings.language if creator else None)
+        notify_user(notifier, deal.creator_id, creator_t('deal_accepted_creator', deal_id=deal_id))
+        notify_user(notifier, callback_query.from_user.id, t('deal_accepted_savior', deal_id=deal_id))
     
-    if deal["status"] != DealStatus.ACCEPTED.value:
-        data_manager.update_deal(deal_id, {"status": DealStatus.ACCEPTED.value, "savior": callback_query.from_user.id})
-        
-        await notify_user(deal["initiator"], f"Your deal {deal_id} has been accepted!")
-        await notify_user(callback_query.from_user.id, f"You have accepted deal {deal_id}!")
-    
-    await callback_query.answer("Deal accepted!")
+    await callback_query.answer(t('deal_accepted'))
+
+buttons.include(router)
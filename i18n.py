@@ -0,0 +1,97 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional
+
+from aiogram import BaseMiddleware
+
+logger = logging.getLogger(__name__)
+
+LOCALES_DIR = Path(__file__).parent / "locales"
+DEFAULT_LANGUAGE = 'en'
+
+class Locale:
+    """One language's messages and its precompiled keyboards"""
+
+    def __init__(self, language: str, messages: Dict[str, str]):
+        self.language = language
+        self.messages = messages
+        self.keyboards: Dict[str, Any] = {}
+
+    def __call__(self, key: str, **kwargs) -> str:
+        text = self.messages.get(key, key)
+        return text.format(**kwargs) if kwargs else text
+
+    def keyboard(self, name: str):
+        """Shared markup object; treat it as read-only"""
+        return self.keyboards[name]
+
+class I18n:
+    """Message catalogs loaded once from `<language>.json` files.
+
+    Every catalog is completed from the default language at load time,
+    so a lookup is a single dict access with no fallback chain.
+    """
+
+    def __init__(self, directory: Path = LOCALES_DIR, default: str = DEFAULT_LANGUAGE):
+        self.default = default
+        catalogs = {path.stem: self._read(path) for path in sorted(Path(directory).glob("*.json"))}
+        base = catalogs.get(default, {})
+        self.locales: Dict[str, Locale] = {
+            language: Locale(language, {**base, **messages}) for language, messages in catalogs.items()
+        }
+        self._variants: Dict[str, FrozenSet[str]] = {}
+        logger.info(f"Loaded locales: {', '.join(self.locales) or 'none'}")
+
+    @staticmethod
+    def _read(path: Path) -> Dict[str, str]:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def get(self, language: Optional[str]) -> Locale:
+        """Locale for a language or IETF tag ('ru', 'ru-RU'), else the default"""
+        if language:
+            locale = self.locales.get(language) or self.locales.get(language.split('-')[0].lower())
+            if locale:
+                return locale
+        return self.locales[self.default]
+
+    def variants(self, key: str) -> FrozenSet[str]:
+        """The text of `key` in every language, for matching button presses"""
+        variants = self._variants.get(key)
+        if variants is None:
+            variants = self._variants[key] = frozenset(locale(key) for locale in self.locales.values())
+        return variants
+
+    def compile_keyboards(self, builders: Dict[str, Callable[[Locale], Any]]):
+        """Build each keyboard once per language"""
+        for locale in self.locales.values():
+            for name, build in builders.items():
+                locale.keyboards[name] = build(locale)
+
+i18n = I18n()
+
+class I18nMiddleware(BaseMiddleware):
+    """Puts the sender's `Locale` in handler data as `t`.
+
+    The language is the user's saved setting, or Telegram's language
+    code for users we have not stored yet.
+    """
+
+    def __init__(self, catalog: I18n = i18n):
+        self.catalog = catalog
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        from_user = getattr(event, 'from_user', None)
+        language = None
+        if from_user is not None:
+            data_manager = data.get('data_manager')
+            user = await data_manager.get_user(from_user.id) if data_manager else None
+            language = user.settings.language if user else from_user.language_code
+        data['t'] = self.catalog.get(language)
+        return await handler(event, data)
@@ -1,56 +1,113 @@
-from aiogram.types import (
-    ReplyKeyboardMarkup, 
-    KeyboardButton,
-    InlineKeyboardMarkup,
-    InlineKeyboardButton
-)
+from functools import lru_cache
+
+from aiogram.types import ReplyKeyboardMarkup, InlineKeyboardMarkup
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
+from pydantic import ConfigDict
+
+from i18n import i18n, Locale, DEFAULT_LANGUAGE
+
+# Keyboards are built once per language and shared by every reply
+class FrozenReplyKeyboardMarkup(ReplyKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+
+def _freeze(markup):
+    cls = FrozenInlineKeyboardMarkup if isinstance(markup, InlineKeyboardMarkup) else FrozenReplyKeyboardMarkup
+    return cls(**markup.model_dump(exclude_none=True))
 
-def get_main_menu() -> ReplyKeyboardMarkup:
+AMOUNTS = ['100 USDT', '200 USDT', '500 USDT', '1000 USDT']
+DEAL_TYPE_BUTTONS = ['btn_charity', 'btn_debt', 'btn_service', 'btn_venture']
+
+# name -> builder of the frozen markup for one locale
+KEYBOARDS = {}
+
+def keyboard(name: str):
+    def register(build):
+        KEYBOARDS[name] = lambda t: _freeze(build(t))
+        return build
+    return register
+
+@keyboard('main_menu')
+def _main_menu(t: Locale) -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
-    builder.button(text='📝 Create Deal')
-    builder.button(text='👥 Active Deals')
-    builder.button(text='📊 My Profile')
-    builder.button(text='ℹ️ Help')
+    builder.button(text=t('btn_create_deal'))
+    builder.button(text=t('btn_active_deals'))
+    builder.button(text=t('btn_profile'))
+    builder.button(text=t('btn_help'))
     builder.adjust(2)
     return builder.as_markup(resize_keyboard=True)
 
-def get_contact_keyboard() -> ReplyKeyboardMarkup:
+@keyboard('contact')
+def _contact(t: Locale) -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
-    builder.button(text='📱 Share Contact', request_contact=True)
+    builder.button(text=t('btn_share_contact'), request_contact=True)
     return builder.as_markup(resize_keyboard=True)
 
-def get_deal_types_keyboard() -> ReplyKeyboardMarkup:
+@keyboard('deal_types')
+def _deal_types(t: Locale) -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
-    builder.button(text='🤲 Charity')
-    builder.button(text='💰 Debt')
-    builder.button(text='🔧 Service')
-    builder.button(text='💡 Venture')
+    builder.button(text=t('btn_charity'))
+    builder.button(text=t('btn_debt'))
+    builder.button(text=t('btn_service'))
+    builder.button(text=t('btn_venture'))
     return builder.as_markup(resize_keyboard=True)
 
-def get_settings_keyboard() -> ReplyKeyboardMarkup:
+@keyboard('settings')
+def _settings(t: Locale) -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
-    builder.button(text='🔔 Notifications', callback_data='toggle_notifications')
-    builder.button(text='🌐 Language', callback_data='change_language')
+    builder.button(text=t('btn_notifications'))
+    builder.button(text=t('btn_language'))
     builder.adjust(1)
     return builder.as_markup(resize_keyboard=True)
 
-def get_registration_keyboard() -> ReplyKeyboardMarkup:
+@keyboard('registration')
+def _registration(t: Locale) -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
-    builder.button(text='Register')
+    builder.button(text=t('btn_register'))
     return builder.as_markup(resize_keyboard=True)
 
-def get_amount_selection_keyboard() -> ReplyKeyboardMarkup:
+@keyboard('amount_selection')
+def _amount_selection(t: Locale) -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
-    builder.button(text='100 USDT')
-    builder.button(text='200 USDT')
-    builder.button(text='500 USDT')
-    builder.button(text='1000 USDT')
-    builder.button(text='Custom Amount')  # Option for custom amount
+    for amount in AMOUNTS:
+        builder.button(text=amount)
+    builder.button(text=t('btn_custom_amount'))  # Option for custom amount
     return builder.as_markup(resize_keyboard=True)
 
-def get_giver_selection_keyboard() -> ReplyKeyboardMarkup:
+@keyboard('giver_selection')
+def _giver_selection(t: Locale) -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
-    builder.button(text='Select from Contacts')
-    builder.button(text='Scan QR Code')
-    return builder.as_markup(resize_keyboard=True)
\ No newline at end of file
+    builder.button(text=t('btn_select_contacts'))
+    builder.button(text=t('btn_scan_qr'))
+    return builder.as_markup(resize_keyboard=True)
+
+i18n.compile_keyboards(KEYBOARDS)
+
+def get_main_menu(language: str = DEFAULT_LANGUAGE) -> ReplyKeyboardMarkup:
+    return i18n.get(language).keyboard('main_menu')
+
+def get_contact_keyboard(language: str = DEFAULT_LANGUAGE) -> ReplyKeyboardMarkup:
+    return i18n.get(language).keyboard('contact')
+
+def get_deal_types_keyboard(language: str = DEFAULT_LANGUAGE) -> ReplyKeyboardMarkup:
+    return i18n.get(language).keyboard('deal_types')
+
+def get_settings_keyboard(language: str = DEFAULT_LANGUAGE) -> ReplyKeyboardMarkup:
+    return i18n.get(language).keyboard('settings')
+
+def get_registration_keyboard(language: str = DEFAULT_LANGUAGE) -> ReplyKeyboardMarkup:
+    return i18n.get(language).keyboard('registration')
+
+def get_amount_selection_keyboard(language: str = DEFAULT_LANGUAGE) -> ReplyKeyboardMarkup:
+    return i18n.get(language).keyboard('amount_selection')
+
+def get_giver_selection_keyboard(language: str = DEFAULT_LANGUAGE) -> ReplyKeyboardMarkup:
+    return i18n.get(language).keyboard('giver_selection')
+
+@lru_cache(maxsize=64)
+def get_start_bot_keyboard(bot_username: str, language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.button(text=i18n.get(language)('btn_start_bot'), url=f"https://t.me/{bot_username}?start=register")
+    return _freeze(builder.as_markup())
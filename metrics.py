@@ -0,0 +1,238 @@
+import time
+import bisect
+import inspect
+import logging
+import functools
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from aiohttp import web
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Seconds; fine enough at the low end for in-memory handlers
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Time spent in DataManager by the handler running in this context: [seconds]
+_data_time: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar('_data_time', default=None)
+# Nesting depth of instrumented DataManager calls, so only the outermost one is timed
+_data_depth: contextvars.ContextVar[int] = contextvars.ContextVar('_data_depth', default=0)
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for label_values, value in self.values.items():
+            yield f"{self.name}{_labels(self.labels, label_values)} {value}"
+
+class Histogram:
+    """Fixed-bucket histogram; an observation is one bisect and two additions"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> per-bucket counts (last one is +Inf), and the sum
+        self._counts: Dict[Tuple, List[int]] = {}
+        self._sums: Dict[Tuple, float] = {}
+
+    def observe(self, value: float, *label_values):
+        counts = self._counts.get(label_values)
+        if counts is None:
+            counts = self._counts[label_values] = [0] * (len(self.buckets) + 1)
+            self._sums[label_values] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[label_values] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.labels, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, label_values)} {self._sums[label_values]}"
+            yield f"{self.name}_count{_labels(self.labels, label_values)} {cumulative}"
+
+class Gauge:
+    """Read at scrape time from a callback returning a value or {label values: value}"""
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Union[float, Dict[Tuple, float]]],
+                 labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self.labels = labels
+
+    def render(self) -> Iterable[str]:
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.warning(f"Error collecting {self.name}: {e}")
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            yield f"{self.name}{_labels(self.labels, label_values)} {float(value)}"
+
+class UpdateMetrics(BaseMiddleware):
+    """Outer `update` middleware: counts and times every update by type"""
+
+    def __init__(self, metrics: "Metrics"):
+        self.metrics = metrics
+
+    async def __call__(self, handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        update_type = event.event_type
+        self.metrics.updates.inc(update_type)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.update_errors.inc(update_type)
+            raise
+        finally:
+            self.metrics.update_seconds.observe(time.perf_counter() - started, update_type)
+
+class HandlerMetrics(BaseMiddleware):
+    """Per-handler latency, errors and DataManager time.
+
+    Runs right around the matched handler, so it also sees exceptions
+    that `router.errors()` later swallows.
+    """
+
+    def __init__(self, metrics: "Metrics"):
+        self.metrics = metrics
+
+    async def __call__(self, handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+                       event: Any, data: Dict[str, Any]) -> Any:
+        # Button presses all go through one handler; name the button's own
+        handler_object = data.get('button') or data.get('handler')
+        name = handler_object.callback.__name__ if handler_object else 'unknown'
+        data_time = [0.0]
+        token = _data_time.set(data_time)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self.metrics.handler_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            self.metrics.handler_seconds.observe(time.perf_counter() - started, name)
+            self.metrics.handler_data_seconds.observe(data_time[0], name)
+            _data_time.reset(token)
+
+class Metrics:
+    """Bot metrics registry, rendered in the Prometheus text format on `/metrics`"""
+
+    def __init__(self):
+        self.updates = Counter('bot_updates_total', "Updates received, by type", ('type',))
+        self.update_errors = Counter('bot_update_errors_total', "Updates whose processing raised", ('type',))
+        self.update_seconds = Histogram('bot_update_seconds', "Time to process an update", ('type',))
+        self.handler_seconds = Histogram('bot_handler_seconds', "Handler latency", ('handler',))
+        self.handler_errors = Counter('bot_handler_errors_total', "Exceptions raised by handlers",
+                                      ('handler', 'error'))
+        self.handler_data_seconds = Histogram('bot_handler_data_manager_seconds',
+                                              "Time a handler spent in DataManager calls", ('handler',))
+        self.data_seconds = Histogram('bot_data_manager_seconds', "DataManager call latency", ('method',))
+        self._metrics: List[Union[Counter, Histogram, Gauge]] = [
+            self.updates, self.update_errors, self.update_seconds, self.handler_seconds,
+            self.handler_errors, self.handler_data_seconds, self.data_seconds
+        ]
+
+    def gauge(self, name: str, help: str, collect: Callable, labels: Tuple[str, ...] = ()):
+        self._metrics.append(Gauge(name, help, collect, labels))
+
+    def install(self, dp: Dispatcher):
+        """Register the middlewares; do it before other middlewares so they are timed too"""
+        dp.update.outer_middleware(UpdateMetrics(self))
+        handler_metrics = HandlerMetrics(self)
+        for name, observer in dp.observers.items():
+            if name not in ('update', 'error'):
+                observer.middleware(handler_metrics)
+
+    def instrument(self, data_manager):
+        """Time the public DataManager coroutines, as seen by their callers"""
+        for name, method in inspect.getmembers(type(data_manager), inspect.iscoroutinefunction):
+            if name.startswith('_') or name in ('auto_save', 'close'):
+                continue
+            setattr(data_manager, name, self._timed(name, getattr(data_manager, name)))
+
+        self.gauge('bot_data_manager_pending_writes', "Dirty records and events waiting for a flush",
+                   lambda: {(kind,): count for kind, count in data_manager.pending_writes().items()}, ('kind',))
+        self.gauge('bot_cache_items', "Objects in the identity map",
+                   lambda: {(table,): stats['items'] for table, stats in data_manager.cache_stats().items()},
+                   ('table',))
+        self.gauge('bot_cache_hit_ratio', "Identity map hit ratio since start",
+                   lambda: {(table,): stats['hit_rate'] for table, stats in data_manager.cache_stats().items()},
+                   ('table',))
+        self.gauge('bot_load_seconds', "Duration of the last storage load", lambda: data_manager.load_duration)
+        self.gauge('bot_snapshot_seconds', "Duration of the last snapshot",
+                   lambda: data_manager.last_snapshot.get('duration', 0.0))
+
+    def _timed(self, name: str, method: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        histogram = self.data_seconds
+
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            depth = _data_depth.get()
+            if depth:
+                return await method(*args, **kwargs)
+            token = _data_depth.set(depth + 1)
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                _data_depth.reset(token)
+                histogram.observe(elapsed, name)
+                data_time = _data_time.get()
+                if data_time is not None:
+                    data_time[0] += elapsed
+        return timed
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.render().encode('utf-8'),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def start_server(self, host: str = '0.0.0.0', port: int = 9090) -> web.AppRunner:
+        """Serve `/metrics` on its own port, for polling mode"""
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        runner = web.AppRunner(app, handle_signals=False)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"Metrics on http://{host}:{port}/metrics")
+        return runner
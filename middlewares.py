@@ -1,27 +1,45 @@
-from typing import Callable, Dict, Any, Awaitable
+from typing import Callable, Dict, Any, Awaitable, Union
 from aiogram import BaseMiddleware
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery
+
+from i18n import i18n
 
 class RegisterCheck(BaseMiddleware):
     async def __call__(
         self,
-        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
-        event: Message,
+        handler: Callable[[Union[Message, CallbackQuery], Dict[str, Any]], Awaitable[Any]],
+        event: Union[Message, CallbackQuery],
         data: Dict[str, Any]
     ) -> Any:
-        # Skip registration check for /start command
-        if event.text and event.text == '/start':
-            return await handler(event, data)
-        
+        if isinstance(event, Message):
+            # Skip registration check for /start and the contact that completes registration
+            if (event.text and event.text == '/start') or event.contact:
+                return await handler(event, data)
+
         # Get data manager from dispatcher context
         data_manager = data.get('data_manager')
-        
-        # Check if user is registered
-        user_data = data_manager.get_user(event.from_user.id) if data_manager else None
-        if not user_data or not user_data.get('is_registered'):
-            await event.answer(
-                "Please register first using /start command"
-            )
+
+        # Check if user is registered (in-memory set, no storage round-trip)
+        if not data_manager or not await data_manager.is_registered(event.from_user.id):
+            text = data.get('t', i18n.get(event.from_user.language_code))('register_first_command')
+            if isinstance(event, CallbackQuery):
+                await event.answer(text, show_alert=True)
+            else:
+                await event.answer(text)
             return
-        
-        return await handler(event, data) 
\ No newline at end of file
+
+        return await handler(event, data)
+
+class ActivityMiddleware(BaseMiddleware):
+    """Outer middleware recording that the sender was active, for every message and callback"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Union[Message, CallbackQuery], Dict[str, Any]], Awaitable[Any]],
+        event: Union[Message, CallbackQuery],
+        data: Dict[str, Any]
+    ) -> Any:
+        data_manager = data.get('data_manager')
+        if data_manager and event.from_user:
+            data_manager.touch_user(event.from_user.id)
+        return await handler(event, data)
@@ -0,0 +1,176 @@
+import time
+import logging
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramMigrateToChat,
+    TelegramForbiddenError,
+    TelegramBadRequest,
+    TelegramNetworkError,
+    TelegramServerError
+)
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    @property
+    def idle(self) -> bool:
+        elapsed = time.monotonic() - self.updated
+        return self.tokens + elapsed * self.rate >= self.capacity
+
+@dataclass
+class Notification:
+    chat_id: int
+    text: str
+    kwargs: dict = field(default_factory=dict)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+class NotificationDispatcher:
+    """Queue-backed sender that respects Telegram flood limits.
+
+    Handlers call `notify()` and return immediately. A fixed pool of
+    workers drains the queue, each send waiting on a global and a
+    per-chat token bucket. Identical messages already queued for a chat
+    are coalesced, and RetryAfter responses pause every worker for the
+    time Telegram asks for.
+    """
+
+    def __init__(self, bot: Bot, workers: int = 8, queue_size: int = 10_000,
+                 global_rate: float = 30.0, chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 max_retries: int = 3):
+        self.bot = bot
+        self.workers = workers
+        self.max_retries = max_retries
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._pending: Set[Tuple[int, str]] = set()
+        self._paused_until = 0.0
+        self._tasks = []
+
+        # Metrics
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._latencies = deque(maxlen=1000)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10.0):
+        """Drain what is queued (up to `timeout`) and stop the workers"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} undelivered notifications")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def notify(self, chat_id: int, text: str, **kwargs) -> bool:
+        """Enqueue a message; returns False if coalesced or dropped"""
+        key = (chat_id, text)
+        if key in self._pending:
+            self.coalesced += 1
+            return False
+        try:
+            self._queue.put_nowait(Notification(chat_id, text, kwargs))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(f"Notification queue full, dropping message to {chat_id}")
+            return False
+        self._pending.add(key)
+        return True
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            'queue_depth': self._queue.qsize(),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'latency_p50': latencies[len(latencies) // 2] if latencies else 0.0,
+            'latency_p99': latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+        }
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= 10_000:
+                self._chat_buckets = {k: b for k, b in self._chat_buckets.items() if not b.idle}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _worker(self):
+        while True:
+            notification = await self._queue.get()
+            try:
+                await self._deliver(notification)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to send notification to user {notification.chat_id}: {e}")
+            finally:
+                self._pending.discard((notification.chat_id, notification.text))
+                self._queue.task_done()
+
+    async def _deliver(self, notification: Notification):
+        chat_id = notification.chat_id
+        while True:
+            notification.attempts += 1
+            pause = self._paused_until - time.monotonic()
+            wait = max(pause, self._global_bucket.reserve(), self._chat_bucket(chat_id).reserve())
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                await self.bot.send_message(chat_id, notification.text, **notification.kwargs)
+                self.sent += 1
+                self._latencies.append(time.monotonic() - notification.enqueued_at)
+                return
+            except TelegramRetryAfter as e:
+                # Flood control applies to the whole bot, not just this chat
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            except TelegramMigrateToChat as e:
+                chat_id = e.migrate_to_chat_id
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Blocked bot, deleted chat, bad markup: retrying won't help
+                self.failed += 1
+                logger.warning(f"Notification to {chat_id} rejected: {e}")
+                return
+            except (TelegramNetworkError, TelegramServerError):
+                if notification.attempts > self.max_retries:
+                    raise
+                await asyncio.sleep(2 ** notification.attempts)
+
+            if notification.attempts > self.max_retries:
+                raise RuntimeError(f"giving up after {notification.attempts} attempts")
+            self.retried += 1
@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)})"
+
+def _collapse(frame) -> str:
+    """Root-first `a;b;c` stack, the line format flamegraph.pl and speedscope read"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class SamplingProfiler:
+    """Time-bounded sampling profile of the event loop thread, safe to run live.
+
+    A background thread snapshots the loop thread's stack every
+    `interval` seconds, so handlers are not instrumented and the cost
+    disappears when no profile is running. Alongside it a heartbeat
+    task measures event-loop lag; when the loop stalls for longer than
+    `slow_threshold`, the stack the sampler saw during the stall is
+    recorded as a slow callback. Each run writes
+    `profile_<timestamp>.collapsed` (flame graph input) and a JSON
+    summary to `output_dir`.
+    """
+
+    def __init__(self, output_dir: Path, interval: float = 0.005, lag_interval: float = 0.01,
+                 slow_threshold: float = 0.1, max_duration: float = 120.0):
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.lag_interval = lag_interval
+        self.slow_threshold = slow_threshold
+        self.max_duration = max_duration
+        self._task: Optional[asyncio.Task] = None
+
+        # Shared with the sampler thread; single assignments only
+        self._heartbeat = 0.0
+        self._stall_stack: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, duration: float = 30.0) -> Optional[asyncio.Task]:
+        """Begin a profile unless one is running; the task resolves to the summary"""
+        if self.running:
+            return None
+        self._task = asyncio.create_task(self.profile(min(duration, self.max_duration)))
+        return self._task
+
+    async def profile(self, duration: float) -> Dict:
+        loop = asyncio.get_running_loop()
+        stacks: Counter = Counter()
+        stop = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._stall_stack = None
+        sampler = threading.Thread(
+            target=self._sample, args=(threading.get_ident(), stacks, stop),
+            name="profiler-sampler", daemon=True
+        )
+
+        logger.info(f"Profiling for {duration:.0f}s")
+        started = time.monotonic()
+        sampler.start()
+        try:
+            lags, slow_callbacks = await self._watch_loop(loop, started + duration)
+        finally:
+            stop.set()
+            await loop.run_in_executor(None, sampler.join)
+
+        summary = {
+            'started': datetime.fromtimestamp(time.time() - (time.monotonic() - started)).isoformat(),
+            'duration': time.monotonic() - started,
+            'samples': sum(stacks.values()),
+            'interval': self.interval,
+            'loop_lag': self._lag_stats(lags),
+            'slow_callbacks': sorted(slow_callbacks, key=lambda c: c['lag'], reverse=True)[:50]
+        }
+        summary['collapsed'], summary['summary'] = await loop.run_in_executor(None, self._write, stacks, summary)
+        logger.info(
+            f"Profile written to {summary['collapsed']}: {summary['samples']} samples, "
+            f"max loop lag {summary['loop_lag']['max'] * 1000:.1f}ms, "
+            f"{len(slow_callbacks)} slow callbacks"
+        )
+        return summary
+
+    def _sample(self, thread_id: int, stacks: Counter, stop: threading.Event):
+        stall_after = self.slow_threshold + self.lag_interval
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            stack = _collapse(frame)
+            del frame
+            stacks[stack] += 1
+            if self._stall_stack is None and time.monotonic() - self._heartbeat > stall_after:
+                # The loop has not come back for a while: this is what it is stuck in
+                self._stall_stack = stack
+
+    async def _watch_loop(self, loop: asyncio.AbstractEventLoop, deadline: float):
+        lags: List[float] = []
+        slow_callbacks: List[Dict] = []
+        while time.monotonic() < deadline:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            lag = max(0.0, loop.time() - expected)
+            self._heartbeat = time.monotonic()
+            lags.append(lag)
+            if lag > self.slow_threshold:
+                slow_callbacks.append({
+                    'at': datetime.now().isoformat(),
+                    'lag': lag,
+                    'stack': self._stall_stack or 'unknown'
+                })
+            self._stall_stack = None
+        return lags, slow_callbacks
+
+    @staticmethod
+    def _lag_stats(lags: List[float]) -> Dict:
+        if not lags:
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        lags = sorted(lags)
+        return {
+            'count': len(lags),
+            'mean': sum(lags) / len(lags),
+            'p50': lags[len(lags) // 2],
+            'p99': lags[int(len(lags) * 0.99)],
+            'max': lags[-1]
+        }
+
+    def _write(self, stacks: Counter, summary: Dict):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        collapsed = self.output_dir / f"profile_{timestamp}.collapsed"
+        summary_file = self.output_dir / f"profile_{timestamp}.json"
+        with open(collapsed, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(summary_file, 'w') as f:
+            json.dump({**summary, 'collapsed': str(collapsed)}, f, indent=2)
+        return str(collapsed), str(summary_file)
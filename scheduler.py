@@ -0,0 +1,247 @@
+import json
+import time
+import zlib
+import heapq
+import logging
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import Deal
+from data.json_storage import atomic_write_json
+from i18n import Locale, i18n
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {'completed', 'failed', 'cancelled'}
+
+# Status -> catalog key of its notification; other statuses use 'deal_status_changed'
+STATUS_MESSAGES = {
+    'completed': 'deal_completed',
+    'failed': 'deal_failed'
+}
+
+def status_name(t: Locale, status: str) -> str:
+    key = f"status_{status.lower()}"
+    return t(key) if key in t.messages else status
+
+class DealScheduler:
+    """Single timer for deal reminders and deadlines.
+
+    Jobs live in a min-heap keyed by due time; `_jobs` is the source of
+    truth and heap entries that no longer match it are skipped when
+    popped, so rescheduling and cancelling are O(log n) and O(1). One task
+    sleeps until the earliest job is due, so idle deals cost no wakeups.
+    Jobs are persisted to `state_file` and survive restarts.
+
+    With several workers each one keeps the jobs of the deals it owns
+    (by a hash of the deal id), whichever worker handled the request.
+    Owners rebuild their jobs from the deal store at startup and every
+    `resync_interval`, which picks up deals created or rescheduled on
+    other workers and survives a change in the number of workers.
+    """
+
+    def __init__(self, data_manager, notifier, state_file: Path,
+                 reminder_interval: float = 24 * 3600, persist_interval: float = 5.0,
+                 worker_id: int = 0, workers: int = 1, resync_interval: float = 300.0):
+        self.data_manager = data_manager
+        self.notifier = notifier
+        self.state_file = Path(state_file)
+        self.reminder_interval = reminder_interval
+        self.persist_interval = persist_interval
+        self.worker_id = worker_id
+        self.workers = workers
+        self.resync_interval = resync_interval
+
+        # (deal_id, kind) -> due epoch seconds
+        self._jobs: Dict[Tuple[str, str], float] = {}
+        self._heap: List[Tuple[float, str, str]] = []
+        self._wakeup = asyncio.Event()
+        self._dirty = False
+        self._tasks = []
+
+    def load(self):
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                for deal_id, kind, due in json.load(f):
+                    if self.owns(deal_id):
+                        self._push(deal_id, kind, due)
+            logger.info(f"Loaded {len(self._jobs)} scheduled deal jobs")
+        except Exception as e:
+            logger.error(f"Error loading scheduler state: {e}")
+
+    def start(self):
+        self.load()
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._persist_loop())
+        ]
+        if self.workers > 1:
+            self._tasks.append(asyncio.create_task(self._resync_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.persist()
+
+    # Scheduling API
+    def owns(self, deal_id: str) -> bool:
+        """Whether this worker runs the deal's jobs"""
+        return self.workers == 1 or zlib.crc32(deal_id.encode()) % self.workers == self.worker_id
+
+    def schedule_deal(self, deal: Deal, passed_deadline: bool = True):
+        """(Re)arm the reminder and deadline jobs for an open deal.
+
+        `passed_deadline=False` leaves a deadline that is already over
+        alone, so a resync does not announce it again.
+        """
+        if not self.owns(deal.id):
+            # The owner picks the change up at its next resync
+            return
+        if deal.status in TERMINAL_STATUSES:
+            self.cancel_deal(deal.id)
+            return
+        if (deal.id, 'reminder') not in self._jobs:
+            self._push(deal.id, 'reminder', time.time() + self.reminder_interval)
+
+        deadline = self._parse_deadline(deal.metadata.deadline if deal.metadata else None)
+        if deadline is None:
+            self._cancel(deal.id, 'deadline')
+        elif passed_deadline or deadline > time.time():
+            self._push(deal.id, 'deadline', deadline)
+
+    def cancel_deal(self, deal_id: str):
+        self._cancel(deal_id, 'reminder')
+        self._cancel(deal_id, 'deadline')
+
+    async def on_status_change(self, deal: Deal, old_status: Optional[str]):
+        """Notify members about a transition and update the deal's jobs"""
+        if deal.status == old_status:
+            return
+        self.schedule_deal(deal)
+        await self._notify_members(deal, STATUS_MESSAGES.get(deal.status, 'deal_status_changed'))
+
+    async def resync(self, page_size: int = 1000):
+        """Schedule every open deal this worker owns from the deal store"""
+        await self.data_manager.flush()
+        storage = self.data_manager.storage
+        start, count = None, 0
+        while True:
+            page = await storage.get_deals_by_time(start, None, page_size)
+            for deal_data in page:
+                if self.owns(deal_data['id']) and deal_data.get('status') not in TERMINAL_STATUSES:
+                    self.schedule_deal(Deal.from_dict(deal_data), passed_deadline=False)
+                    count += 1
+            if len(page) < page_size:
+                break
+            last = page[-1].get('created_at')
+            if last == start:
+                # A whole page shares one timestamp; widen until we get past it
+                page_size *= 2
+            # Deals at the last timestamp are read again; scheduling is idempotent
+            start = last
+        logger.info(f"Scheduler worker {self.worker_id} owns {count} open deals")
+
+    @property
+    def pending_jobs(self) -> int:
+        return len(self._jobs)
+
+    # Internals
+    @staticmethod
+    def _parse_deadline(deadline: Optional[str]) -> Optional[float]:
+        if not deadline:
+            return None
+        try:
+            return datetime.fromisoformat(deadline).timestamp()
+        except ValueError:
+            logger.warning(f"Ignoring unparseable deal deadline: {deadline}")
+            return None
+
+    def _push(self, deal_id: str, kind: str, due: float):
+        if self._jobs.get((deal_id, kind)) == due:
+            return
+        self._jobs[(deal_id, kind)] = due
+        heapq.heappush(self._heap, (due, deal_id, kind))
+        self._dirty = True
+        # Only wake the loop if this job is now the earliest one
+        if self._heap[0][0] == due:
+            self._wakeup.set()
+
+    def _cancel(self, deal_id: str, kind: str):
+        if self._jobs.pop((deal_id, kind), None) is not None:
+            self._dirty = True
+
+    async def _run(self):
+        while True:
+            # Drop entries superseded by a reschedule or cancel
+            while self._heap and self._jobs.get(self._heap[0][1:]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due, deal_id, kind = heapq.heappop(self._heap)
+            del self._jobs[(deal_id, kind)]
+            self._dirty = True
+            try:
+                await self._fire(deal_id, kind, due)
+            except Exception as e:
+                logger.error(f"Error running {kind} job for deal {deal_id}: {e}")
+
+    async def _fire(self, deal_id: str, kind: str, due: float = None):
+        deal = await self.data_manager.get_deal(deal_id)
+        if not deal or deal.status in TERMINAL_STATUSES:
+            return
+
+        if kind == 'reminder':
+            self._push(deal_id, 'reminder', time.time() + self.reminder_interval)
+            await self._notify_members(deal, 'deal_reminder')
+        elif kind == 'deadline':
+            deadline = self._parse_deadline(deal.metadata.deadline if deal.metadata else None)
+            if due is not None and deadline != due:
+                # Moved on another worker since this job was armed
+                self.schedule_deal(deal)
+                return
+            await self._notify_members(deal, 'deal_deadline_passed')
+
+    async def _notify_members(self, deal: Deal, key: str):
+        """Send catalog message `key` to every member in their own language"""
+        users = {user.id: user for user in await self.data_manager.get_users(deal.members)}
+        for member_id in deal.members:
+            user = users.get(member_id)
+            t = i18n.get(user.settings.language if user else None)
+            self.notifier.notify(member_id, t(key, deal_id=deal.id, status=status_name(t, deal.status)))
+
+    async def _resync_loop(self):
+        while True:
+            try:
+                await self.resync()
+            except Exception as e:
+                logger.error(f"Error resyncing scheduled deal jobs: {e}")
+            await asyncio.sleep(self.resync_interval)
+
+    async def _persist_loop(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            if self._dirty:
+                await self.persist()
+
+    async def persist(self):
+        self._dirty = False
+        jobs = [[deal_id, kind, due] for (deal_id, kind), due in self._jobs.items()]
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, atomic_write_json, self.state_file, jobs)
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"Error saving scheduler state: {e}")
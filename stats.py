@@ -0,0 +1,119 @@
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import Deal, User
+
+logger = logging.getLogger(__name__)
+
+# Fields of User.statistics; the rest below are attributes of User itself
+STATISTICS_FIELDS = {
+    'total_deals_created', 'total_deals_participated', 'total_amount_handled',
+    'successful_deals', 'failed_deals'
+}
+
+def member_effects(deal: Deal, status: Optional[str]) -> Dict[str, float]:
+    """What a deal in `status` adds to each member's counters"""
+    if status == 'completed':
+        return {
+            'reputation': 1,
+            'completed_deals': 1,
+            'successful_deals': 1,
+            'total_deals_participated': 1,
+            'total_amount_handled': deal.amount or 0
+        }
+    if status == 'failed':
+        return {'failed_deals': 1, 'total_deals_participated': 1}
+    return {}
+
+def _apply(user: User, effects: Dict[str, float], sign: int):
+    for field, amount in effects.items():
+        target = user.statistics if field in STATISTICS_FIELDS else user
+        setattr(target, field, getattr(target, field) + sign * amount)
+
+def _members(deal: Deal) -> List[int]:
+    members = list(dict.fromkeys(deal.members))
+    if deal.creator_id not in members:
+        members.insert(0, deal.creator_id)
+    return members
+
+class StatsEngine:
+    """The one place where deal transitions update user counters.
+
+    A deal contributes `member_effects(status)` to each member while it
+    is in that status, so a transition applies the new contribution and
+    takes back the old one, and counters stay right when a deal is
+    reopened. Counter changes commit in the same batch as the deal.
+    Rankings come from DataManager's leaderboard, which follows every
+    user save.
+    """
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+
+    async def create_deal(self, deal: Deal) -> Deal:
+        async with self.data_manager.batch() as batch:
+            creator = await batch.get_user(deal.creator_id)
+            batch.save_deal(deal)
+            if creator:
+                creator.statistics.total_deals_created += 1
+                batch.save_user(creator)
+        return deal
+
+    async def transition(self, deal_id: str, new_status: str, mutate: Callable[[Deal], Optional[bool]] = None,
+                         joining: Sequence[int] = ()) -> Tuple[Optional[Deal], Optional[str]]:
+        """Move a deal to `new_status`; returns the deal and its previous status.
+
+        `mutate` runs first and cancels the transition by returning False;
+        users it adds to the deal must be listed in `joining`. Runs under
+        the deal lock because counters must change exactly once per
+        transition, so it queues behind concurrent transitions rather
+        than retrying.
+        """
+        async with self.data_manager.deal_lock(deal_id), self.data_manager.batch() as batch:
+            deal = await batch.get_deal(deal_id)
+            if not deal:
+                return None, None
+            old_members = _members(deal)
+            users = {
+                user.id: user
+                for user in await batch.get_users(old_members + [user_id for user_id in joining if user_id not in old_members])
+            }
+
+            # Everything is loaded; from here on nothing yields until commit
+            old_status = deal.status
+            if old_status == new_status and mutate is None:
+                return deal, old_status
+            if mutate and mutate(deal) is False:
+                return deal, old_status
+            deal.status = new_status
+            if new_status == 'completed' and old_status != 'completed':
+                deal.completion_date = datetime.now().isoformat()
+            batch.save_deal(deal)
+
+            if old_status != new_status:
+                old_effects, new_effects = member_effects(deal, old_status), member_effects(deal, new_status)
+                changed = {}
+                for effects, members, sign in ((old_effects, old_members, -1), (new_effects, _members(deal), 1)):
+                    if not effects:
+                        continue
+                    for user_id in members:
+                        user = users.get(user_id)
+                        if user:
+                            _apply(user, effects, sign)
+                            changed[user_id] = user
+                for user in changed.values():
+                    batch.save_user(user)
+        return deal, old_status
+
+    async def top(self, k: int = 10, offset: int = 0) -> List[Tuple[int, User]]:
+        """(rank, user) for the best `k` users by reputation"""
+        entries = self.data_manager.leaderboard.top(k, offset)
+        users = {user.id: user for user in await self.data_manager.get_users([user_id for user_id, _ in entries])}
+        return [
+            (offset + position + 1, users[user_id])
+            for position, (user_id, _) in enumerate(entries) if user_id in users
+        ]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        return self.data_manager.leaderboard.rank(int(user_id))
@@ -0,0 +1,28 @@
+import asyncio
+
+from config import User
+from data.data_manager import DataManager
+
+def test_flush_updates_live_users_without_touching_the_cache(tmp_path):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend='json')
+        try:
+            for user_id in (1, 2):
+                await data_manager.save_user(User(id=user_id))
+            await data_manager.flush()
+            users = data_manager._users
+            hits, misses = users.hits, users.misses
+            order = list(users._entries)
+
+            data_manager.activity.touch(1, 1_700_000_000)
+            data_manager.activity.touch(3, 1_700_000_000)
+            await data_manager.activity.flush()
+
+            assert (users.hits, users.misses) == (hits, misses)
+            assert list(users._entries) == order
+            assert data_manager.peek_user(1).last_active.startswith('2023-11-14')
+            assert await data_manager.storage.get_last_active('1') == data_manager.peek_user(1).last_active
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('numpy')
+
+import handlers
+from analytics import DIMENSIONS, DealAnalytics, DealColumns
+from config import Deal, DealType
+from data.data_manager import DataManager
+from i18n import i18n
+
+def _deal(amount: float, deal_type: DealType = DealType.DEBT) -> Deal:
+    return Deal(id='', creator_id=1, deal_type=deal_type, amount=amount, terms='')
+
+def _totals(rows):
+    return {(row['deal_type'], row['currency']): (row['count'], row['amount_minor']) for row in rows}
+
+def test_aggregate_sums_minor_units():
+    columns = DealColumns(capacity=1)
+    columns.upsert_many([
+        {'id': 'a', 'deal_type': 'debt', 'status': 'active', 'amount': 0.1, 'created_at': '2025-01-01T10:00:00'},
+        {'id': 'b', 'deal_type': 'debt', 'status': 'active', 'amount': 0.2, 'created_at': '2025-01-02T10:00:00'},
+        {'id': 'c', 'deal_type': 'debt', 'status': 'active', 'amount': 500,
+         'created_at': '2025-01-02T11:00:00', 'metadata': {'currency': 'JPY'}},
+    ])
+    assert _totals(columns.aggregate(['deal_type'])) == {('debt', 'JPY'): (1, 500), ('debt', 'USD'): (2, 30)}
+
+    columns.remove('a')
+    rows = columns.aggregate(['day'])
+    assert [(str(row['day']), row['currency'], row['count']) for row in rows] == [
+        ('2025-01-02', 'JPY', 1), ('2025-01-02', 'USD', 1)
+    ]
+
+def test_refresh_follows_creates_and_deletes(tmp_path):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend='json')
+        analytics = DealAnalytics(data_manager)
+        try:
+            first = await data_manager.create_deal(_deal(10))
+            assert _totals(await analytics.report(['deal_type'])) == {('debt', 'USD'): (1, 1000)}
+
+            await data_manager.create_deal(_deal(2.5))
+            assert _totals(await analytics.report(['deal_type'])) == {('debt', 'USD'): (2, 1250)}
+
+            await data_manager.delete_deal(first)
+            assert _totals(await analytics.report(['deal_type'])) == {('debt', 'USD'): (1, 250)}
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
+
+class _Message:
+    def __init__(self, text: str):
+        self.text = text
+        self.from_user = SimpleNamespace(id=1)
+        self.answers = []
+
+    async def answer(self, text: str):
+        self.answers.append(text)
+
+class _Analytics:
+    def __init__(self):
+        self.calls = []
+
+    async def report(self, by, since=None, until=None):
+        self.calls.append((by, since))
+        return []
+
+@pytest.mark.parametrize('days', ['0', '36501', '99999999999'])
+def test_report_rejects_out_of_range_days(days):
+    t = i18n.get('en')
+    message, analytics = _Message(f"/report {days}"), _Analytics()
+    asyncio.run(handlers.cmd_report(message, analytics, frozenset({1}), t))
+    assert message.answers == [t('report_usage', dimensions=', '.join(DIMENSIONS))]
+    assert analytics.calls == []
+
+def test_report_days_count_today():
+    message, analytics = _Message("/report day 1"), _Analytics()
+    asyncio.run(handlers.cmd_report(message, analytics, frozenset({1}), i18n.get('en')))
+    assert analytics.calls == [(['day'], date.today())]
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from config import Deal, DealType, User
+from data.data_manager import DataManager
+
+def test_failed_batch_restores_loaded_objects(tmp_path):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend='json')
+        try:
+            await data_manager.save_user(User(id=1, reputation=3))
+            deal_id = await data_manager.create_deal(
+                Deal(id='', creator_id=1, deal_type=DealType.DEBT, amount=5, terms='')
+            )
+            await data_manager.flush()
+            user = await data_manager.get_user(1)
+            version = user.version
+
+            with pytest.raises(RuntimeError):
+                async with data_manager.batch() as batch:
+                    user = await batch.get_user(1)
+                    deal = await batch.get_deal(deal_id)
+                    user.reputation += 10
+                    deal.status = 'completed'
+                    batch.save_user(user)
+                    batch.save_deal(deal)
+                    batch.add_deal_history(deal, 'completed', 1)
+                    raise RuntimeError("boom")
+
+            live = await data_manager.get_user(1)
+            assert (live.reputation, live.version) == (3, version)
+            live_deal = await data_manager.get_deal(deal_id)
+            assert (live_deal.status, live_deal.history_count) == ('active', 0)
+            assert data_manager.pending_writes() == {'users': 0, 'deals': 0, 'history': 0}
+            assert (await data_manager.storage.get_user('1'))['reputation'] == 3
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
+
+def test_rollback_keeps_changes_saved_outside_the_batch(tmp_path):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend='json')
+        try:
+            await data_manager.save_user(User(id=1))
+            with pytest.raises(RuntimeError):
+                async with data_manager.batch() as batch:
+                    user = await batch.get_user(1)
+                    user.reputation = 7
+                    await data_manager.save_user(user)
+                    raise RuntimeError("boom")
+            assert (await data_manager.get_user(1)).reputation == 7
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+import pytest
+
+import handlers
+from buttons import ButtonRouter, normalize
+from i18n import i18n
+
+def _routed(text: str):
+    match = handlers.buttons.match(SimpleNamespace(text=text))
+    return match and match['button'].callback
+
+def test_normalize_ignores_variation_selectors_and_case():
+    assert normalize("  🤲️  Charity ") == normalize("🤲 charity")
+
+@pytest.mark.parametrize('text', ["🤲 Charity", "Charity", "charity", "Debt", "Venture"])
+def test_deal_types_open_the_amount_prompt(text):
+    assert _routed(text) is handlers.choose_deal_amount
+
+def test_localized_labels_route_to_the_same_handler():
+    assert _routed(i18n.get('ru')('btn_profile')) is handlers.show_profile
+    assert _routed(i18n.get('en')('btn_profile')) is handlers.show_profile
+
+def test_conflicting_labels_are_rejected():
+    buttons = ButtonRouter(i18n)
+    buttons(texts=["Same"])(lambda message: None)
+    with pytest.raises(ValueError):
+        buttons(texts=["same"])(lambda message: None)
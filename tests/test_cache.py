@@ -0,0 +1,83 @@
+import gc
+
+from data.cache import LRUCache, approx_size
+
+class Record:
+    def __init__(self, name: str):
+        self.name = name
+
+def test_evicts_least_recently_used_beyond_max_items():
+    evicted = []
+    cache = LRUCache(max_items=2, on_evict=lambda key, value: evicted.append(key))
+    a, b, c = Record('a'), Record('b'), Record('c')
+    cache['a'], cache['b'] = a, b
+    assert cache.get('a') is a
+    cache['c'] = c
+
+    assert evicted == ['b']
+    assert len(cache) == 2
+    assert cache.stats()['evictions'] == 1
+
+def test_evicts_beyond_max_bytes():
+    records = [Record(str(i)) for i in range(4)]
+    cache = LRUCache(max_bytes=approx_size(records[0]) * 2)
+    for i, record in enumerate(records):
+        cache[str(i)] = record
+
+    assert len(cache) == 2
+    assert cache.bytes <= cache.max_bytes
+    assert cache.bytes == sum(approx_size(record) for record in records[2:])
+    cache.pop('3')
+    assert cache.bytes == approx_size(records[2])
+
+def test_pinned_entries_are_not_evicted():
+    dirty = {'a'}
+    cache = LRUCache(max_items=2, pinned=dirty.__contains__)
+    cache['a'] = Record('a')
+    cache['b'] = Record('b')
+    cache['c'] = Record('c')
+    # 'a' is the least recently used but still dirty
+    assert set(cache._entries) == {'a', 'c'}
+
+    # Once written back it goes like any other entry
+    dirty.clear()
+    cache.get('c')
+    cache.max_items = 1
+    cache.trim()
+    assert set(cache._entries) == {'c'}
+
+    # With every entry pinned trimming gives up instead of spinning
+    dirty.update({'c', 'd'})
+    cache['d'] = Record('d')
+    assert set(cache._entries) == {'c', 'd'}
+
+def test_evicted_object_still_in_use_is_taken_back():
+    cache = LRUCache(max_items=1)
+    held = Record('a')
+    cache['a'] = held
+    cache['b'] = Record('b')
+    assert len(cache) == 1 and 'a' in cache
+
+    assert cache.peek('a') is held
+    assert cache.get('a') is held
+    # Taking it back makes it the most recent entry again
+    assert set(cache._entries) == {'a'}
+
+    del held
+    cache['c'] = Record('c')
+    gc.collect()
+    assert 'a' not in cache
+    assert cache.get('a') is None
+
+def test_counters():
+    cache = LRUCache(max_items=1)
+    cache['a'] = Record('a')
+    cache.get('a')
+    cache.get('missing')
+    cache.peek('a')
+    cache.peek('missing')
+    cache['b'] = Record('b')
+
+    assert cache.stats() == {
+        'items': 1, 'bytes': cache.bytes, 'hits': 1, 'misses': 1, 'evictions': 1, 'hit_rate': 0.5
+    }
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from config import Deal, DealType, User
+from data.data_manager import DataManager
+from data.storage import VersionConflict, uninterrupted
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_close_stops_background_tasks(tmp_path, backend):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend=backend, flush_interval=0)
+        tasks = list(data_manager._tasks)
+        await data_manager.save_user(User(id=1, username='alice'))
+        # Let the flush loop pick the user up, then close in the middle of it
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await data_manager.close()
+
+        assert all(task.done() for task in tasks)
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+        reopened = DataManager(data_dir=str(tmp_path), backend=backend)
+        try:
+            assert (await reopened.get_user(1)).username == 'alice'
+        finally:
+            await reopened.close()
+
+    asyncio.run(scenario())
+
+async def _create_deal(data_manager) -> str:
+    return await data_manager.create_deal(
+        Deal(id='', creator_id=1, deal_type=DealType.DEBT, amount=5, terms='')
+    )
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_concurrent_updates_both_apply(tmp_path, backend):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend=backend)
+        try:
+            deal_id = await _create_deal(data_manager)
+
+            async def join(user_id: int):
+                async def mutator(deal: Deal):
+                    # Both drafts are taken before either is written
+                    await asyncio.sleep(0)
+                    deal.members.append(user_id)
+                return await data_manager.update_deal(deal_id, mutator)
+
+            await asyncio.gather(join(2), join(3))
+            assert sorted((await data_manager.get_deal(deal_id)).members) == [2, 3]
+            assert data_manager.cas_retries >= 1
+
+            await data_manager.flush()
+            assert sorted((await data_manager.storage.get_deal(deal_id))['members']) == [2, 3]
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_update_gives_up_after_retries(tmp_path, backend):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend=backend)
+        try:
+            deal_id = await _create_deal(data_manager)
+
+            async def mutator(deal: Deal):
+                deal.amount = 100
+                # Someone else saves the deal on every attempt
+                await data_manager.update_deal(deal_id, terms=f"attempt {data_manager.cas_retries}")
+
+            with pytest.raises(VersionConflict):
+                await data_manager.update_deal(deal_id, mutator, retries=3)
+            assert data_manager.cas_retries == 3
+            deal = await data_manager.get_deal(deal_id)
+            assert (deal.amount, deal.terms) == (5, "attempt 2")
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_deals_by_creation_time(tmp_path, backend):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend=backend)
+        try:
+            days = ['2025-01-03T10:00:00', '2025-01-01T10:00:00', '2025-01-02T10:00:00', '2025-01-02T10:00:00']
+            ids = {}
+            for i, created_at in enumerate(days):
+                ids[i] = await data_manager.create_deal(Deal(
+                    id='', creator_id=1, deal_type=DealType.DEBT, amount=5, terms='', created_at=created_at
+                ))
+            # Unflushed deals are included; equal timestamps keep id (creation) order
+            by_day = [ids[1], ids[2], ids[3], ids[0]]
+
+            async def check():
+                created = await data_manager.get_deals_created()
+                assert [deal.id for deal in created] == by_day
+                created = await data_manager.get_deals_created(datetime(2025, 1, 2), datetime(2025, 1, 3), limit=1)
+                assert [deal.id for deal in created] == [ids[2]]
+                latest = await data_manager.get_latest_deals(3)
+                assert [deal.id for deal in latest] == by_day[::-1][:3]
+                latest = await data_manager.get_latest_deals(10, before=datetime(2025, 1, 2, 10))
+                assert [deal.id for deal in latest] == [ids[1]]
+                # Results are the live objects
+                assert latest[0] is await data_manager.get_deal(ids[1])
+
+            await check()
+            await data_manager.close()
+            data_manager = DataManager(data_dir=str(tmp_path), backend=backend)
+            await check()
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
+
+def test_uninterrupted_finishes_before_cancelling():
+    async def scenario():
+        finished = []
+
+        async def work():
+            await asyncio.sleep(0.01)
+            finished.append(True)
+
+        task = asyncio.create_task(uninterrupted(work()))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert finished == [True]
+
+    asyncio.run(scenario())
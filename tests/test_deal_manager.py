@@ -0,0 +1,51 @@
+import asyncio
+
+from config import Deal, DealType, User
+from data.data_manager import DataManager
+from deal_manager import DealManager
+from models import DealStatus
+
+class RecordingScheduler:
+    def __init__(self):
+        self.transitions = []
+
+    def schedule_deal(self, deal):
+        pass
+
+    async def on_status_change(self, deal, old_status):
+        self.transitions.append((deal.id, old_status, deal.status))
+
+def test_accept_goes_through_stats_and_scheduler(tmp_path):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend='json')
+        scheduler = RecordingScheduler()
+        deal_manager = DealManager(data_manager, scheduler)
+        try:
+            for user_id in (1, 2, 3):
+                await data_manager.save_user(User(id=user_id, is_registered=True))
+            deal_id = await deal_manager.create_deal(
+                Deal(id='', creator_id=1, deal_type=DealType.DEBT, amount=25, terms='', members=[1])
+            )
+
+            deal = await deal_manager.accept_deal(deal_id, 2)
+            assert deal.status == DealStatus.ACCEPTED.value
+            assert deal.members == [1, 2]
+            assert deal.participants['2'].role == 'savior'
+            assert scheduler.transitions == [(deal_id, 'active', DealStatus.ACCEPTED.value)]
+
+            # A second accept loses
+            assert await deal_manager.accept_deal(deal_id, 3) is None
+            assert 3 not in (await data_manager.get_deal(deal_id)).members
+            assert len(scheduler.transitions) == 1
+
+            assert await deal_manager.complete_deal(deal_id)
+            savior = await data_manager.get_user(2)
+            assert savior.reputation == 1
+            assert savior.statistics.total_amount_handled == 25
+            assert (await data_manager.get_user(3)).reputation == 0
+            assert deal_manager.stats.rank(2) in (1, 2)
+            assert scheduler.transitions[-1] == (deal_id, DealStatus.ACCEPTED.value, 'completed')
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
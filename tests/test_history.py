@@ -0,0 +1,59 @@
+import asyncio
+import builtins
+import os
+
+import pytest
+
+import data.history
+import data.wal
+from data.history import HistoryLog
+
+def _event(action: str) -> dict:
+    return {'action': action, 'user_id': 1}
+
+def test_failed_batch_requeues_only_unwritten_deals(tmp_path, monkeypatch):
+    async def scenario():
+        history = HistoryLog(tmp_path)
+        history.append('A', [_event('created')])
+        history.append('B', [_event('created')])
+
+        real_open = builtins.open
+        def failing_open(path, *args, **kwargs):
+            if str(path).endswith('B.jsonl'):
+                raise OSError("too many open files")
+            return real_open(path, *args, **kwargs)
+        monkeypatch.setattr(data.history, 'open', failing_open, raising=False)
+        with pytest.raises(OSError):
+            await history.commit()
+        monkeypatch.undo()
+
+        history.append('B', [_event('joined')])
+        await history.commit()
+        assert await history.read('A') == ([_event('created')], None)
+        assert await history.read('B') == ([_event('created'), _event('joined')], None)
+        history.close()
+
+    asyncio.run(scenario())
+
+def test_failed_fsync_leaves_no_torn_tail(tmp_path, monkeypatch):
+    async def scenario():
+        history = HistoryLog(tmp_path)
+        history.append('A', [_event('created')])
+        await history.commit()
+        size = (tmp_path / 'A.jsonl').stat().st_size
+
+        real_fsync = os.fsync
+        def failing_fsync(fd):
+            raise OSError("disk full")
+        monkeypatch.setattr(data.wal.os, 'fsync', failing_fsync)
+        history.append('A', [_event('joined')])
+        with pytest.raises(OSError):
+            await history.commit()
+        assert (tmp_path / 'A.jsonl').stat().st_size == size
+
+        monkeypatch.setattr(data.wal.os, 'fsync', real_fsync)
+        await history.commit()
+        assert await history.read('A') == ([_event('created'), _event('joined')], None)
+        history.close()
+
+    asyncio.run(scenario())
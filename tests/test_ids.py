@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from data.ids import IdGenerator, id_time, is_id
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_ids_increase_within_one_millisecond():
+    new_id = IdGenerator(FakeClock(1_700_000_000.0005))
+    ids = [new_id() for _ in range(1000)]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert all(is_id(value) for value in ids)
+    assert {id_time(value) for value in ids} == {datetime.fromtimestamp(1_700_000_000)}
+
+def test_ids_increase_when_the_clock_steps_back():
+    clock = FakeClock(1_700_000_000.0)
+    new_id = IdGenerator(clock)
+    first = new_id()
+    clock.now -= 5
+    second = new_id()
+    clock.now += 10
+    third = new_id()
+
+    assert first < second < third
+    # Ids keep the last timestamp until the clock catches up
+    assert id_time(second) == id_time(first)
+    assert id_time(third) == datetime.fromtimestamp(1_700_000_005)
+
+def test_other_values_are_not_ids():
+    assert not is_id('8' + '0' * 25)
+    assert not is_id('0' * 25 + 'U')
+    assert id_time('d1') is None
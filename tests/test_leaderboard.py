@@ -0,0 +1,91 @@
+import asyncio
+import bisect
+import random
+import threading
+
+import pytest
+
+import data.leaderboard
+from data.leaderboard import Leaderboard
+from data.skiplist import IndexableSkipList
+
+@pytest.mark.parametrize('seed', range(5))
+def test_skiplist_matches_sorted_list(seed):
+    rng = random.Random(seed)
+    initial = sorted(rng.sample(range(1000), 200))
+    skiplist, expected = IndexableSkipList(initial, seed=seed), list(initial)
+
+    for _ in range(2000):
+        key = rng.randrange(1000)
+        position = bisect.bisect_left(expected, key)
+        present = position < len(expected) and expected[position] == key
+        if rng.random() < 0.5:
+            if present:
+                skiplist.remove(key)
+                del expected[position]
+            else:
+                with pytest.raises(KeyError):
+                    skiplist.remove(key)
+                skiplist.add(key)
+                expected.insert(position, key)
+        elif present:
+            assert skiplist.index(key) == position
+        else:
+            with pytest.raises(ValueError):
+                skiplist.index(key)
+
+        assert len(skiplist) == len(expected)
+        if expected:
+            i = rng.randrange(len(expected))
+            assert skiplist[i] == expected[i]
+            assert skiplist[-1] == expected[-1]
+            assert list(skiplist.islice(i, i + 10)) == expected[i:i + 10]
+    assert list(skiplist) == expected
+    with pytest.raises(IndexError):
+        skiplist[len(expected)]
+
+class _SlowStorage:
+    def __init__(self, reputations):
+        self.reputations = reputations
+        self.release = asyncio.Event()
+
+    async def user_reputations(self):
+        await self.release.wait()
+        return self.reputations
+
+def test_load_keeps_changes_made_during_the_load(monkeypatch):
+    building, built = threading.Event(), threading.Event()
+
+    class SlowSkipList(IndexableSkipList):
+        def __init__(self, sorted_keys=(), seed=None):
+            if sorted_keys:
+                building.set()
+                built.wait(5)
+            super().__init__(sorted_keys, seed)
+    monkeypatch.setattr(data.leaderboard, 'IndexableSkipList', SlowSkipList)
+
+    async def scenario():
+        storage = _SlowStorage({'1': 10, '2': 20, '3': 30, '4': 40})
+        board = Leaderboard(storage)
+        load = asyncio.create_task(board.load())
+        await asyncio.sleep(0)
+
+        # While the stored reputations are being read
+        board.update(1, 50)
+        board.discard(2)
+        storage.release.set()
+
+        # While the skip list is built in the executor
+        await asyncio.get_running_loop().run_in_executor(None, building.wait, 5)
+        board.update(3, 5)
+        board.discard(4)
+        board.update(5, 25)
+        built.set()
+        await load
+
+        assert board.loaded
+        assert board.top(10) == [(1, 50), (5, 25), (3, 5)]
+        assert (board.rank(1), board.rank(3), board.rank(2), board.rank(4)) == (1, 3, None, None)
+        assert len(board) == 3
+
+    asyncio.run(scenario())
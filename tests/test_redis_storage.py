@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import RedisStorage as RedisFSMStorage
+from data.data_manager import create_fsm_storage
+from data.redis_storage import RedisStorage
+
+def _storage(server=None) -> RedisStorage:
+    return RedisStorage(fakeredis.aioredis.FakeRedis(server=server or fakeredis.FakeServer()))
+
+def _deal(deal_id: str, creator_id: int, members=(), status='active', group_id=None,
+          created_at='2025-01-01T12:00:00', version=1) -> dict:
+    return {
+        'id': deal_id, 'creator_id': creator_id, 'members': list(members), 'status': status,
+        'group_id': group_id, 'created_at': created_at, 'amount': 10, 'version': version
+    }
+
+def test_apply_batch_round_trip():
+    async def scenario():
+        storage = _storage()
+        user = {'id': 1, 'username': 'alice', 'is_registered': True, 'version': 1}
+        deal = _deal('d1', 1)
+        await storage.prepare_batch(['d1'])
+        await storage.apply_batch({'1': user}, {'d1': deal}, {'d1': [{'action': 'created', 'user_id': 1}]})
+        # Staged records are visible before the commit
+        assert await storage.get_deal('d1') == deal
+        await storage.commit()
+
+        fresh = RedisStorage(storage.client)
+        assert await fresh.get_user('1') == user
+        assert await fresh.get_users(['1', '2']) == {'1': user}
+        assert await fresh.get_deal('d1') == deal
+        assert await fresh.is_registered('1')
+        assert await fresh.user_reputations() == {'1': 0}
+        assert await fresh.get_history('d1') == ([{'action': 'created', 'user_id': 1}], None)
+
+        await fresh.delete_deal('d1')
+        await fresh.commit()
+        assert await storage.get_deal('d1') is None
+        await storage.close()
+
+    asyncio.run(scenario())
+
+def test_index_queries():
+    async def scenario():
+        storage = _storage()
+        await storage.prepare_batch(['a', 'b', 'c'])
+        await storage.apply_batch({}, {
+            'a': _deal('a', 1, members=[2], created_at='2025-01-01T10:00:00'),
+            'b': _deal('b', 2, group_id=-100, created_at='2025-01-02T10:00:00'),
+            'c': _deal('c', 1, status='completed', created_at='2025-01-03T10:00:00'),
+        }, {})
+
+        assert {deal['id'] for deal in await storage.get_user_deals('1')} == {'a', 'c'}
+        assert [deal['id'] for deal in await storage.get_user_deals('1', 'completed')] == ['c']
+        assert await storage.count_user_deals('2') == 2
+        assert await storage.count_user_deals('2', 'active') == 2
+        assert (await storage.get_deal_by_group('-100'))['id'] == 'b'
+
+        assert [deal['id'] for deal in await storage.get_deals_by_time()] == ['a', 'b', 'c']
+        assert [deal['id'] for deal in await storage.get_deals_by_time('2025-01-02T00:00:00')] == ['b', 'c']
+        assert [deal['id'] for deal in await storage.get_deals_by_time(limit=2, newest_first=True)] == ['c', 'b']
+
+        # A status change and a member leaving move the deal between index sets
+        await storage.prepare_batch(['a'])
+        await storage.apply_batch({}, {'a': _deal('a', 1, status='completed', version=2)}, {})
+        assert await storage.count_user_deals('2') == 1
+        assert {deal['id'] for deal in await storage.get_user_deals('1', 'completed')} == {'a', 'c'}
+        assert await storage.count_user_deals('1', 'active') == 0
+        await storage.close()
+
+    asyncio.run(scenario())
+
+def test_version_conflict_skips_record():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        first, second = _storage(server), _storage(server)
+        conflicts = []
+        second.on_conflict = conflicts.append
+
+        await first.apply_batch({'1': {'id': 1, 'username': 'first', 'version': 1}}, {}, {}, {('users', '1'): 0})
+        await first.commit()
+
+        # `second` read the record before `first` wrote it
+        await second.apply_batch(
+            {'1': {'id': 1, 'username': 'second', 'version': 1}, '2': {'id': 2, 'version': 1}}, {}, {},
+            {('users', '1'): 0, ('users', '2'): 0}
+        )
+        await second.commit()
+
+        assert conflicts == [{('users', '1')}]
+        reader = _storage(server)
+        assert (await reader.get_user('1'))['username'] == 'first'
+        assert await reader.get_user('2') == {'id': 2, 'version': 1}
+        for storage in (first, second, reader):
+            await storage.close()
+
+    asyncio.run(scenario())
+
+def test_redis_fsm_storage_keeps_state():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        storage = create_fsm_storage("redis", client=fakeredis.aioredis.FakeRedis(server=server))
+        assert isinstance(storage, RedisFSMStorage)
+        key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+        await storage.set_state(key, "DealStates:entering_amount")
+        await storage.set_data(key, {'deal_type': 'debt'})
+        await storage.close()
+
+        # A restarted worker sees the flow where it was left
+        restarted = create_fsm_storage("redis", client=fakeredis.aioredis.FakeRedis(server=server))
+        assert await restarted.get_state(key) == "DealStates:entering_amount"
+        assert await restarted.get_data(key) == {'deal_type': 'debt'}
+        await restarted.close()
+
+    asyncio.run(scenario())
+
+def test_fsm_storage_kinds():
+    assert type(create_fsm_storage("memory")).__name__ == 'MemoryStorage'
+    with pytest.raises(ValueError):
+        create_fsm_storage("postgres")
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from config import Deal, DealMetadata, DealType, User, UserSettings
+from data.data_manager import DataManager
+from deal_manager import DealManager
+from i18n import i18n
+from scheduler import DealScheduler
+
+class RecordingNotifier:
+    def __init__(self):
+        self.sent = []
+
+    def notify(self, user_id, text):
+        self.sent.append((user_id, text))
+        return True
+
+def test_notifications_use_each_members_language(tmp_path):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend='json')
+        notifier = RecordingNotifier()
+        scheduler = DealScheduler(data_manager, notifier, tmp_path / "scheduler.json")
+        deal_manager = DealManager(data_manager, scheduler)
+        try:
+            await data_manager.save_user(User(id=1, settings=UserSettings(language='ru')))
+            await data_manager.save_user(User(id=2, settings=UserSettings(language='en')))
+            deal_id = await deal_manager.create_deal(
+                Deal(id='', creator_id=1, deal_type=DealType.DEBT, amount=5, terms='', members=[1, 2])
+            )
+            ru, en = i18n.get('ru'), i18n.get('en')
+
+            await scheduler._fire(deal_id, 'reminder')
+            assert notifier.sent == [
+                (1, ru('deal_reminder', deal_id=deal_id, status=ru('status_active'))),
+                (2, en('deal_reminder', deal_id=deal_id, status='active')),
+            ]
+            assert 'активна' in notifier.sent[0][1]
+
+            notifier.sent.clear()
+            await scheduler._fire(deal_id, 'deadline')
+            assert notifier.sent == [
+                (1, ru('deal_deadline_passed', deal_id=deal_id)),
+                (2, en('deal_deadline_passed', deal_id=deal_id)),
+            ]
+
+            notifier.sent.clear()
+            await deal_manager.complete_deal(deal_id)
+            assert notifier.sent == [
+                (1, ru('deal_completed', deal_id=deal_id)),
+                (2, en('deal_completed', deal_id=deal_id)),
+            ]
+            assert scheduler.pending_jobs == 0
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
+
+def test_workers_split_jobs_and_rebuild_them_from_the_store(tmp_path):
+    async def scenario():
+        data_manager = DataManager(data_dir=str(tmp_path), backend='json')
+        notifier = RecordingNotifier()
+        try:
+            tomorrow = (datetime.now() + timedelta(days=1)).isoformat()
+            yesterday = (datetime.now() - timedelta(days=1)).isoformat()
+            deal_ids = [
+                await data_manager.create_deal(Deal(
+                    id='', creator_id=1, deal_type=DealType.DEBT, amount=5, terms='',
+                    metadata=DealMetadata(deadline=deadline)
+                ))
+                for deadline in [tomorrow, yesterday] * 4
+            ]
+            closed = await data_manager.create_deal(
+                Deal(id='', creator_id=1, deal_type=DealType.DEBT, amount=5, terms='', status='completed')
+            )
+
+            def workers(count):
+                return [
+                    DealScheduler(data_manager, notifier, tmp_path / f"scheduler.{worker_id}.json",
+                                  worker_id=worker_id, workers=count)
+                    for worker_id in range(count)
+                ]
+
+            for count in (2, 3):
+                schedulers = workers(count)
+                for scheduler in schedulers:
+                    # Deals created on any worker end up with their owner
+                    await scheduler.resync()
+                owned = [{deal_id for deal_id, _ in scheduler._jobs} for scheduler in schedulers]
+                assert set().union(*owned) == set(deal_ids)
+                assert sum(map(len, owned)) == len(deal_ids)
+                assert closed not in set().union(*owned)
+                # Passed deadlines are not announced again
+                assert sum(scheduler.pending_jobs for scheduler in schedulers) == len(deal_ids) + 4
+
+            owner = next(scheduler for scheduler in schedulers if scheduler.owns(deal_ids[0]))
+            other = next(scheduler for scheduler in schedulers if not scheduler.owns(deal_ids[0]))
+            deal = await data_manager.get_deal(deal_ids[0])
+            other.schedule_deal(deal)
+            assert (deal.id, 'deadline') not in other._jobs
+
+            # A deadline moved on another worker reschedules instead of firing
+            due = owner._jobs[(deal.id, 'deadline')]
+            deal.metadata.deadline = (datetime.now() + timedelta(days=2)).isoformat()
+            await data_manager.save_deal(deal)
+            await owner._fire(deal.id, 'deadline', due)
+            assert notifier.sent == []
+            assert owner._jobs[(deal.id, 'deadline')] > due
+        finally:
+            await data_manager.close()
+
+    asyncio.run(scenario())
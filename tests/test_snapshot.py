@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+import pytest
+
+from data.json_storage import JsonStorage
+from data.snapshot import (
+    TABLES, FrozenTable, LazyTable, Snapshot, SnapshotError, export_json, import_json, write_snapshot
+)
+
+USERS = {'1': {'id': 1, 'username': 'alice', 'is_registered': True, 'reputation': 3}}
+DEALS = {
+    'd1': {'id': 'd1', 'creator_id': 1, 'members': [2], 'status': 'active',
+           'group_id': -100, 'created_at': '2025-01-01T10:00:00'},
+    'd2': {'id': 'd2', 'creator_id': 2, 'members': [], 'status': 'completed',
+           'group_id': None, 'created_at': '2025-01-02T10:00:00'},
+}
+
+def _write(path, users=USERS, deals=DEALS, meta_fns=TABLES) -> int:
+    return write_snapshot(path, {
+        'users': (FrozenTable(None, users, set()), meta_fns['users']),
+        'deals': (FrozenTable(None, deals, set()), meta_fns['deals']),
+    })
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    assert _write(path) == path.stat().st_size
+
+    snapshot = Snapshot(path)
+    try:
+        deals = snapshot.table('deals')
+        assert len(deals) == 2
+        assert deals.get('d1') == DEALS['d1']
+        assert deals.get('missing') is None
+        assert deals.meta[deals.positions['d2']]['status'] == 'completed'
+        assert snapshot.table('users').get('1') == USERS['1']
+        assert snapshot.table('other') is None
+    finally:
+        snapshot.close()
+
+def test_checksum_mismatch(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    _write(path)
+    data = bytearray(path.read_bytes())
+    # Flip a byte inside the last record
+    data[-3] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError, match="checksum"):
+        Snapshot(path)
+    Snapshot(path, verify=False).close()
+
+    data[0:4] = b'XXXX'
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match="not a snapshot"):
+        Snapshot(path)
+
+def test_lazy_table_overlay_and_tombstones(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    _write(path)
+    snapshot = Snapshot(path)
+    try:
+        table = LazyTable(snapshot.table('deals'))
+        table['d3'] = {'id': 'd3'}
+        table['d1'] = {'id': 'd1', 'status': 'completed'}
+        del table['d2']
+
+        assert 'd2' not in table
+        with pytest.raises(KeyError):
+            table['d2']
+        assert table['d1'] == {'id': 'd1', 'status': 'completed'}
+        assert sorted(table) == ['d1', 'd3'] and len(table) == 2
+
+        # Changes made while the snapshot is written stay in the overlay after the rebase
+        frozen = table.freeze()
+        table['d4'] = {'id': 'd4'}
+        write_snapshot(tmp_path / "next.bin", {'deals': (frozen, TABLES['deals'])})
+        rebased = Snapshot(tmp_path / "next.bin")
+        table.rebase(rebased.table('deals'), frozen)
+        assert table._overlay == {'d4': {'id': 'd4'}}
+        assert sorted(table) == ['d1', 'd3', 'd4']
+        assert table['d1']['status'] == 'completed'
+        rebased.close()
+    finally:
+        snapshot.close()
+
+def test_old_snapshot_metadata_is_upgraded(tmp_path):
+    # Older snapshots stored user metadata as a dict and deals without created_at
+    _write(tmp_path / "snapshot.bin", meta_fns={
+        'users': lambda user: {'is_registered': user.get('is_registered')},
+        'deals': lambda deal: {'creator_id': deal['creator_id'], 'members': deal['members'],
+                               'status': deal['status'], 'group_id': deal['group_id']},
+    })
+
+    async def scenario():
+        storage = JsonStorage(tmp_path)
+        storage.load()
+        assert await storage.user_reputations() == {'1': 3}
+        assert [deal['id'] for deal in await storage.get_deals_by_time('2025-01-02T00:00:00')] == ['d2']
+        await storage.save_data()
+        await storage.close()
+
+    asyncio.run(scenario())
+    snapshot = Snapshot(tmp_path / "snapshot.bin")
+    try:
+        users, deals = snapshot.table('users'), snapshot.table('deals')
+        assert users.meta == [[1, 3]]
+        assert [meta['created_at'] for meta in deals.meta] == [DEALS['d1']['created_at'], DEALS['d2']['created_at']]
+    finally:
+        snapshot.close()
+
+def test_export_and_import_json(tmp_path):
+    _write(tmp_path / "snapshot.bin")
+    export_json(tmp_path / "snapshot.bin", tmp_path)
+    assert json.loads((tmp_path / "users.json").read_text()) == USERS
+    assert json.loads((tmp_path / "deals.json").read_text()) == DEALS
+
+    import_json(tmp_path, tmp_path / "copy.bin")
+    snapshot = Snapshot(tmp_path / "copy.bin")
+    try:
+        assert {key: snapshot.table('deals').get(key) for key in snapshot.table('deals').keys} == DEALS
+    finally:
+        snapshot.close()
+
+def test_imported_json_files_stay_in_place(tmp_path):
+    (tmp_path / "users.json").write_text(json.dumps(USERS))
+    (tmp_path / "deals.json").write_text(json.dumps(DEALS))
+
+    async def scenario():
+        storage = JsonStorage(tmp_path)
+        storage.load()
+        await storage.delete_deal('d2')
+        await storage.save_data()
+        await storage.close()
+
+        # The snapshot wins over the JSON files from then on
+        storage = JsonStorage(tmp_path)
+        storage.load()
+        assert await storage.get_deal('d2') is None
+        assert (await storage.get_deal('d1'))['group_id'] == -100
+        await storage.close()
+
+    asyncio.run(scenario())
+    assert json.loads((tmp_path / "deals.json").read_text()) == DEALS
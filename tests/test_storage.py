@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from data.data_manager import create_storage
+
+def _deal(deal_id: str, creator_id: int, members=(), status='active', group_id=None,
+          created_at='2025-01-01T12:00:00', version=1) -> dict:
+    return {
+        'id': deal_id, 'creator_id': creator_id, 'members': list(members), 'status': status,
+        'group_id': group_id, 'created_at': created_at, 'amount': 10, 'version': version
+    }
+
+def _user(user_id: int, username: str, reputation: int = 0) -> dict:
+    return {'id': user_id, 'username': username, 'is_registered': True,
+            'reputation': reputation, 'version': 1}
+
+async def _reopen(storage, tmp_path, backend):
+    await storage.close()
+    storage = create_storage(backend, tmp_path)
+    storage.load()
+    return storage
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_apply_batch_survives_reload(tmp_path, backend):
+    async def scenario():
+        storage = create_storage(backend, tmp_path)
+        storage.load()
+        alice, deal = _user(1, 'alice', reputation=5), _deal('d1', 1)
+        await storage.prepare_batch(['d1'])
+        await storage.apply_batch({'1': alice}, {'d1': deal}, {'d1': [{'action': 'created', 'user_id': 1}]})
+
+        storage = await _reopen(storage, tmp_path, backend)
+        assert await storage.get_user('1') == alice
+        assert await storage.get_users(['1', '2']) == {'1': alice}
+        assert await storage.get_deal('d1') == deal
+        assert await storage.is_registered('1')
+        assert await storage.registered_user_ids() == ['1']
+        assert await storage.user_reputations() == {'1': 5}
+        assert await storage.get_history('d1') == ([{'action': 'created', 'user_id': 1}], None)
+
+        await storage.delete_deal('d1')
+        await storage.delete_user('1')
+        storage = await _reopen(storage, tmp_path, backend)
+        assert await storage.get_deal('d1') is None
+        assert await storage.get_user('1') is None
+        assert await storage.get_history('d1') == ([], None)
+        await storage.close()
+
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_index_queries(tmp_path, backend):
+    async def scenario():
+        storage = create_storage(backend, tmp_path)
+        storage.load()
+        await storage.prepare_batch(['a', 'b', 'c'])
+        await storage.apply_batch({}, {
+            'a': _deal('a', 1, members=[2], created_at='2025-01-01T10:00:00'),
+            'b': _deal('b', 2, group_id=-100, created_at='2025-01-02T10:00:00'),
+            'c': _deal('c', 1, status='completed', created_at='2025-01-03T10:00:00'),
+        }, {})
+
+        for _ in range(2):
+            assert {deal['id'] for deal in await storage.get_user_deals('1')} == {'a', 'c'}
+            assert [deal['id'] for deal in await storage.get_user_deals('1', 'completed')] == ['c']
+            assert await storage.count_user_deals('1') == 2
+            assert await storage.count_user_deals('2', 'active') == 2
+            assert await storage.count_user_deals('2', 'completed') == 0
+            assert (await storage.get_deal_by_group('-100'))['id'] == 'b'
+            assert await storage.get_deal_by_group('-200') is None
+            # The indexes are rebuilt from what was persisted
+            storage = await _reopen(storage, tmp_path, backend)
+
+        # A status change moves the deal to the other status
+        await storage.prepare_batch(['a'])
+        await storage.apply_batch({}, {'a': _deal('a', 1, members=[2], status='completed', version=2)}, {})
+        assert {deal['id'] for deal in await storage.get_user_deals('1', 'completed')} == {'a', 'c'}
+        assert await storage.count_user_deals('1', 'active') == 0
+        assert await storage.count_user_deals('2', 'completed') == 1
+        await storage.close()
+
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_time_range_queries(tmp_path, backend):
+    async def scenario():
+        storage = create_storage(backend, tmp_path)
+        storage.load()
+        days = ['2025-01-01T10:00:00', '2025-01-02T10:00:00', '2025-01-03T10:00:00']
+        await storage.apply_batch({}, {
+            str(i): _deal(str(i), 1, created_at=day) for i, day in enumerate(days)
+        }, {})
+
+        ids = lambda deals: [deal['id'] for deal in deals]
+        assert ids(await storage.get_deals_by_time()) == ['0', '1', '2']
+        assert ids(await storage.get_deals_by_time('2025-01-02T00:00:00')) == ['1', '2']
+        assert ids(await storage.get_deals_by_time(end='2025-01-02T10:00:00')) == ['0']
+        assert ids(await storage.get_deals_by_time('2025-01-01T10:00:00', '2025-01-03T10:00:00')) == ['0', '1']
+        assert ids(await storage.get_deals_by_time(limit=2)) == ['0', '1']
+        assert ids(await storage.get_deals_by_time(limit=2, newest_first=True)) == ['2', '1']
+        await storage.close()
+
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_history_cursors(tmp_path, backend):
+    async def scenario():
+        storage = create_storage(backend, tmp_path)
+        storage.load()
+        events = [{'action': 'joined', 'user_id': i} for i in range(5)]
+        await storage.save_deal('d1', _deal('d1', 1))
+        await storage.append_history('d1', events[:3])
+        await storage.append_history('d1', events[3:])
+        storage = await _reopen(storage, tmp_path, backend)
+
+        pages, cursor = [], 0
+        while cursor is not None:
+            page, cursor = await storage.get_history('d1', cursor, limit=2)
+            pages.append(page)
+        assert pages == [events[:2], events[2:4], events[4:]]
+        await storage.close()
+
+    asyncio.run(scenario())
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_touch_users(tmp_path, backend):
+    async def scenario():
+        storage = create_storage(backend, tmp_path)
+        storage.load()
+        await storage.apply_batch({'1': _user(1, 'alice'), '2': _user(2, 'bob')}, {}, {})
+        await storage.touch_users({'1': '2025-01-05T10:00:00', '3': '2025-01-05T10:00:00'})
+        assert await storage.get_last_active('1') == '2025-01-05T10:00:00'
+
+        storage = await _reopen(storage, tmp_path, backend)
+        assert await storage.get_last_active('1') == '2025-01-05T10:00:00'
+        assert (await storage.get_user('1'))['username'] == 'alice'
+        assert await storage.get_last_active('2') is None
+        # Touching does not create users
+        assert await storage.get_user('3') is None
+        await storage.close()
+
+    asyncio.run(scenario())
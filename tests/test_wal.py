@@ -0,0 +1,122 @@
+import asyncio
+import os
+
+import pytest
+
+import data.wal
+from data.json_storage import JsonStorage
+from data.wal import WALCorruptedError, WriteAheadLog
+
+def _failing_fsync(monkeypatch, failures: int = 1):
+    real_fsync = os.fsync
+    calls = {'left': failures}
+
+    def fsync(fd):
+        if calls['left']:
+            calls['left'] -= 1
+            raise OSError("disk full")
+        real_fsync(fd)
+    monkeypatch.setattr(data.wal.os, 'fsync', fsync)
+
+def _replayed(path):
+    records = []
+    wal = WriteAheadLog(path)
+    wal.replay(records.append)
+    wal.close()
+    return records
+
+def test_failed_commit_keeps_records(tmp_path, monkeypatch):
+    async def scenario():
+        wal = WriteAheadLog(tmp_path / "wal.log")
+        wal.append('put', 'users', '1', {'id': 1})
+        _failing_fsync(monkeypatch)
+        with pytest.raises(OSError):
+            await wal.commit()
+        assert wal.has_pending
+        assert (tmp_path / "wal.log").stat().st_size == 0
+
+        wal.append('put', 'users', '2', {'id': 2})
+        await wal.commit()
+        assert not wal.has_pending
+        wal.close()
+
+    asyncio.run(scenario())
+    assert [record['k'] for record in _replayed(tmp_path / "wal.log")] == ['1', '2']
+
+def test_failed_rotate_keeps_records(tmp_path, monkeypatch):
+    async def scenario():
+        wal = WriteAheadLog(tmp_path / "wal.log")
+        wal.append('put', 'users', '1', {'id': 1})
+        _failing_fsync(monkeypatch)
+        with pytest.raises(OSError):
+            await wal.rotate()
+        assert wal.has_pending
+        segments = await wal.rotate()
+        wal.close()
+        return segments
+
+    segments = asyncio.run(scenario())
+    assert len(segments) == 1
+    assert [record['k'] for record in _replayed(tmp_path / "wal.log")] == ['1']
+
+def test_storage_survives_failed_wal_write(tmp_path, monkeypatch):
+    async def write():
+        storage = JsonStorage(tmp_path)
+        storage.load()
+        await storage.save_data()
+        await storage.apply_batch({'1': {'id': 1, 'username': 'a'}}, {}, {})
+        _failing_fsync(monkeypatch)
+        with pytest.raises(OSError):
+            await storage.wal.commit()
+        await storage.close()
+
+    async def read():
+        storage = JsonStorage(tmp_path)
+        storage.load()
+        user = await storage.get_user('1')
+        await storage.close()
+        return user
+
+    asyncio.run(write())
+    assert asyncio.run(read())['username'] == 'a'
+
+def _write_records(tmp_path, keys, rotate: bool = False):
+    async def scenario():
+        wal = WriteAheadLog(tmp_path / "wal.log")
+        for key in keys:
+            wal.append('set', 'users', key, {'id': key})
+            if rotate:
+                await wal.rotate()
+        await wal.commit()
+        wal.close()
+    asyncio.run(scenario())
+
+def test_replay_drops_torn_tail(tmp_path):
+    _write_records(tmp_path, ['1', '2'])
+    path = tmp_path / "wal.log"
+    size = path.stat().st_size
+    with open(path, 'ab') as f:
+        f.write(b'{"op":"set","t":"us')
+
+    assert [record['k'] for record in _replayed(path)] == ['1', '2']
+    # Cut off, so records written after a restart do not follow it
+    assert path.stat().st_size == size
+    _write_records(tmp_path, ['3'])
+    assert [record['k'] for record in _replayed(path)] == ['1', '2', '3']
+
+def test_replay_stops_at_corruption_before_the_tail(tmp_path):
+    _write_records(tmp_path, ['1', '2', '3'])
+    path = tmp_path / "wal.log"
+    lines = path.read_bytes().splitlines(keepends=True)
+    path.write_bytes(lines[0] + b'{garbage\n' + lines[2])
+
+    with pytest.raises(WALCorruptedError):
+        _replayed(path)
+
+def test_replay_stops_at_torn_sealed_segment(tmp_path):
+    _write_records(tmp_path, ['1', '2'], rotate=True)
+    sealed = tmp_path / "wal.1.log"
+    sealed.write_bytes(sealed.read_bytes()[:-5])
+
+    with pytest.raises(WALCorruptedError):
+        _replayed(tmp_path / "wal.log")
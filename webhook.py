@@ -0,0 +1,113 @@
+import hmac
+import logging
+import asyncio
+from typing import Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class WebhookServer:
+    """aiohttp endpoint that feeds Telegram webhook updates to the dispatcher.
+
+    Requests are acknowledged as soon as the update is queued; a fixed
+    pool of workers processes the queue. When the queue is full the
+    endpoint answers 503 so Telegram backs off and redelivers later, and
+    on shutdown it stops accepting, drains what is queued and only then
+    closes. Several processes can bind the same port with SO_REUSEPORT.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, path: str = "/webhook", secret_token: Optional[str] = None,
+                 workers: int = 64, queue_size: int = 1000, drain_timeout: float = 30.0):
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self._runner: Optional[web.AppRunner] = None
+        self.accepting = False
+
+        # Metrics
+        self.received = 0
+        self.rejected = 0
+        self.failed = 0
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get("/healthz", self.handle_health)
+
+    async def start(self, host: str = "0.0.0.0", port: int = 8080, reuse_port: bool = False):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._runner = web.AppRunner(self.app, handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port, reuse_port=reuse_port)
+        await site.start()
+        self.accepting = True
+        logger.info(f"Webhook listening on {host}:{port}{self.path}")
+
+    async def stop(self):
+        """Refuse new updates, finish queued ones (up to `drain_timeout`) and close"""
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} unprocessed updates")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret_token and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret_token
+        ):
+            return web.Response(status=401)
+        if not self.accepting:
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Ignoring malformed update: {e}")
+            return web.Response(status=400)
+
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Telegram redelivers on errors, which gives us backpressure for free
+            self.rejected += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        self.received += 1
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats(), status=200 if self.accepting else 503)
+
+    def stats(self) -> dict:
+        return {
+            'accepting': self.accepting,
+            'queue_depth': self._queue.qsize(),
+            'received': self.received,
+            'rejected': self.rejected,
+            'failed': self.failed
+        }
+
+    async def _worker(self):
+        while True:
+            update = await self._queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error processing update {update.update_id}: {e}")
+            finally:
+                self._queue.task_done()